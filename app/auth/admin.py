@@ -0,0 +1,25 @@
+import secrets
+
+from fastapi import Header, HTTPException, status
+
+from app.core.config import settings
+
+
+def require_admin(x_admin_key: str | None = Header(None)) -> None:
+    """
+    Guards admin endpoints with the `X-Admin-Key` header. Admin endpoints are disabled
+    unless `ADMIN_API_KEY` is configured.
+
+    Args:
+        x_admin_key (str | None): The `X-Admin-Key` request header.
+
+    Raises:
+        HTTPException: Raise 403 if the key is missing or wrong.
+    """
+    if not settings.admin_api_key or not secrets.compare_digest(
+        x_admin_key or "", settings.admin_api_key
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required.",
+        )
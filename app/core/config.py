@@ -4,6 +4,45 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Key expected in the X-Admin-Key header of admin endpoints, which are disabled
+    # when it is unset
+    admin_api_key: str | None = None
+    # In-memory catalog indexes (vaccines, clinics) are reloaded after this many seconds
+    catalog_refresh_seconds: int = 300
+    # Minimum trigram similarity for fuzzy vaccine/clinic name matches
+    name_match_threshold: float = 0.3
+    # Nearest clinics are found with the in-memory grid index ("memory"), or on Postgres
+    # with a PostGIS KNN query ("postgis", see data/migrations/002); other databases
+    # always use the grid index
+    clinic_proximity_backend: str = "memory"
+    # The nearest clinics of each type precomputed per address, for the user's home
+    nearest_clinics_per_address: int = 10
+    # Locations a single batch nearest-clinic request may look up
+    max_batch_locations: int = 100_000
+    # The in-memory slot availability index is reconciled with the database this often
+    availability_reconcile_seconds: int = 60
+    # Slot holds expire after this many seconds unless confirmed, and a user may
+    # hold at most this many slots at once
+    slot_hold_seconds: int = 300
+    max_slot_holds_per_user: int = 5
+    # A user may wait for at most this many slots at once
+    max_waitlist_entries_per_user: int = 5
+    # Idle slot event streams send a keep-alive comment this often
+    slot_events_heartbeat_seconds: int = 15
+    # Generated booking slots are loaded this many rows at a time
+    slot_generation_batch_size: int = 10_000
+    # Postal codes are loaded from the offline dataset this many rows at a time
+    postal_code_batch_size: int = 10_000
+    # Institutions are diff-upserted into clinics and addresses this many at a time
+    institution_batch_size: int = 5_000
+    # Sector-to-clinic distances written by scripts/build_distance_matrix.py, looked up
+    # instead of computed when ranking clinics from a home; unused when unset
+    distance_matrix_path: str | None = None
+    # Vaccine recommendations are matched against the criteria compiled in memory,
+    # rather than selected by an age range query
+    compiled_eligibility_rules: bool = True
+    # Responses to requests with an Idempotency-Key are replayed for this many seconds
+    idempotency_key_ttl_seconds: int = 86_400
 
     class Config:
         env_file = ".env"
@@ -20,7 +20,9 @@ from openai import AsyncAzureOpenAI
 
 from app.database.cosmos_client import PyMongoCosmosDBClient
 from app.middleware.audit import audit_middleware
+from app.models.database import AsyncSessionLocal, engine
 from app.routers import (
+    admin,
     authentication,
     booking,
     clinic,
@@ -33,6 +35,14 @@ from app.routers import (
 from app.services.speech.speech_to_text import SpeechToText
 
 from app.services.approaches.promptmanager import PromptyManager
+from app.services.booking.availability import AvailabilityIndex
+from app.services.booking.events import SlotEventBroker
+from app.services.catalog.clinic_catalog import ClinicCatalog
+from app.services.catalog.coordinates import ClinicCoordinates
+from app.services.catalog.distance_matrix import DistanceMatrix
+from app.services.catalog.name_index import CatalogNameIndex
+from app.services.catalog.nearest_clinics import refresh_nearest_clinics_periodically
+from app.services.catalog.postal_codes import PostalCodeIndex
 from app.services.translate.language_openai import LanguageOpenAI
 
 logger = logging.getLogger("uvicorn.error")
@@ -47,6 +57,8 @@ def create_app(test: bool = False) -> FastAPI:
         azure_credential = (
             None  # Define credential outside try block for finally access
         )
+        reconcile_task = None
+        nearest_clinics_task = None
         try:
             # Replace these with your own values, either in environment variables or directly here
 
@@ -134,7 +146,7 @@ def create_app(test: bool = False) -> FastAPI:
                 logger.info("Audit DB client initialized.")
 
             logger.info("Initializing Speech-to-Text service...")
-            
+
             # initialize Speech-to-Text service
             stt_service = SpeechToText()
             await stt_service.initialize()
@@ -153,7 +165,9 @@ def create_app(test: bool = False) -> FastAPI:
             )
             OPENAI_CHATGPT_MODEL = os.getenv("AZURE_OPENAI_CHATGPT_MODEL")
             AZURE_OPENAI_SERVICE = os.getenv("AZURE_OPENAI_SERVICE")
-            AZURE_OPENAI_CHATGPT_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHATGPT_DEPLOYMENT")
+            AZURE_OPENAI_CHATGPT_DEPLOYMENT = os.getenv(
+                "AZURE_OPENAI_CHATGPT_DEPLOYMENT"
+            )
 
             credential = DefaultAzureCredential()
             token_provider = get_bearer_token_provider(
@@ -167,7 +181,9 @@ def create_app(test: bool = False) -> FastAPI:
             )
 
             OPENAI_CHATGPT_MODEL = os.getenv("AZURE_OPENAI_CHATGPT_MODEL")
-            AZURE_OPENAI_CHATGPT_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHATGPT_DEPLOYMENT")
+            AZURE_OPENAI_CHATGPT_DEPLOYMENT = os.getenv(
+                "AZURE_OPENAI_CHATGPT_DEPLOYMENT"
+            )
             app.state.translate_service = LanguageOpenAI(
                 openai_client=client,
                 chatgpt_model=OPENAI_CHATGPT_MODEL,
@@ -176,6 +192,40 @@ def create_app(test: bool = False) -> FastAPI:
                 official_terms=app.state.official_terms,
             )
 
+            # Warm the in-memory catalog indexes used by the booking search
+            logger.info("Loading catalog indexes...")
+            app.state.catalog_name_index = CatalogNameIndex()
+            app.state.clinic_catalog = ClinicCatalog()
+            app.state.clinic_coordinates = ClinicCoordinates()
+            app.state.postal_code_index = PostalCodeIndex()
+            app.state.availability_index = AvailabilityIndex()
+            app.state.distance_matrix = DistanceMatrix()
+            async with AsyncSessionLocal() as db:
+                await app.state.catalog_name_index.refresh(db)
+                await app.state.clinic_catalog.refresh(db)
+                await app.state.clinic_coordinates.refresh(db)
+                await app.state.postal_code_index.refresh(db)
+                await app.state.availability_index.refresh(db)
+                await app.state.distance_matrix.refresh(db)
+            logger.info("Catalog indexes loaded.")
+
+            # Periodically reconcile the availability index with bookings made elsewhere
+            reconcile_task = asyncio.create_task(
+                app.state.availability_index.reconcile_periodically(AsyncSessionLocal)
+            )
+
+            # Keep the nearest clinics precomputed per address up to date, in the
+            # background as the first run may cover every address
+            nearest_clinics_task = asyncio.create_task(
+                refresh_nearest_clinics_periodically(
+                    engine, app.state.clinic_coordinates
+                )
+            )
+
+            # Fan slot availability changes out across workers with LISTEN/NOTIFY
+            app.state.slot_events = SlotEventBroker(app.state.availability_index)
+            await app.state.slot_events.listen(engine)
+            logger.info("Listening for slot events.")
 
             # Hand over control to FastAPI
             yield
@@ -191,6 +241,14 @@ def create_app(test: bool = False) -> FastAPI:
         finally:
             # Cleanup: Runs on shutdown, regardless of success or failure during startup/runtime
             logger.info("Shutting down...")
+            if reconcile_task:
+                reconcile_task.cancel()
+            if nearest_clinics_task:
+                nearest_clinics_task.cancel()
+
+            if getattr(app.state, "slot_events", None):
+                await app.state.slot_events.close()
+
             if azure_credential:
                 logger.info("Closing Azure credential client session...")
                 await azure_credential.close()  # <--- Explicitly close the credential
@@ -229,6 +287,7 @@ def create_app(test: bool = False) -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
     app.include_router(authentication.router)
@@ -239,6 +298,7 @@ def create_app(test: bool = False) -> FastAPI:
     app.include_router(vaccine.router)
     app.include_router(transcription.router)
     app.include_router(translate.router)
+    app.include_router(admin.router)
 
     @app.get("/")
     async def root():
@@ -1,6 +1,14 @@
+import logging
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session, declarative_base
 import os
+
+logger = logging.getLogger("uvicorn.error")
+
 # Database connection (existing SQLite file)
 # DATABASE_URL = "sqlite+aiosqlite:///data/vaccination_db.sqlite"
 # Azure PostgreSQL connection (updated)
@@ -34,3 +42,50 @@ async def get_db() -> AsyncSession:  # type: ignore
     async with AsyncSessionLocal() as db:
         async with db.begin():
             yield db
+
+
+_AFTER_COMMIT_CALLBACKS = "after_commit_callbacks"
+
+
+def run_after_commit(db: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Queues a callback to run once the session's current transaction commits. The
+    callbacks are dropped if the transaction rolls back, so in-memory indexes only
+    follow changes that actually reached the database.
+
+    Args:
+        db (AsyncSession): The database session.
+        callback (Callable[[], None]): The callback to run.
+    """
+    db.info.setdefault(_AFTER_COMMIT_CALLBACKS, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop(_AFTER_COMMIT_CALLBACKS, []):
+        try:
+            callback()
+        except Exception as e:
+            # The transaction is already committed, so never fail the request here
+            logger.error(f"After-commit callback failed: {e}", exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit_callbacks(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT_CALLBACKS, None)
+
+
+def dialect_insert(db: AsyncSession) -> Callable:
+    """
+    Gets the `insert()` construct of the session's database dialect, which unlike the
+    generic one supports `ON CONFLICT` clauses.
+
+    Args:
+        db (AsyncSession): The database session.
+
+    Returns:
+        Callable: Either `postgresql.insert` or `sqlite.insert`.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
@@ -1,13 +1,18 @@
 import uuid
 
 from sqlalchemy import (
+    Boolean,
     Column,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     Numeric,
     String,
+    Text,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.ext.asyncio import AsyncAttrs
@@ -38,6 +43,8 @@ class User(AsyncAttrs, Base):
     date_of_birth = Column("date_of_birth", Date, nullable=False)
     gender = Column("gender", String, nullable=False)
     password = Column(String, nullable=False)
+    # Bumped whenever the user's profile or vaccine records change, for ETags
+    version = Column("version", Integer, default=0, server_default="0", nullable=False)
     created_at = Column(
         "created_at", DateTime, server_default=func.now(), nullable=False
     )
@@ -87,6 +94,7 @@ class Clinic(AsyncAttrs, Base):
 
 class Address(AsyncAttrs, Base):
     __tablename__ = "addresses"
+    __table_args__ = (Index("ix_addresses_postal_code", "postal_code"),)
 
     id = Column(
         "id",
@@ -112,6 +120,58 @@ class Address(AsyncAttrs, Base):
 
     users = relationship("User", back_populates="address")
     clinic = relationship("Clinic", back_populates="address")
+    nearest_clinics = relationship(
+        "AddressNearestClinics", back_populates="address", cascade="all, delete-orphan"
+    )
+
+
+class PostalCode(AsyncAttrs, Base):
+    # Every postal code with its address and coordinates, bulk-loaded from an offline
+    # dataset by `app.services.catalog.postal_codes.load_postal_codes()`
+    __tablename__ = "postalcodes"
+
+    postal_code = Column("postal_code", String, primary_key=True, nullable=False)
+    address = Column("address", String, nullable=False)
+    latitude = Column("latitude", Numeric(9, 6), nullable=False)
+    longitude = Column("longitude", Numeric(9, 6), nullable=False)
+    updated_at = Column(
+        "updated_at",
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class AddressNearestClinics(AsyncAttrs, Base):
+    # The nearest clinics of one type to an address, precomputed by
+    # `app.services.catalog.nearest_clinics.refresh_nearest_clinics()`
+    __tablename__ = "addressnearestclinics"
+
+    address_id = Column(
+        "address_id",
+        String,
+        ForeignKey("addresses.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    clinic_type = Column("clinic_type", String, primary_key=True, nullable=False)
+    # `ClinicCoordinates.version` the list was computed against
+    clinics_version = Column("clinics_version", String, nullable=False)
+    # Comma-separated clinic ids and distances in km, nearest first
+    clinic_ids = Column("clinic_ids", Text, nullable=False)
+    distances_km = Column("distances_km", Text, nullable=False)
+    # Whether the list holds every clinic of the type, rather than the nearest N
+    complete = Column("complete", Boolean, nullable=False)
+    updated_at = Column(
+        "updated_at",
+        DateTime,
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+    address = relationship("Address", back_populates="nearest_clinics")
 
 
 class Vaccine(AsyncAttrs, Base):
@@ -142,6 +202,9 @@ class Vaccine(AsyncAttrs, Base):
 
 class VaccineCriteria(AsyncAttrs, Base):
     __tablename__ = "vaccinecriteria"
+    __table_args__ = (
+        Index("ix_vaccinecriteria_age_months", "min_age_months", "max_age_months"),
+    )
 
     id = Column(
         "id",
@@ -152,6 +215,10 @@ class VaccineCriteria(AsyncAttrs, Base):
     )
     vaccine_id = Column("vaccine_id", String, ForeignKey("vaccines.id"), nullable=False)
     age_criteria = Column("age_criteria", String)
+    # The inclusive range of ages in months that `age_criteria` covers, as parsed by
+    # app/services/catalog/eligibility.py; no maximum for e.g. "65+ years"
+    min_age_months = Column("min_age_months", Integer, nullable=False, default=0)
+    max_age_months = Column("max_age_months", Integer, nullable=True)
     gender_criteria = Column("gender_criteria", String)
     health_condition_criteria = Column("health_condition_criteria", String)
     doses_required = Column("doses_required", Integer, nullable=False)
@@ -172,6 +239,10 @@ class VaccineCriteria(AsyncAttrs, Base):
 
 class BookingSlot(AsyncAttrs, Base):
     __tablename__ = "bookingslots"
+    __table_args__ = (
+        UniqueConstraint("polyclinic_id", "vaccine_id", "datetime"),
+        Index("ix_bookingslots_vaccine_id_datetime", "vaccine_id", "datetime"),
+    )
 
     id = Column(
         "id",
@@ -213,7 +284,11 @@ class VaccineRecord(AsyncAttrs, Base):
     )
     user_id = Column("user_id", String, ForeignKey("users.id"), nullable=False)
     booking_slot_id = Column(
-        "booking_slot_id", String, ForeignKey("bookingslots.id"), nullable=False
+        "booking_slot_id",
+        String,
+        ForeignKey("bookingslots.id"),
+        unique=True,
+        nullable=False,
     )
     status = Column("status", String, nullable=False)
     created_at = Column(
@@ -229,3 +304,115 @@ class VaccineRecord(AsyncAttrs, Base):
 
     user = relationship("User", back_populates="vaccine_records")
     booking_slot = relationship("BookingSlot", back_populates="vaccine_record")
+
+
+class SlotHold(AsyncAttrs, Base):
+    # A short-lived lease on a booking slot, see `app.services.booking.holds.SlotHolds`
+    __tablename__ = "slotholds"
+    __table_args__ = (
+        Index("ix_slotholds_user_id", "user_id"),
+        Index("ix_slotholds_expires_at", "expires_at"),
+    )
+
+    id = Column(
+        "id",
+        String,
+        primary_key=True,
+        nullable=False,
+        default=lambda: str(uuid.uuid4()),
+    )
+    booking_slot_id = Column(
+        "booking_slot_id",
+        String,
+        ForeignKey("bookingslots.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+    )
+    user_id = Column(
+        "user_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    # In UTC; the hold is void from then on, even before the row is deleted
+    expires_at = Column("expires_at", DateTime, nullable=False)
+
+
+class IdempotencyKey(AsyncAttrs, Base):
+    # The response to a booking mutation sent with an `Idempotency-Key` header, see
+    # `app.services.booking.idempotency.IdempotencyStore`
+    __tablename__ = "idempotencykeys"
+    __table_args__ = (Index("ix_idempotencykeys_expires_at", "expires_at"),)
+
+    user_id = Column(
+        "user_id",
+        String,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    key = Column("key", String(255), primary_key=True, nullable=False)
+    fingerprint = Column("fingerprint", String(64), nullable=False)
+    # Unset while the request is still running
+    status_code = Column("status_code", Integer, nullable=True)
+    body = Column("body", LargeBinary, nullable=True)
+    media_type = Column("media_type", String, nullable=True)
+    # In UTC; the key may be reused from then on, even before the row is deleted
+    expires_at = Column("expires_at", DateTime, nullable=False)
+
+
+class WaitlistEntry(AsyncAttrs, Base):
+    # A user waiting for a freed slot, see `app.services.booking.waitlist.Waitlist`
+    __tablename__ = "waitlistentries"
+    __table_args__ = (
+        Index("ix_waitlistentries_vaccine_id_created_at", "vaccine_id", "created_at"),
+        Index("ix_waitlistentries_user_id", "user_id"),
+    )
+
+    id = Column(
+        "id",
+        String,
+        primary_key=True,
+        nullable=False,
+        default=lambda: str(uuid.uuid4()),
+    )
+    user_id = Column(
+        "user_id", String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    vaccine_id = Column(
+        "vaccine_id",
+        String,
+        ForeignKey("vaccines.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # Naive clinic-local times, like slot datetimes; unbounded if unset
+    start_datetime = Column("start_datetime", DateTime, nullable=True)
+    end_datetime = Column("end_datetime", DateTime, nullable=True)
+    # The hold offered once a matching slot was freed; the entry is done with once
+    # the hold is gone
+    offer_hold_id = Column("offer_hold_id", String, nullable=True)
+    # In UTC, and the queue order
+    created_at = Column("created_at", DateTime, nullable=False)
+
+    clinics = relationship(
+        "WaitlistEntryClinic", back_populates="entry", cascade="all, delete-orphan"
+    )
+
+
+class WaitlistEntryClinic(AsyncAttrs, Base):
+    # A polyclinic a waitlist entry accepts; an entry without any accepts every one
+    __tablename__ = "waitlistentryclinics"
+
+    entry_id = Column(
+        "entry_id",
+        String,
+        ForeignKey("waitlistentries.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    polyclinic_id = Column(
+        "polyclinic_id",
+        String,
+        ForeignKey("clinics.id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+
+    entry = relationship("WaitlistEntry", back_populates="clinics")
@@ -0,0 +1,181 @@
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.auth.admin import require_admin
+from app.models.database import get_db, run_after_commit
+from app.models.models import BookingSlot, Clinic, Vaccine
+from app.schemas.booking import (
+    ClinicClosureRequest,
+    ClinicClosureResponse,
+    GenerateSlotsRequest,
+    SlotGenerationResponse,
+)
+from app.schemas.clinic import NearestClinicsRefreshResponse
+from app.services.booking.availability import (
+    AvailabilityIndex,
+    get_availability_index,
+)
+from app.services.booking.closures import close_clinic
+from app.services.booking.events import SLOT_TAKEN, SlotEventBroker, get_slot_events
+from app.services.booking.holds import SlotHolds, get_slot_holds
+from app.services.booking.slot_generation import expand_templates, load_slots
+from app.services.catalog.clinic_catalog import ClinicCatalog, get_clinic_catalog
+from app.services.catalog.coordinates import ClinicCoordinates, get_clinic_coordinates
+from app.services.catalog.nearest_clinics import refresh_all_nearest_clinics
+
+router = APIRouter(
+    prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.post(
+    "/slots/generate",
+    status_code=status.HTTP_200_OK,
+    response_model=SlotGenerationResponse,
+)
+async def generate_booking_slots(
+    generate_request: GenerateSlotsRequest,
+    db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+):
+    templates = generate_request.templates
+
+    # Step 1: Check every template refers to an existing clinic and vaccine
+    polyclinic_ids = {str(template.polyclinic_id) for template in templates}
+    vaccine_ids = {str(template.vaccine_id) for template in templates}
+    known_polyclinics = await db.scalar(
+        select(func.count()).where(Clinic.id.in_(polyclinic_ids))
+    )
+    known_vaccines = await db.scalar(
+        select(func.count()).where(Vaccine.id.in_(vaccine_ids))
+    )
+
+    if known_polyclinics != len(polyclinic_ids) or known_vaccines != len(vaccine_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Templates refer to unknown clinics or vaccines.",
+        )
+
+    # Step 2: Expand the templates and load the slots in batches
+    report = await load_slots(
+        db,
+        expand_templates(
+            templates, generate_request.start_date, generate_request.end_date
+        ),
+    )
+
+    # Step 3: Load just the new slots into the availability index
+    if report.inserted:
+        await availability.add_slots(
+            db,
+            BookingSlot.polyclinic_id.in_(polyclinic_ids),
+            BookingSlot.vaccine_id.in_(vaccine_ids),
+            BookingSlot.datetime >= generate_request.start_date,
+            BookingSlot.datetime < generate_request.end_date + timedelta(days=1),
+        )
+
+    return SlotGenerationResponse(
+        generated=report.generated,
+        inserted=report.inserted,
+        seconds=report.seconds,
+        rows_per_second=report.rows_per_second,
+    )
+
+
+@router.post(
+    "/closures",
+    status_code=status.HTTP_200_OK,
+    response_model=ClinicClosureResponse,
+)
+async def close_clinic_window(
+    closure_request: ClinicClosureRequest,
+    db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    holds: SlotHolds = Depends(get_slot_holds),
+    events: SlotEventBroker = Depends(get_slot_events),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+):
+    polyclinic_id = str(closure_request.polyclinic_id)
+
+    # Step 1: Check the clinic exists
+    clinic_exists = await db.scalar(select(Clinic.id).filter_by(id=polyclinic_id))
+    if not clinic_exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Polyclinic with id {polyclinic_id} not found.",
+        )
+
+    # Step 2: Move, cancel and remove in one transaction, as naive clinic-local times
+    try:
+        report = await close_clinic(
+            db,
+            polyclinic_id,
+            closure_request.start_datetime.replace(tzinfo=None),
+            closure_request.end_datetime.replace(tzinfo=None),
+            clinic_coordinates,
+            holds,
+            availability.now(),
+            search_days=closure_request.search_days,
+            cancel_unmatched=closure_request.cancel_unmatched,
+        )
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Slots were booked during the closure. Please try again.",
+        )
+
+    # Step 3: The new slots are taken and the removed ones are gone for good, so both
+    # leave the availability index and are announced as taken
+    taken_slot_ids = [
+        to_slot_id for _, _, to_slot_id in report.rescheduled
+    ] + report.removed_slot_ids
+
+    await holds.release_slots(db, taken_slot_ids)
+
+    def update_availability():
+        for slot_id in taken_slot_ids:
+            availability.mark_booked(slot_id)
+
+    run_after_commit(db, update_availability)
+    await events.notify(db, SLOT_TAKEN, taken_slot_ids)
+    await db.commit()
+
+    return ClinicClosureResponse(
+        rescheduled=[
+            {
+                "vaccine_record_id": record_id,
+                "from_slot_id": from_slot_id,
+                "to_slot_id": to_slot_id,
+            }
+            for record_id, from_slot_id, to_slot_id in report.rescheduled
+        ],
+        cancelled=report.cancelled,
+        unmatched=report.unmatched,
+        removed_slots=len(report.removed_slot_ids),
+    )
+
+
+@router.post(
+    "/nearest-clinics/refresh",
+    status_code=status.HTTP_200_OK,
+    response_model=NearestClinicsRefreshResponse,
+)
+async def refresh_nearest_clinic_lists(
+    db: AsyncSession = Depends(get_db),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    clinic_catalog: ClinicCatalog = Depends(get_clinic_catalog),
+):
+    # Step 1: Reload the clinics, as they may have just been changed
+    clinic_coordinates.invalidate()
+    clinic_catalog.invalidate()
+
+    # Step 2: Recompute the lists of every address they made out of date
+    refreshed = await refresh_all_nearest_clinics(db, clinic_coordinates)
+
+    return NearestClinicsRefreshResponse(refreshed_addresses=refreshed)
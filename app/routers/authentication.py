@@ -14,9 +14,16 @@ from app.auth.oauth2 import (
 )
 from app.auth.password import hash_password, verify_password
 from app.models.database import get_db
-from app.models.models import Address, User
+from app.models.models import User
 from app.schemas.oauth2 import Token
 from app.schemas.user import UserCreate, UserCreateResponse
+from app.services.catalog.coordinates import ClinicCoordinates, get_clinic_coordinates
+from app.services.catalog.nearest_clinics import refresh_home_clinics
+from app.services.catalog.postal_codes import (
+    PostalCodeIndex,
+    get_postal_code_index,
+    resolve_address,
+)
 
 router = APIRouter(tags=["Authentication"])
 
@@ -25,7 +32,11 @@ router = APIRouter(tags=["Authentication"])
     "/signup", status_code=status.HTTP_201_CREATED, response_model=UserCreateResponse
 )
 async def signup(
-    request: Request, user: UserCreate, db: AsyncSession = Depends(get_db)
+    request: Request,
+    user: UserCreate,
+    db: AsyncSession = Depends(get_db),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    postal_codes: PostalCodeIndex = Depends(get_postal_code_index),
 ):
 
     stmt = select(User).filter(or_(User.email == user.email, User.nric == user.nric))
@@ -45,10 +56,8 @@ async def signup(
             detail="Password and password confirmation do not match.",
         )
 
-    stmt = select(Address).filter_by(postal_code=user.postal_code)
-
-    result = await db.execute(stmt)
-    address = result.scalars().first()
+    # Get the home's address, created from the postal code dataset if new
+    address = await resolve_address(db, postal_codes, user.postal_code)
 
     # Hash the password
     hashed_password = hash_password(user.password)
@@ -67,6 +76,8 @@ async def signup(
 
     if address:
         data["address"] = address
+        # Precompute the nearest clinics of the home, on a best-effort basis
+        await refresh_home_clinics(db, clinic_coordinates, address.id)
     data.pop("postal_code", None)
     data.pop("password_confirm", None)  # Don't raise error if it's not there
 
@@ -1,34 +1,90 @@
+import asyncio
 from collections import defaultdict
-from datetime import date, datetime, time
+from datetime import date, datetime, time, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from fastapi.responses import JSONResponse
-from geopy.distance import geodesic
-from sqlalchemy import func
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import exists, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
 from app.auth.oauth2 import get_current_user
-from app.models.database import get_db
+from app.core.config import settings
+from app.models.database import get_db, run_after_commit
 from app.models.models import (
-    Address,
     BookingSlot,
     Clinic,
     User,
     Vaccine,
+    VaccineCriteria,
     VaccineRecord,
 )
 from app.schemas.booking import (
     AvailableSlotResponse,
     BookingSlotResponse,
+    ClinicCalendarResponse,
     RescheduleSlotRequest,
+    ScheduleSeriesRequest,
     ScheduleSlotRequest,
+    SlotHoldResponse,
+    SlotRanking,
+    WaitlistEntryResponse,
+    WaitlistRequest,
 )
+from app.schemas.clinic import PolyclinicResponse
 from app.schemas.record import VaccineRecordResponse
+from app.schemas.vaccine import VaccineResponse
+from app.services.booking.availability import (
+    AvailabilityIndex,
+    FreeSlot,
+    get_availability_index,
+)
+from app.services.booking.calendar import encode_bitmap
+from app.services.booking.events import (
+    SLOT_FREED,
+    SLOT_TAKEN,
+    SlotEventBroker,
+    get_slot_events,
+    to_server_sent_event,
+)
+from app.services.booking.holds import Hold, SlotHolds, get_slot_holds
+from app.services.booking.idempotency import (
+    IdempotencyStore,
+    fingerprint,
+    get_idempotency_store,
+)
+from app.services.booking.pagination import decode_cursor, encode_cursor
+from app.services.booking.ranking import rank_by_distance_and_wait
+from app.services.booking.scheduling import move_booking, reserve_slots
+from app.services.booking.waitlist import Waitlist, WaitlistEntry, get_waitlist
+from app.services.catalog.clinic_catalog import ClinicCatalog, get_clinic_catalog
+from app.services.catalog.coordinates import ClinicCoordinates, get_clinic_coordinates
+from app.services.catalog.distance_matrix import DistanceMatrix, get_distance_matrix
+from app.services.catalog.name_index import CatalogNameIndex, get_catalog_name_index
+from app.services.catalog.nearest_clinics import load_home_clinics
+from app.services.etag import bump_user_versions
 
 router = APIRouter(prefix="/bookings", tags=["Booking"])
 
+# Times a series booking is retried when its slots are taken by concurrent bookings
+SERIES_BOOKING_ATTEMPTS = 3
+
+# Days shown by the availability calendar by default, and at most
+CALENDAR_DEFAULT_DAYS = 30
+CALENDAR_MAX_DAYS = 92
+
 
 @router.get(
     "/available",
@@ -37,56 +93,89 @@ router = APIRouter(prefix="/bookings", tags=["Booking"])
 )
 async def get_available_booking_slots(
     request: Request,
+    response: Response,
     vaccine_name: str,
     polyclinic_name: str | None = None,
     start_datetime: date | datetime | str | None = None,
     end_datetime: date | datetime | str | None = None,
     polyclinic_limit: int = 3,
     timeslot_limit: int = 1,
+    cursor: str | None = None,
+    rank_by: SlotRanking = SlotRanking.DISTANCE,
+    # Score per km of travel and per day of waiting, for rank_by=score
+    distance_weight: float = Query(1.0, ge=0),
+    wait_weight: float = Query(1.0, ge=0),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    name_index: CatalogNameIndex = Depends(get_catalog_name_index),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    holds: SlotHolds = Depends(get_slot_holds),
+    clinic_catalog: ClinicCatalog = Depends(get_clinic_catalog),
+    distance_matrix: DistanceMatrix = Depends(get_distance_matrix),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
 
+    # Resolve the free-text names to catalog ids
+    vaccine_ids = await name_index.resolve_vaccines(db, vaccine_name)
+    polyclinic_ids = (
+        await name_index.resolve_clinics(db, polyclinic_name)
+        if polyclinic_name
+        else None
+    )
+
+    if not vaccine_ids or polyclinic_ids == set():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No available slots for {vaccine_name}.",
+        )
+
+    # Query parameters arrive as strings, so parse them as ISO 8601 dates or datetimes
+    try:
+        if isinstance(start_datetime, str):
+            start_datetime = datetime.fromisoformat(start_datetime)
+        if isinstance(end_datetime, str):
+            end_datetime = (
+                datetime.fromisoformat(end_datetime)
+                if "T" in end_datetime or " " in end_datetime
+                else date.fromisoformat(end_datetime)
+            )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_datetime and end_datetime must be ISO 8601 dates or datetimes.",
+        )
+
     # Convert date objects to datetime if needed
     if isinstance(start_datetime, date) and not isinstance(start_datetime, datetime):
         start_datetime = datetime.combine(start_datetime, time.min)
     if isinstance(end_datetime, date) and not isinstance(end_datetime, datetime):
         end_datetime = datetime.combine(end_datetime, time.max)
 
-    # Step 1: Create a query to exclude already-booked slots
-    booked_slots_subquery = select(VaccineRecord.booking_slot_id)
+    # Drop any UTC offset, as slot datetimes are stored as naive clinic-local times
+    if isinstance(start_datetime, datetime):
+        start_datetime = start_datetime.replace(tzinfo=None)
+    if isinstance(end_datetime, datetime):
+        end_datetime = end_datetime.replace(tzinfo=None)
 
-    # Step 2: Select booking slots NOT in VaccineRecord table
-    stmt = (
-        select(BookingSlot)
-        .join(BookingSlot.vaccine)
-        .join(BookingSlot.polyclinic)
-        .options(selectinload(BookingSlot.polyclinic).selectinload(Clinic.address))
-        .where(
-            func.lower(Vaccine.name).like(f"%{vaccine_name.lower()}%"),
-            BookingSlot.id.notin_(booked_slots_subquery),
-        )
-    )
+    # Continue after the slots shown by the previous pages, if a cursor was given
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Step 3: Optional filtering by datetime range if provided
-    if start_datetime and end_datetime:
-        stmt = stmt.where(BookingSlot.datetime.between(start_datetime, end_datetime))
-    elif start_datetime:
-        stmt = stmt.where(BookingSlot.datetime >= start_datetime)
-    elif end_datetime:
-        stmt = stmt.where(BookingSlot.datetime <= end_datetime)
-
-    # Step 4: Optional filter by polyclinic_name if provided
-    if polyclinic_name:
-        stmt = stmt.where(func.lower(Clinic.name).like(f"%{polyclinic_name.lower()}%"))
-
-    # Step 5: Order and return results
-    stmt = stmt.order_by(BookingSlot.datetime.asc())
-
-    result = await db.execute(stmt)
-    slots = result.scalars().all()
+    # Step 1: Look up the free slots, ordered by datetime, in the availability index
+    # Slots held by other users are not available to this one
+    slots = await availability.search(
+        db,
+        vaccine_ids,
+        polyclinic_ids,
+        start_datetime,
+        end_datetime,
+        after,
+        exclude=await holds.held_by_others(db, current_user.id),
+    )
 
     if not slots:
         raise HTTPException(
@@ -94,41 +183,63 @@ async def get_available_booking_slots(
             detail=f"No available slots for {vaccine_name}.",
         )
 
-    # Step 6: Retrieve user address
-    user_address_stmt = (
-        select(Address.longitude, Address.latitude)
-        .join(User.address)
-        .where(User.id == current_user.id)
-    )
-
-    result = await db.execute(user_address_stmt)
-    user_address = result.first()
-
-    if user_address:
-        user_longitude, user_latitude = user_address
-
-        # Step 7: Compute distance once per unique polyclinic
-        unique_polyclinics = {slot.polyclinic_id: slot.polyclinic for slot in slots}
-        clinic_distances = {
-            polyclinic_id: geodesic(
-                (user_latitude, user_longitude),
-                (polyclinic.address.latitude, polyclinic.address.longitude),
-            ).km
-            for polyclinic_id, polyclinic in unique_polyclinics.items()
-        }
+    # Step 2: Retrieve the user's home, with its precomputed nearest clinics
+    home = await load_home_clinics(db, clinic_coordinates, current_user.id)
 
-        # Step 8: Sort polyclinics by distance
-        sorted_polyclinics = sorted(unique_polyclinics, key=clinic_distances.get)
+    if home:
+        # Step 3: Group the slots by polyclinic, keeping their datetime order
         polyclinic_slots = defaultdict(list)
         for slot in slots:
             polyclinic_slots[slot.polyclinic_id].append(slot)
 
+        # Step 4: Rank the polyclinics in one vectorized pass, either by distance or
+        # by weighing distance against the wait for their earliest slot. A clinic's
+        # later slots only score worse, so its earliest slot stands for all of them.
+        candidate_ids = list(polyclinic_slots)
+        # Distances are looked up in the distance matrix if one is loaded
+        if rank_by == SlotRanking.SCORE:
+            distances = await distance_matrix.distances(
+                db, clinic_coordinates, home.postal_code, candidate_ids
+            )
+            if distances is None:
+                distances = await clinic_coordinates.distances(
+                    db, home.latitude, home.longitude, candidate_ids
+                )
+            positions = rank_by_distance_and_wait(
+                distances,
+                [polyclinic_slots[id][0].datetime for id in candidate_ids],
+                distance_weight,
+                wait_weight,
+                polyclinic_limit,
+            )
+            ranked_polyclinics = [candidate_ids[p] for p in positions]
+        else:
+            # The precomputed lists answer when enough candidates are among them
+            nearest_polyclinics = home.nearest(
+                polyclinic_limit, among=set(candidate_ids)
+            )
+            if nearest_polyclinics is None:
+                nearest_polyclinics = await distance_matrix.nearest(
+                    db,
+                    clinic_coordinates,
+                    home.postal_code,
+                    polyclinic_limit,
+                    among=candidate_ids,
+                )
+            if nearest_polyclinics is None:
+                nearest_polyclinics = await clinic_coordinates.nearest(
+                    db,
+                    home.latitude,
+                    home.longitude,
+                    polyclinic_limit,
+                    among=candidate_ids,
+                )
+            ranked_polyclinics = [id for id, _ in nearest_polyclinics]
+
         final_slots = []
-        for polyclinic_id in sorted_polyclinics[:polyclinic_limit]:
+        for polyclinic_id in ranked_polyclinics:
             final_slots.extend(polyclinic_slots[polyclinic_id][:timeslot_limit])
 
-        return final_slots
-
     else:
         polyclinic_slot_count = defaultdict(int)
         final_slots = []
@@ -148,7 +259,357 @@ async def get_available_booking_slots(
                 final_slots.append(slot)
                 polyclinic_slot_count[slot.polyclinic_id] += 1
 
-        return final_slots
+    # Step 5: Hand out a cursor to the next page, if some slots were left out. It
+    # keeps the position of every polyclinic shown so far, so slots of one polyclinic
+    # that fall before the last slot shown of another are not skipped.
+    if len(final_slots) < len(slots):
+        positions = dict(after or {})
+        for slot in final_slots:
+            positions[slot.polyclinic_id] = max(
+                positions.get(slot.polyclinic_id, (datetime.min, "")),
+                (slot.datetime, slot.id),
+            )
+        response.headers["X-Next-Cursor"] = encode_cursor(positions)
+
+    # Step 6: Add the polyclinics of the selected slots from the clinic catalog
+    return await _available_slot_responses(db, clinic_catalog, final_slots)
+
+
+@router.get(
+    "/events",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+async def stream_slot_events(
+    request: Request,
+    subscribe: list[str] = Query(...),
+    current_user: User = Depends(get_current_user),
+    events: SlotEventBroker = Depends(get_slot_events),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    # Each subscription is "<vaccine id>" for every polyclinic, or
+    # "<vaccine id>:<polyclinic id>" for a single one
+    pairs = set()
+    for subscription in subscribe:
+        vaccine_id, _, polyclinic_id = subscription.partition(":")
+        if not vaccine_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid subscription {subscription}.",
+            )
+        pairs.add((vaccine_id, polyclinic_id or None))
+
+    async def event_stream():
+        async with events.subscribe(pairs) as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.slot_events_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield to_server_sent_event(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/calendar",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ClinicCalendarResponse],
+)
+async def get_availability_calendar(
+    request: Request,
+    vaccine_name: str,
+    polyclinic_name: str | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    name_index: CatalogNameIndex = Depends(get_catalog_name_index),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    start_date = start_date or date.today()
+    end_date = end_date or start_date + timedelta(days=CALENDAR_DEFAULT_DAYS - 1)
+    if end_date < start_date or (end_date - start_date).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"end_date must be within {CALENDAR_MAX_DAYS} days on or after start_date.",
+        )
+
+    # Step 1: Resolve the free-text names to catalog ids
+    vaccine_ids = await name_index.resolve_vaccines(db, vaccine_name)
+    polyclinic_ids = (
+        await name_index.resolve_clinics(db, polyclinic_name)
+        if polyclinic_name
+        else None
+    )
+
+    if not vaccine_ids or polyclinic_ids == set():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No available slots for {vaccine_name}.",
+        )
+
+    # Step 2: Summarise the free slots per clinic and day from the calendar bitsets
+    calendar = await availability.free_days(
+        db, vaccine_ids, polyclinic_ids, start_date, end_date
+    )
+
+    return [
+        {
+            "polyclinic_id": polyclinic_id,
+            "polyclinic_name": name_index.clinics.name(polyclinic_id),
+            "days": [
+                {
+                    "date": day,
+                    "free_slots": calendar_day.free_slots,
+                    "bitmap": encode_bitmap(calendar_day.bits),
+                }
+                for day, calendar_day in days.items()
+            ],
+        }
+        for polyclinic_id, days in sorted(
+            calendar.items(),
+            key=lambda item: name_index.clinics.name(item[0]) or item[0],
+        )
+    ]
+
+
+def _waitlist_entry_response(entry: WaitlistEntry, offer: Hold | None) -> dict:
+    return {
+        **entry._asdict(),
+        "polyclinic_ids": sorted(entry.polyclinic_ids or ()) or None,
+        "offer": offer._asdict() if offer else None,
+    }
+
+
+@router.post(
+    "/waitlist",
+    status_code=status.HTTP_201_CREATED,
+    response_model=WaitlistEntryResponse,
+)
+async def join_waitlist(
+    request: Request,
+    waitlist_request: WaitlistRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    waitlist: Waitlist = Depends(get_waitlist),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    vaccine_id = str(waitlist_request.vaccine_id)
+    polyclinic_ids = (
+        {str(id) for id in waitlist_request.polyclinic_ids}
+        if waitlist_request.polyclinic_ids
+        else None
+    )
+
+    # Step 1: Check the vaccine and polyclinics exist
+    vaccine_exists = await db.scalar(select(Vaccine.id).filter_by(id=vaccine_id))
+    if not vaccine_exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Vaccine with id {vaccine_id} not found.",
+        )
+
+    if polyclinic_ids:
+        clinic_count = await db.scalar(
+            select(func.count(Clinic.id)).where(Clinic.id.in_(polyclinic_ids))
+        )
+        if clinic_count != len(polyclinic_ids):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Some polyclinics were not found.",
+            )
+
+    # Step 2: Limit how many slots a user can wait for
+    if (
+        await waitlist.count_for(db, current_user.id)
+        >= settings.max_waitlist_entries_per_user
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Cannot wait for more than {settings.max_waitlist_entries_per_user} slots.",
+        )
+
+    # Step 3: Join the back of the queue, as naive clinic-local times like the slots
+    start_datetime, end_datetime = (
+        value.replace(tzinfo=None) if value else None
+        for value in (waitlist_request.start_datetime, waitlist_request.end_datetime)
+    )
+    entry = await waitlist.join(
+        db, current_user.id, vaccine_id, polyclinic_ids, start_datetime, end_datetime
+    )
+    await db.commit()
+
+    return _waitlist_entry_response(entry, None)
+
+
+@router.get(
+    "/waitlist",
+    status_code=status.HTTP_200_OK,
+    response_model=list[WaitlistEntryResponse],
+)
+async def get_waitlist_entries(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    waitlist: Waitlist = Depends(get_waitlist),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    return [
+        _waitlist_entry_response(entry, offer)
+        for entry, offer in await waitlist.entries_for(db, current_user.id)
+    ]
+
+
+@router.delete(
+    "/waitlist/{entry_id}",
+    status_code=status.HTTP_200_OK,
+)
+async def leave_waitlist(
+    request: Request,
+    entry_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    waitlist: Waitlist = Depends(get_waitlist),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    entry = await waitlist.get(db, entry_id)
+
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Waitlist entry with id {entry_id} not found.",
+        )
+
+    if entry.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You are not authorized to change this waitlist entry.",
+        )
+
+    await waitlist.leave(db, entry_id)
+    await db.commit()
+
+    return JSONResponse(content={"detail": "Waitlist entry successfully removed."})
+
+
+async def _available_slot_responses(
+    db: AsyncSession, clinic_catalog: ClinicCatalog, slots: list[FreeSlot]
+) -> list[AvailableSlotResponse]:
+    """
+    Builds the responses of free slots found in the availability index, with their
+    polyclinics and addresses read from the clinic catalog.
+
+    Args:
+        db (AsyncSession): The database session, used only when a reload is due.
+        clinic_catalog (ClinicCatalog): The clinic catalog.
+        slots (list[FreeSlot]): The free slots.
+
+    Returns:
+        list[AvailableSlotResponse]: The responses, in the order of `slots`.
+    """
+    clinics = await clinic_catalog.get_many(
+        db, list({slot.polyclinic_id for slot in slots})
+    )
+    return [
+        AvailableSlotResponse(
+            id=slot.id,
+            datetime=slot.datetime,
+            vaccine_id=slot.vaccine_id,
+            polyclinic=PolyclinicResponse.model_validate(
+                clinics[slot.polyclinic_id], from_attributes=True
+            ),
+        )
+        for slot in slots
+        if slot.polyclinic_id in clinics
+    ]
+
+
+async def _book_slot(
+    db: AsyncSession,
+    user_id: str,
+    slot_id: str,
+    availability: AvailabilityIndex,
+    holds: SlotHolds,
+    events: SlotEventBroker,
+) -> VaccineRecord:
+    """
+    Books a slot for a user and commits, releasing the user's hold on it if any.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (str): The id of the user booking the slot.
+        slot_id (str): The booking slot id.
+        availability (AvailabilityIndex): The availability index to update.
+        holds (SlotHolds): The slot holds.
+        events (SlotEventBroker): The broker to announce the slot is taken on.
+
+    Returns:
+        VaccineRecord: The new vaccine record.
+
+    Raises:
+        HTTPException: Raise 404 if the slot doesn't exist, or 409 if it is booked or
+            held by another user.
+    """
+    # Step 1: Respect holds placed by other users
+    if await holds.is_held_by_other(db, slot_id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Slot is on hold for another user.",
+        )
+
+    # Step 2: Book the slot with a single conditional insert, which skips the slot if it
+    # doesn't exist or is already booked, including by a concurrent request
+    booked_records = await reserve_slots(db, user_id, [slot_id])
+
+    if not booked_records:
+        # Step 3: Only on failure, tell a missing slot apart from a taken one
+        slot_exists = await db.scalar(select(BookingSlot.id).filter_by(id=slot_id))
+        if not slot_exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Booking slot with slot id {slot_id} not found.",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Slot already booked."
+        )
+
+    # Drop the hold with the booking, and take the slot out of the availability index
+    # once the booking is committed
+    await holds.release_slots(db, [slot_id])
+    run_after_commit(db, lambda: availability.mark_booked(slot_id))
+    await events.notify(db, SLOT_TAKEN, [slot_id])
+    # Finally commit the transaction
+    await db.commit()
+
+    return booked_records[0]
+
+
+def _record_response(vaccine_record: VaccineRecord, status_code: int) -> JSONResponse:
+    # Serialised here rather than by FastAPI, so the response can be stored for retries
+    return JSONResponse(
+        content=jsonable_encoder(VaccineRecordResponse.model_validate(vaccine_record)),
+        status_code=status_code,
+    )
 
 
 @router.get(
@@ -161,6 +622,7 @@ async def get_booking_slot(
     id: str,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    clinic_catalog: ClinicCatalog = Depends(get_clinic_catalog),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
@@ -168,7 +630,6 @@ async def get_booking_slot(
     stmt = (
         select(BookingSlot)
         .options(
-            selectinload(BookingSlot.polyclinic).selectinload(Clinic.address),
             selectinload(BookingSlot.vaccine).selectinload(Vaccine.vaccine_criterias),
         )
         .filter_by(id=id)
@@ -183,7 +644,17 @@ async def get_booking_slot(
             detail=f"Slot with booking id {id} not found.",
         )
 
-    return slot
+    # The polyclinic and its address come from the clinic catalog
+    clinics = await clinic_catalog.get_many(db, [slot.polyclinic_id])
+
+    return BookingSlotResponse(
+        id=slot.id,
+        datetime=slot.datetime,
+        polyclinic=PolyclinicResponse.model_validate(
+            clinics[slot.polyclinic_id], from_attributes=True
+        ),
+        vaccine=VaccineResponse.model_validate(slot.vaccine),
+    )
 
 
 @router.post(
@@ -194,71 +665,290 @@ async def get_booking_slot(
 async def schedule_vaccination_slot(
     request: Request,
     schedule_request: ScheduleSlotRequest,
+    idempotency_key: str | None = Header(None, max_length=255),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    holds: SlotHolds = Depends(get_slot_holds),
+    events: SlotEventBroker = Depends(get_slot_events),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
+    user_id = current_user.id
+    slot_id = str(schedule_request.booking_slot_id)
 
-    # Step 1: Check if the booking slot already exists and isn't booked
-    booking_slot_query = await db.execute(
-        select(BookingSlot).where(
-            BookingSlot.id == str(schedule_request.booking_slot_id)
+    async def schedule():
+        vaccine_record = await _book_slot(
+            db, user_id, slot_id, availability, holds, events
         )
+        return _record_response(vaccine_record, status.HTTP_201_CREATED)
+
+    # A retry with the same Idempotency-Key gets the original response
+    return await idempotency.run(
+        db, user_id, idempotency_key, fingerprint("schedule", slot_id), schedule
     )
-    booking_slot = booking_slot_query.scalar_one_or_none()
 
-    if not booking_slot:
+
+@router.post(
+    "/holds",
+    status_code=status.HTTP_201_CREATED,
+    response_model=SlotHoldResponse,
+)
+async def hold_booking_slot(
+    request: Request,
+    schedule_request: ScheduleSlotRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    holds: SlotHolds = Depends(get_slot_holds),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    slot_id = str(schedule_request.booking_slot_id)
+
+    # Step 1: Check the slot exists and isn't booked
+    booked = aliased(VaccineRecord)
+    slot_query = await db.execute(
+        select(
+            BookingSlot.id,
+            exists().where(booked.booking_slot_id == BookingSlot.id),
+        ).where(BookingSlot.id == slot_id)
+    )
+    slot = slot_query.one_or_none()
+
+    if not slot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Booking slot with slot id {str(schedule_request.booking_slot_id)} not found.",
+            detail=f"Booking slot with slot id {slot_id} not found.",
         )
 
-    # Step 2: Ensure this slot hasn't already been booked
-    booked_result = await db.execute(
-        select(VaccineRecord).where(
-            VaccineRecord.booking_slot_id == str(schedule_request.booking_slot_id)
+    if slot[1]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Slot already booked."
         )
-    )
-    existing_record = booked_result.scalar_one_or_none()
 
-    if existing_record:
+    # Step 2: Check nobody else holds the slot, and limit how many a user can hold
+    holder_id = await holds.holder_of(db, slot_id)
+
+    if holder_id not in (None, current_user.id):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Slot already booked."
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Slot is on hold for another user.",
         )
 
-    # Step 3: Create new VaccineRecord
-    new_vaccine_record = VaccineRecord(
-        user_id=current_user.id,
-        booking_slot_id=str(schedule_request.booking_slot_id),
-        status="booked",
-    )
+    if (
+        holder_id is None
+        and await holds.count_for(db, current_user.id)
+        >= settings.max_slot_holds_per_user
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Cannot hold more than {settings.max_slot_holds_per_user} slots.",
+        )
 
-    # Step 4: Create the record in the database
-    db.add(new_vaccine_record)
-    # Flush inserts the object so it gets an ID, etc.
-    await db.flush()
-    # Refresh loads up-to-date data (like auto-generated IDs)
-    await db.refresh(new_vaccine_record)
-    # Finally commit the transaction
+    # Step 3: Hold the slot, or renew the user's existing hold on it, unless another
+    # user held it since Step 2
+    hold = await holds.hold(db, slot_id, current_user.id)
+
+    if not hold:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Slot is on hold for another user.",
+        )
+
+    # Commit before answering, so the hold is seen by every worker
     await db.commit()
 
-    return new_vaccine_record
+    return hold._asdict()
+
+
+async def _get_own_hold(
+    db: AsyncSession, holds: SlotHolds, hold_id: str, user_id: str
+) -> Hold:
+    hold = await holds.get(db, hold_id)
+
+    if not hold:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Hold with id {hold_id} not found or expired.",
+        )
+
+    if hold.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You are not authorized to use this hold.",
+        )
+
+    return hold
+
+
+@router.post(
+    "/holds/{hold_id}/confirm",
+    status_code=status.HTTP_201_CREATED,
+    response_model=VaccineRecordResponse,
+)
+async def confirm_slot_hold(
+    request: Request,
+    hold_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    holds: SlotHolds = Depends(get_slot_holds),
+    events: SlotEventBroker = Depends(get_slot_events),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    hold = await _get_own_hold(db, holds, hold_id, current_user.id)
+
+    return await _book_slot(
+        db, current_user.id, hold.booking_slot_id, availability, holds, events
+    )
 
 
 @router.delete(
-    "/cancel/{record_id}",
-    status_code=status.HTTP_204_NO_CONTENT,
+    "/holds/{hold_id}",
+    status_code=status.HTTP_200_OK,
 )
-async def cancel_vaccination_slot(
+async def release_slot_hold(
     request: Request,
-    record_id: str,
+    hold_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    holds: SlotHolds = Depends(get_slot_holds),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+
+    await _get_own_hold(db, holds, hold_id, current_user.id)
+    await holds.release(db, hold_id)
+    await db.commit()
+
+    return JSONResponse(content={"detail": "Slot hold successfully released."})
+
+
+@router.post(
+    "/schedule/series",
+    status_code=status.HTTP_201_CREATED,
+    response_model=list[VaccineRecordResponse],
+)
+async def schedule_vaccination_series(
+    request: Request,
+    series_request: ScheduleSeriesRequest,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    holds: SlotHolds = Depends(get_slot_holds),
+    events: SlotEventBroker = Depends(get_slot_events),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
 
+    user_id = current_user.id
+    vaccine_id = str(series_request.vaccine_id)
+
+    # Step 1: Check the vaccine exists and work out how many doses the series has
+    vaccine_query = await db.execute(
+        select(Vaccine.id, func.max(VaccineCriteria.doses_required))
+        .outerjoin(Vaccine.vaccine_criterias)
+        .where(Vaccine.id == vaccine_id)
+        .group_by(Vaccine.id)
+    )
+    vaccine = vaccine_query.one_or_none()
+
+    if not vaccine:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Vaccine with id {vaccine_id} not found.",
+        )
+
+    doses = series_request.doses or vaccine[1] or 1
+    polyclinic_ids = (
+        {str(series_request.polyclinic_id)} if series_request.polyclinic_id else None
+    )
+    start_datetime = (
+        series_request.start_datetime.replace(tzinfo=None)
+        if series_request.start_datetime
+        else None
+    )
+
+    for _ in range(SERIES_BOOKING_ATTEMPTS):
+        # Step 2: Find a slot per dose, preferring a single polyclinic
+        series = await availability.find_series(
+            db,
+            vaccine_id,
+            doses,
+            timedelta(days=series_request.min_interval_days),
+            polyclinic_ids=polyclinic_ids,
+            start_datetime=start_datetime,
+            exclude=await holds.held_by_others(db, user_id),
+        )
+
+        if not series:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No available slots for a {doses}-dose series.",
+            )
+
+        # Step 3: Book every dose with a single statement, all or nothing
+        slot_ids = [slot.id for slot in series]
+        booked_records = await reserve_slots(db, user_id, slot_ids)
+
+        if len(booked_records) == len(slot_ids):
+            break
+
+        # Some slots were taken since the index last saw them, so drop them and retry
+        await db.rollback()
+        booked_slot_ids = {record.booking_slot_id for record in booked_records}
+        for slot_id in slot_ids:
+            if slot_id not in booked_slot_ids:
+                availability.mark_booked(slot_id)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Slots for the series were booked by others, please try again.",
+        )
+
+    # Drop the holds with the bookings, and take the slots out of the availability
+    # index once the bookings are committed
+    await holds.release_slots(db, slot_ids)
+
+    def update_availability():
+        for slot_id in slot_ids:
+            availability.mark_booked(slot_id)
+
+    run_after_commit(db, update_availability)
+    await events.notify(db, SLOT_TAKEN, slot_ids)
+    await db.commit()
+
+    positions = {slot_id: position for position, slot_id in enumerate(slot_ids)}
+    return sorted(booked_records, key=lambda record: positions[record.booking_slot_id])
+
+
+async def _cancel_booking(
+    db: AsyncSession,
+    user_id: str,
+    record_id: str,
+    availability: AvailabilityIndex,
+    events: SlotEventBroker,
+    waitlist: Waitlist,
+) -> None:
+    """
+    Cancels a user's booking and commits, returning its slot to the free slots.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (str): The id of the user cancelling.
+        record_id (str): The vaccine record id.
+        availability (AvailabilityIndex): The availability index to update.
+        events (SlotEventBroker): The broker to announce the slot is freed on.
+        waitlist (Waitlist): The waitlist to offer the slot to.
+
+    Raises:
+        HTTPException: Raise 404 if the record doesn't exist, 401 if it belongs to
+            another user, or 400 if it is no longer booked.
+    """
     # Step 1: Check if the VaccineRecord exists
     vaccine_record_query = await db.execute(
         select(VaccineRecord).where(VaccineRecord.id == record_id)
@@ -272,7 +962,7 @@ async def cancel_vaccination_slot(
         )
 
     # Step 2: Validate that the current user owns this VaccineRecord
-    if vaccine_record.user_id != current_user.id:
+    if vaccine_record.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to cancel this vaccination slot.",
@@ -287,42 +977,105 @@ async def cancel_vaccination_slot(
 
     # Step 3: Delete the record from the database
     await db.delete(vaccine_record)
+    await bump_user_versions(db, [user_id])
+    # Offer the slot to the waitlist, and return it to the availability index once
+    # the cancellation is committed
+    freed_slot_id = vaccine_record.booking_slot_id
+    await waitlist.match(db, freed_slot_id)
+    run_after_commit(db, lambda: availability.mark_free(freed_slot_id))
+    await events.notify(db, SLOT_FREED, [freed_slot_id])
     # Finally commit the transaction
     await db.commit()
 
-    return JSONResponse(content={"detail": "Vaccination slot successfully cancelled."})
 
-
-@router.post(
-    "/reschedule",
-    status_code=status.HTTP_200_OK,
-    response_model=VaccineRecordResponse,
+@router.delete(
+    "/cancel/{record_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
 )
-async def reschedule_vaccination_slot(
+async def cancel_vaccination_slot(
     request: Request,
-    reschedule_request: RescheduleSlotRequest,
+    record_id: str,
+    idempotency_key: str | None = Header(None, max_length=255),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    events: SlotEventBroker = Depends(get_slot_events),
+    waitlist: Waitlist = Depends(get_waitlist),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
+    user_id = current_user.id
 
-    # Step 1: Check if the VaccineRecord exists
+    async def cancel():
+        await _cancel_booking(db, user_id, record_id, availability, events, waitlist)
+        return JSONResponse(
+            content={"detail": "Vaccination slot successfully cancelled."}
+        )
+
+    # A retry with the same Idempotency-Key gets the original response
+    return await idempotency.run(
+        db, user_id, idempotency_key, fingerprint("cancel", record_id), cancel
+    )
+
+
+async def _reschedule_booking(
+    db: AsyncSession,
+    user_id: str,
+    record_id: str,
+    new_slot_id: str,
+    availability: AvailabilityIndex,
+    holds: SlotHolds,
+    events: SlotEventBroker,
+    waitlist: Waitlist,
+) -> VaccineRecord:
+    """
+    Moves a user's booking to another slot and commits.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (str): The id of the user rescheduling.
+        record_id (str): The vaccine record id.
+        new_slot_id (str): The booking slot id to move to.
+        availability (AvailabilityIndex): The availability index to update.
+        holds (SlotHolds): The slot holds.
+        events (SlotEventBroker): The broker to announce the slot changes on.
+        waitlist (Waitlist): The waitlist to offer the freed slot to.
+
+    Returns:
+        VaccineRecord: The moved vaccine record.
+
+    Raises:
+        HTTPException: Raise 404 if the record or slot doesn't exist, 401 if the
+            record belongs to another user, 400 if it is no longer booked, or 409 if
+            the slot is booked or held by another user.
+    """
+    booked = aliased(VaccineRecord)
+
+    # Step 1: Lock the VaccineRecord and check the desired booking slot in one query
     vaccine_record_query = await db.execute(
-        select(VaccineRecord).where(
-            VaccineRecord.id == str(reschedule_request.vaccine_record_id)
+        select(
+            VaccineRecord,
+            exists().where(BookingSlot.id == new_slot_id).label("new_slot_exists"),
+            exists()
+            .where(booked.booking_slot_id == new_slot_id)
+            .label("new_slot_booked"),
         )
+        .where(VaccineRecord.id == record_id)
+        .with_for_update(of=VaccineRecord)
     )
-    vaccine_record = vaccine_record_query.scalar_one_or_none()
+    row = vaccine_record_query.one_or_none()
 
-    if not vaccine_record:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Vaccine record with id {str(reschedule_request.vaccine_record_id)} not found.",
+            detail=f"Vaccine record with id {record_id} not found.",
         )
 
+    vaccine_record, new_slot_exists, new_slot_booked = row
+
     # Step 2: Validate that the current user owns this VaccineRecord
-    if vaccine_record.user_id != current_user.id:
+    if vaccine_record.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to cancel this vaccination slot.",
@@ -335,37 +1088,89 @@ async def reschedule_vaccination_slot(
             detail=f"Cannot reschedule slot with status '{vaccine_record.status}'.",
         )
 
-    # Step 4: Check if the desired booking slot is available
-    new_slot_query = await db.execute(
-        select(BookingSlot).where(BookingSlot.id == str(reschedule_request.new_slot_id))
-    )
-    new_slot = new_slot_query.scalar_one_or_none()
-
-    if not new_slot:
+    # Step 4: Check if the desired booking slot exists and is available
+    if not new_slot_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Booking slot with ID {str(reschedule_request.new_slot_id)} not found.",
+            detail=f"Booking slot with ID {new_slot_id} not found.",
         )
 
-    # Step 5: Ensure this slot hasn't already been booked
-    booked_result = await db.execute(
-        select(VaccineRecord).where(
-            VaccineRecord.booking_slot_id == str(reschedule_request.new_slot_id)
+    if new_slot_booked:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Slot already booked."
+        )
+
+    if await holds.is_held_by_other(db, new_slot_id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Slot is on hold for another user.",
         )
-    )
 
-    existing_record = booked_result.scalar_one_or_none()
+    # Step 5: Move the VaccineRecord, unless the slot was taken since Step 1
+    freed_slot_id = vaccine_record.booking_slot_id
+    try:
+        vaccine_record = await move_booking(db, record_id, freed_slot_id, new_slot_id)
+    except IntegrityError:
+        await db.rollback()
+        vaccine_record = None
 
-    if existing_record:
+    if not vaccine_record:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Slot already booked."
+            status_code=status.HTTP_409_CONFLICT, detail="Slot already booked."
         )
 
-    # Step 6: Update the VaccineRecord with the new booking slot
-    vaccine_record.booking_slot_id = str(reschedule_request.new_slot_id)
-    await db.flush()
-    await db.refresh(vaccine_record)
+    # Drop the hold on the new slot with the move, offer the freed slot to the
+    # waitlist, and swap the slots in the availability index once the move is committed
+    await holds.release_slots(db, [new_slot_id])
+    await waitlist.match(db, freed_slot_id)
+
+    def update_availability():
+        availability.mark_free(freed_slot_id)
+        availability.mark_booked(new_slot_id)
+
+    run_after_commit(db, update_availability)
+    await events.notify(db, SLOT_FREED, [freed_slot_id])
+    await events.notify(db, SLOT_TAKEN, [new_slot_id])
     await db.commit()
 
-    # Step 7: Commit the changes
     return vaccine_record
+
+
+@router.post(
+    "/reschedule",
+    status_code=status.HTTP_200_OK,
+    response_model=VaccineRecordResponse,
+)
+async def reschedule_vaccination_slot(
+    request: Request,
+    reschedule_request: RescheduleSlotRequest,
+    idempotency_key: str | None = Header(None, max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    availability: AvailabilityIndex = Depends(get_availability_index),
+    holds: SlotHolds = Depends(get_slot_holds),
+    events: SlotEventBroker = Depends(get_slot_events),
+    waitlist: Waitlist = Depends(get_waitlist),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+):
+    # If valid, set request.state.user_id
+    request.state.user_id = current_user.id
+    user_id = current_user.id
+
+    record_id = str(reschedule_request.vaccine_record_id)
+    new_slot_id = str(reschedule_request.new_slot_id)
+
+    async def reschedule():
+        vaccine_record = await _reschedule_booking(
+            db, user_id, record_id, new_slot_id, availability, holds, events, waitlist
+        )
+        return _record_response(vaccine_record, status.HTTP_200_OK)
+
+    # A retry with the same Idempotency-Key gets the original response
+    return await idempotency.run(
+        db,
+        user_id,
+        idempotency_key,
+        fingerprint("reschedule", record_id, new_slot_id),
+        reschedule,
+    )
@@ -1,16 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import func
+from typing import Iterator
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 from app.auth.oauth2 import get_current_user
 from app.models.database import get_db
-from app.models.models import Address, Clinic, User
-from app.schemas.clinic import ClinicResponse, ClinicType
+from app.models.models import User
+from app.core.config import settings
+from app.schemas.clinic import (
+    BatchNearestClinicsResponse,
+    ClinicResponse,
+    ClinicType,
+    LocationRequest,
+    NearbyClinicResponse,
+)
+from app.services.catalog.clinic_catalog import ClinicCatalog, get_clinic_catalog
+from app.services.catalog.coordinates import ClinicCoordinates, get_clinic_coordinates
+from app.services.catalog.distance_matrix import DistanceMatrix, get_distance_matrix
+from app.services.catalog.name_index import CatalogNameIndex, get_catalog_name_index
+from app.services.catalog.nearest_clinics import load_home_clinics
+from app.services.catalog.proximity import nearest_clinics
+from app.services.etag import make_etag, not_modified
 
 router = APIRouter(prefix="/clinics", tags=["Clinic"])
 
+NDJSON = "application/x-ndjson"
+# Locations looked up per vectorized pass, and per chunk of the streamed response
+BATCH_LOCATIONS = 1_000
+
+
+async def _nearest_clinics(
+    db: AsyncSession,
+    clinic_coordinates: ClinicCoordinates,
+    clinic_catalog: ClinicCatalog,
+    latitude: float,
+    longitude: float,
+    clinic_limit: int,
+    clinic_type: ClinicType | None,
+    nearest: list[tuple[str, float]] | None = None,
+) -> list[ClinicResponse]:
+    """
+    Finds the nearest clinics through the in-memory grid index, or a PostGIS KNN query
+    if configured, unless they were precomputed, then reads them from the catalog.
+
+    Args:
+        db (AsyncSession): The database session.
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates index.
+        clinic_catalog (ClinicCatalog): The clinic catalog, for names and addresses.
+        latitude (float): The latitude of the location, in degrees.
+        longitude (float): The longitude of the location, in degrees.
+        clinic_limit (int): The number of clinics to return.
+        clinic_type (ClinicType | None): The clinic type, or None for every type.
+        nearest (list[tuple[str, float]] | None): The precomputed (clinic id, distance
+            in km) pairs, nearest first, if any.
+
+    Returns:
+        list[ClinicResponse]: The clinics with their distance, nearest first.
+
+    Raises:
+        HTTPException: Raise 404 if no clinic was found.
+    """
+    # Step 1: Rank the clinics by great-circle distance
+    if nearest is None:
+        nearest = await nearest_clinics(
+            db,
+            clinic_coordinates,
+            latitude,
+            longitude,
+            clinic_limit,
+            clinic_type.value if clinic_type else None,
+        )
+
+    if not nearest:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No {clinic_type.value if clinic_type else 'clinic'} found.",
+        )
+
+    # Step 2: Read the nearest clinics, with their addresses, from the catalog
+    clinics = await clinic_catalog.get_many(db, [id for id, _ in nearest])
+
+    return [
+        ClinicResponse.model_validate(clinics[id], from_attributes=True).model_copy(
+            update={"distance_km": distance}
+        )
+        for id, distance in nearest
+        if id in clinics
+    ]
+
 
 @router.get(
     "/nearest-by-home",
@@ -19,51 +100,58 @@ router = APIRouter(prefix="/clinics", tags=["Clinic"])
 )
 async def get_nearest_clinic(
     request: Request,
+    response: Response,
     clinic_limit: int = 3,
     clinic_type: ClinicType | None = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    clinic_catalog: ClinicCatalog = Depends(get_clinic_catalog),
+    distance_matrix: DistanceMatrix = Depends(get_distance_matrix),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
 
-    user_address_stmt = (
-        select(Address.longitude, Address.latitude)
-        .join(User.address)
-        .where(User.id == current_user.id)
+    # Answer 304 if the client has the clinics near this version of the home
+    await clinic_catalog.ensure_fresh(db)
+    etag = make_etag(
+        request, current_user.id, current_user.version, clinic_catalog.snapshot.version
     )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
 
-    result = await db.execute(user_address_stmt)
-    user_longitude, user_latitude = result.first()
-
-    # Calculate the distance using the Haversine formula
-    haversine_distance = func.pow(
-        func.radians(Address.latitude - user_latitude), 2
-    ) + func.pow(func.radians(Address.longitude - user_longitude), 2)
-
-    # Query to fetch clinics ordered by distance
-    stmt = (
-        select(Clinic)
-        .join(Clinic.address)
-        .options(selectinload(Clinic.address))
-        .add_columns(haversine_distance.label("distance"))
-        .order_by("distance")
-        .limit(clinic_limit)
-    )
-
-    if clinic_type:
-        stmt = stmt.where(Clinic.type == clinic_type.value)
-
-    result = await db.execute(stmt)
-    polyclinics = result.scalars().all()
+    # Read the home and its precomputed nearest clinics in one lookup
+    home = await load_home_clinics(db, clinic_coordinates, current_user.id)
 
-    if not polyclinics:
+    if not home:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No {clinic_type.value} found.",
+            detail="User address not found.",
         )
 
-    return polyclinics
+    # If the lists are out of date or too short, looked up in the distance matrix
+    # if one is loaded, or searched afresh
+    nearest = home.nearest(clinic_limit, clinic_type.value if clinic_type else None)
+    if nearest is None:
+        nearest = await distance_matrix.nearest(
+            db,
+            clinic_coordinates,
+            home.postal_code,
+            clinic_limit,
+            clinic_type.value if clinic_type else None,
+        )
+
+    return await _nearest_clinics(
+        db,
+        clinic_coordinates,
+        clinic_catalog,
+        home.latitude,
+        home.longitude,
+        clinic_limit,
+        clinic_type,
+        nearest,
+    )
 
 
 @router.get(
@@ -72,37 +160,168 @@ async def get_nearest_clinic(
     response_model=list[ClinicResponse],
 )
 async def get_nearest_clinic_by_location(
+    request: Request,
+    response: Response,
     latitude: float,
     longitude: float,
     clinic_limit: int = 3,
     clinic_type: ClinicType | None = None,
     db: AsyncSession = Depends(get_db),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    clinic_catalog: ClinicCatalog = Depends(get_clinic_catalog),
 ):
-    # Calculate the distance using the Haversine formula
-    haversine_distance = func.pow(
-        func.radians(Address.latitude - latitude), 2
-    ) + func.pow(func.radians(Address.longitude - longitude), 2)
-
-    # Query to fetch clinics ordered by distance
-    stmt = (
-        select(Clinic)
-        .join(Clinic.address)
-        .options(selectinload(Clinic.address))
-        .add_columns(haversine_distance.label("distance"))
-        .order_by("distance")
-        .limit(clinic_limit)
+    # Answer 304 if the client has the clinics near this location
+    await clinic_catalog.ensure_fresh(db)
+    etag = make_etag(request, clinic_catalog.snapshot.version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    return await _nearest_clinics(
+        db,
+        clinic_coordinates,
+        clinic_catalog,
+        latitude,
+        longitude,
+        clinic_limit,
+        clinic_type,
     )
 
-    if clinic_type:
-        stmt = stmt.where(Clinic.type == clinic_type.value)
 
-    result = await db.execute(stmt)
-    polyclinics = result.scalars().all()
+async def _read_locations(request: Request) -> list[LocationRequest]:
+    """
+    Reads and validates NDJSON locations, one JSON object or [latitude, longitude]
+    pair per line, a chunk of the body at a time so that only one batch of lines is
+    held undecoded.
 
-    if not polyclinics:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No {clinic_type.value} found.",
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        list[LocationRequest]: The locations, in request order.
+
+    Raises:
+        RequestValidationError: If a line is not a valid location.
+        HTTPException: If there are more than `max_batch_locations` locations.
+    """
+    locations: list[LocationRequest] = []
+    errors = []
+
+    def parse(lines: list[bytes]) -> None:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                locations.append(LocationRequest.model_validate_json(line))
+            except ValidationError as e:
+                errors.extend(
+                    {
+                        **error,
+                        "loc": ("body", len(locations) + len(errors), *error["loc"]),
+                    }
+                    for error in e.errors()[:1]
+                )
+        if len(locations) + len(errors) > settings.max_batch_locations:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.max_batch_locations} locations per request.",
+            )
+
+    buffer = b""
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        parse(lines)
+    parse([buffer])
+
+    if errors:
+        raise RequestValidationError(errors)
+    return locations
+
+
+def _nearest_clinics_stream(
+    locations: list[LocationRequest],
+    clinic_coordinates: ClinicCoordinates,
+    name_index: CatalogNameIndex,
+    clinic_limit: int,
+    clinic_type: ClinicType | None,
+) -> Iterator[str]:
+    """
+    Looks the nearest clinics up for every `BATCH_LOCATIONS` locations in one
+    vectorized pass, and streams the results as NDJSON lines in request order.
+
+    Args:
+        locations (list[LocationRequest]): The validated locations.
+        clinic_coordinates (ClinicCoordinates): The loaded clinic coordinates.
+        name_index (CatalogNameIndex): The loaded clinic names.
+        clinic_limit (int): The number of clinics per location.
+        clinic_type (ClinicType | None): The clinic type, or None for every type.
+
+    Yields:
+        str: A chunk of NDJSON lines.
+    """
+    for start in range(0, len(locations), BATCH_LOCATIONS):
+        batch = locations[start : start + BATCH_LOCATIONS]
+        nearest = clinic_coordinates.nearest_many(
+            np.array([location.latitude for location in batch]),
+            np.array([location.longitude for location in batch]),
+            clinic_limit,
+            clinic_type.value if clinic_type else None,
+        )
+        yield "".join(
+            BatchNearestClinicsResponse(
+                index=start + offset,
+                latitude=location.latitude,
+                longitude=location.longitude,
+                clinics=[
+                    NearbyClinicResponse(
+                        id=id, name=name_index.clinics.name(id), distance_km=distance
+                    )
+                    for id, distance in clinics
+                ],
+            ).model_dump_json()
+            + "\n"
+            for offset, (location, clinics) in enumerate(zip(batch, nearest))
         )
 
-    return polyclinics
+
+@router.post(
+    "/nearest-by-location/batch",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+)
+async def get_nearest_clinics_by_locations(
+    request: Request,
+    clinic_limit: int = Query(3, ge=1, le=100),
+    clinic_type: ClinicType | None = None,
+    db: AsyncSession = Depends(get_db),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    name_index: CatalogNameIndex = Depends(get_catalog_name_index),
+):
+    # Step 1: Load the coordinates and names now, as the stream outlives the session
+    await clinic_coordinates.ensure_fresh(db)
+    await name_index.ensure_fresh(db)
+
+    # Step 2: Read and validate every location before responding, as NDJSON lines or
+    # as a JSON array of {"latitude", "longitude"} objects or [latitude, longitude] pairs
+    if request.headers.get("content-type", "").startswith(NDJSON):
+        locations = await _read_locations(request)
+    else:
+        try:
+            locations = TypeAdapter(list[LocationRequest]).validate_json(
+                await request.body()
+            )
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        if len(locations) > settings.max_batch_locations:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.max_batch_locations} locations per request.",
+            )
+
+    # Step 3: Stream one line per location, in request order
+    return StreamingResponse(
+        _nearest_clinics_stream(
+            locations, clinic_coordinates, name_index, clinic_limit, clinic_type
+        ),
+        media_type=NDJSON,
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -7,6 +7,7 @@ from app.auth.oauth2 import get_current_user
 from app.models.database import get_db
 from app.models.models import BookingSlot, User, VaccineRecord
 from app.schemas.record import VaccineRecordResponse
+from app.services.etag import make_etag, not_modified
 
 router = APIRouter(prefix="/records", tags=["Record"])
 
@@ -18,12 +19,19 @@ router = APIRouter(prefix="/records", tags=["Record"])
 )
 async def get_user_vaccination_records(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
 
+    # Answer 304 if the client has this version of the user's records
+    etag = make_etag(request, current_user.id, current_user.version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     stmt = (
         select(VaccineRecord)
         .join(User, onclause=VaccineRecord.user_id == User.id)
@@ -56,6 +64,7 @@ async def get_user_vaccination_records(
 )
 async def get_user_vaccination_record(
     request: Request,
+    response: Response,
     id: str,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
@@ -63,6 +72,12 @@ async def get_user_vaccination_record(
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
 
+    # Answer 304 if the client has this version of the user's records
+    etag = make_etag(request, current_user.id, current_user.version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     stmt = (
         select(VaccineRecord)
         .join(BookingSlot)
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -10,6 +10,14 @@ from app.auth.oauth2 import get_current_user
 from app.models.database import get_db
 from app.models.models import Address, User
 from app.schemas.user import UserResponse, UserUpdate, UserUpdateResponse
+from app.services.catalog.coordinates import ClinicCoordinates, get_clinic_coordinates
+from app.services.catalog.nearest_clinics import refresh_home_clinics
+from app.services.catalog.postal_codes import (
+    PostalCodeIndex,
+    get_postal_code_index,
+    resolve_address,
+)
+from app.services.etag import make_etag, not_modified
 
 router = APIRouter(prefix="/users", tags=["User"])
 
@@ -21,12 +29,19 @@ router = APIRouter(prefix="/users", tags=["User"])
 )
 async def get_user(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
 
+    # Answer 304 if the client has this version of the profile
+    etag = make_etag(request, current_user.id, current_user.version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
     stmt = (
         select(User)
         .outerjoin(Address, onclause=Address.id == User.address_id)
@@ -54,6 +69,8 @@ async def update_user(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    clinic_coordinates: ClinicCoordinates = Depends(get_clinic_coordinates),
+    postal_codes: PostalCodeIndex = Depends(get_postal_code_index),
 ):
     # If valid, set request.state.user_id
     request.state.user_id = current_user.id
@@ -69,11 +86,8 @@ async def update_user(
             detail=f"User with id {current_user.id} not found.",
         )
 
-    # Step 1: Get the address, if available
-    stmt = select(Address).filter_by(postal_code=user_update.postal_code)
-
-    result = await db.execute(stmt)
-    address = result.scalars().first()
+    # Step 1: Get the address, created from the postal code dataset if new
+    address = await resolve_address(db, postal_codes, user_update.postal_code)
 
     address_id = address.id if address else None
 
@@ -91,6 +105,11 @@ async def update_user(
             setattr(user, key, value)
 
     user.updated_at = datetime.now(timezone.utc)
+    user.version += 1
+
+    # Step 2: Precompute the nearest clinics of a new home, on a best-effort basis
+    if address_id:
+        await refresh_home_clinics(db, clinic_coordinates, address_id)
 
     db.add(user)
     # Flush inserts the object so it gets an ID, etc.
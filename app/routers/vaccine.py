@@ -1,15 +1,19 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import contains_eager
 
 from app.auth.oauth2 import get_current_user
+from app.core.config import settings
 from app.models.database import get_db
 from app.models.models import User, Vaccine, VaccineCriteria
 from app.schemas.vaccine import VaccineResponse
+from app.services.catalog.eligibility import age_in_months
+from app.services.catalog.name_index import CatalogNameIndex, get_catalog_name_index
+from app.services.etag import make_etag, not_modified
 
 router = APIRouter(prefix="/vaccines", tags=["Vaccine"])
 
@@ -21,49 +25,56 @@ router = APIRouter(prefix="/vaccines", tags=["Vaccine"])
 )
 async def get_vaccine_recommendations_for_user(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    name_index: CatalogNameIndex = Depends(get_catalog_name_index),
 ):
+    # Answer 304 if the client has the recommendations for this user, vaccine catalog
+    # and day, as the user's age moves on daily
+    await name_index.ensure_fresh(db)
+    etag = make_etag(
+        request,
+        current_user.id,
+        current_user.version,
+        name_index.vaccines_version,
+        datetime.today().date(),
+    )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
 
-    user_age_years = (datetime.today().date() - current_user.date_of_birth).days // 365
-
-    user_age_months = (datetime.today().date() - current_user.date_of_birth).days // 30
+    user_age_months = age_in_months(current_user.date_of_birth, datetime.today().date())
 
-    age_filters = or_(
-        VaccineCriteria.age_criteria.is_(None),
-        and_(VaccineCriteria.age_criteria == "0 months", user_age_months == 0),
-        and_(VaccineCriteria.age_criteria == "2 months", user_age_months == 2),
-        and_(VaccineCriteria.age_criteria == "4 months", user_age_months == 4),
-        and_(VaccineCriteria.age_criteria == "6 months", user_age_months == 6),
-        and_(VaccineCriteria.age_criteria == "12 months", user_age_months == 12),
-        and_(VaccineCriteria.age_criteria == "15 months", user_age_months == 15),
-        and_(VaccineCriteria.age_criteria == "18 months", user_age_months == 18),
-        and_(VaccineCriteria.age_criteria == "6-59 months", 6 <= user_age_months <= 59),
-        and_(VaccineCriteria.age_criteria == "10-11 years", 10 <= user_age_years <= 11),
-        and_(VaccineCriteria.age_criteria == "12-13 years", 12 <= user_age_years <= 13),
-        and_(VaccineCriteria.age_criteria == "13-14 years", 13 <= user_age_years <= 14),
-        and_(VaccineCriteria.age_criteria == "2-17 years", 2 <= user_age_years <= 17),
-        and_(VaccineCriteria.age_criteria == "5-17 years", 5 <= user_age_years <= 17),
-        and_(VaccineCriteria.age_criteria == "18+ years", user_age_years >= 18),
-        and_(VaccineCriteria.age_criteria == "18-26 years", 18 <= user_age_years <= 26),
-        and_(VaccineCriteria.age_criteria == "18-64 years", 18 <= user_age_years <= 64),
-        and_(VaccineCriteria.age_criteria == "65+ years", user_age_years >= 65),
-    )
+    # Match the criteria compiled in memory, or select them by age range
+    if settings.compiled_eligibility_rules:
+        available_vaccines = name_index.eligibility.recommend(
+            user_age_months, current_user.gender
+        )
+    else:
+        age_filters = and_(
+            VaccineCriteria.min_age_months <= user_age_months,
+            or_(
+                VaccineCriteria.max_age_months.is_(None),
+                VaccineCriteria.max_age_months >= user_age_months,
+            ),
+        )
 
-    gender_filters = or_(
-        VaccineCriteria.gender_criteria.is_(None),
-        VaccineCriteria.gender_criteria == current_user.gender,
-    )
+        gender_filters = or_(
+            VaccineCriteria.gender_criteria.is_(None),
+            VaccineCriteria.gender_criteria == current_user.gender,
+        )
 
-    stmt = (
-        select(Vaccine)
-        .join(Vaccine.vaccine_criterias)
-        .options(contains_eager(Vaccine.vaccine_criterias))
-        .filter(age_filters, gender_filters)
-    )
+        stmt = (
+            select(Vaccine)
+            .join(Vaccine.vaccine_criterias)
+            .options(contains_eager(Vaccine.vaccine_criterias))
+            .filter(age_filters, gender_filters)
+            .order_by(Vaccine.id, VaccineCriteria.id)
+        )
 
-    result = await db.execute(stmt)
-    available_vaccines = result.scalars().unique().all()
+        result = await db.execute(stmt)
+        available_vaccines = result.scalars().unique().all()
 
     if not available_vaccines:
         raise HTTPException(
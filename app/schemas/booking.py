@@ -1,15 +1,33 @@
+from datetime import date, datetime, time
+from enum import Enum
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 from app.schemas.base import BookingSlotBase
 from app.schemas.vaccine import VaccineResponse
 
 
+class SlotRanking(str, Enum):
+    # Nearest clinics first
+    DISTANCE = "distance"
+    # Lowest weighted sum of distance and wait first
+    SCORE = "score"
+
+
 class ScheduleSlotRequest(BaseModel):
     booking_slot_id: UUID
 
 
+class ScheduleSeriesRequest(BaseModel):
+    vaccine_id: UUID
+    # Defaults to the most doses required by the vaccine's criteria
+    doses: int | None = Field(None, ge=1, le=10)
+    min_interval_days: int = Field(28, ge=0)
+    polyclinic_id: UUID | None = None
+    start_datetime: datetime | None = None
+
+
 class CancelSlotRequest(BaseModel):
     vaccine_record_id: UUID
 
@@ -31,3 +49,119 @@ class AvailableSlotResponse(BookingSlotBase):
 
     class Config:
         from_attributes = True
+
+
+class SlotHoldResponse(BaseModel):
+    id: UUID
+    booking_slot_id: UUID
+    expires_at: datetime
+
+
+class WaitlistRequest(BaseModel):
+    vaccine_id: UUID
+    # Any polyclinic if not given
+    polyclinic_ids: list[UUID] | None = Field(None, min_length=1)
+    start_datetime: datetime | None = None
+    end_datetime: datetime | None = None
+
+    @model_validator(mode="after")
+    def check_datetimes(self) -> "WaitlistRequest":
+        if (
+            self.start_datetime
+            and self.end_datetime
+            and self.end_datetime < self.start_datetime
+        ):
+            raise ValueError("end_datetime must not be before start_datetime")
+        return self
+
+
+class WaitlistEntryResponse(BaseModel):
+    id: UUID
+    vaccine_id: UUID
+    polyclinic_ids: list[UUID] | None
+    start_datetime: datetime | None
+    end_datetime: datetime | None
+    created_at: datetime
+    # The slot hold offered once a matching slot was freed
+    offer: SlotHoldResponse | None
+
+
+class SlotTemplate(BaseModel):
+    polyclinic_id: UUID
+    vaccine_id: UUID
+    # 0 is Monday, as in `date.weekday()`
+    weekdays: list[int] = Field(..., min_length=1)
+    start_time: time
+    # Exclusive: the last slot starts at least `interval_minutes` before this
+    end_time: time
+    interval_minutes: int = Field(..., ge=1)
+
+    @model_validator(mode="after")
+    def check_times(self) -> "SlotTemplate":
+        if any(weekday not in range(7) for weekday in self.weekdays):
+            raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+
+class GenerateSlotsRequest(BaseModel):
+    templates: list[SlotTemplate] = Field(..., min_length=1)
+    start_date: date
+    end_date: date
+
+    @model_validator(mode="after")
+    def check_dates(self) -> "GenerateSlotsRequest":
+        if self.end_date < self.start_date:
+            raise ValueError("end_date must not be before start_date")
+        return self
+
+
+class SlotGenerationResponse(BaseModel):
+    generated: int
+    inserted: int
+    seconds: float
+    rows_per_second: float
+
+
+class CalendarDayResponse(BaseModel):
+    date: date
+    free_slots: int
+    # Base64 bitmap of the free start times, one bit per minute of the day
+    bitmap: str
+
+
+class ClinicCalendarResponse(BaseModel):
+    polyclinic_id: UUID
+    polyclinic_name: str | None
+    days: list[CalendarDayResponse]
+
+
+class ClinicClosureRequest(BaseModel):
+    polyclinic_id: UUID
+    start_datetime: datetime
+    # Inclusive
+    end_datetime: datetime
+    # Bookings are moved to free slots at most this many days before or after
+    search_days: int = Field(14, ge=0, le=90)
+    # Otherwise bookings with nowhere to go are left in place
+    cancel_unmatched: bool = True
+
+    @model_validator(mode="after")
+    def check_datetimes(self) -> "ClinicClosureRequest":
+        if self.end_datetime < self.start_datetime:
+            raise ValueError("end_datetime must not be before start_datetime")
+        return self
+
+
+class RescheduledRecordResponse(BaseModel):
+    vaccine_record_id: UUID
+    from_slot_id: UUID
+    to_slot_id: UUID
+
+
+class ClinicClosureResponse(BaseModel):
+    rescheduled: list[RescheduledRecordResponse]
+    cancelled: list[UUID]
+    unmatched: list[UUID]
+    removed_slots: int
@@ -1,7 +1,7 @@
 from enum import Enum
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 from app.schemas.address import AddressResponse
 
@@ -24,6 +24,40 @@ class ClinicResponse(BaseModel):
     name: str
     type: ClinicType
     address: AddressResponse
+    # Great-circle distance from the searched location, when searching by location
+    distance_km: float | None = None
 
     class Config:
         from_attributes = True
+
+
+class NearestClinicsRefreshResponse(BaseModel):
+    # Addresses whose precomputed nearest clinics were out of date and recomputed
+    refreshed_addresses: int
+
+
+class LocationRequest(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+    @model_validator(mode="before")
+    @classmethod
+    def from_pair(cls, data):
+        # Also accept a compact [latitude, longitude] pair
+        if isinstance(data, (list, tuple)) and len(data) == 2:
+            return {"latitude": data[0], "longitude": data[1]}
+        return data
+
+
+class NearbyClinicResponse(BaseModel):
+    id: str
+    name: str | None = None
+    distance_km: float
+
+
+class BatchNearestClinicsResponse(BaseModel):
+    # Position of the location in the request
+    index: int
+    latitude: float
+    longitude: float
+    clinics: list[NearbyClinicResponse]
@@ -0,0 +1,399 @@
+import asyncio
+import heapq
+import logging
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from typing import Callable, Container, NamedTuple
+
+from fastapi import Request
+from sqlalchemy import exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.models import BookingSlot, VaccineRecord
+from app.services.booking.calendar import AvailabilityCalendar, CalendarDay
+from app.services.refresh import RefreshableIndex
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class FreeSlot(NamedTuple):
+    datetime: datetime
+    id: str
+    polyclinic_id: str
+    vaccine_id: str
+
+
+class AvailabilityIndex(RefreshableIndex):
+    """
+    In-process index of free booking slots, keyed by (vaccine id, clinic id), each key
+    holding its free slots as a list sorted by (datetime, slot id). Repeated searches
+    are answered from memory instead of re-running the join over `bookingslots` and
+    `vaccinerecords`.
+
+    Only upcoming free slots are loaded. The booking routes keep the index current
+    through `mark_booked()` and `mark_free()`, called after their transaction
+    commits; slots the index has not seen, such as a cancelled booking's slot or newly
+    generated slots, are loaded one query at a time through `add_slots()` instead of a
+    full reload. The whole index is reconciled with the database in the background to
+    pick up changes made elsewhere, and reloaded inline only on first use or when no
+    background reconciliation runs.
+
+    The same changes keep `calendar`, a per-day bitset summary of the free slots,
+    current.
+    """
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.now):
+        super().__init__(max_age_seconds=settings.availability_reconcile_seconds)
+        # Naive clinic-local time, like slot datetimes
+        self._clock = clock
+        # Every slot seen since the last reload, booked or not, so a slot booked since
+        # can be put back
+        self._slots: dict[str, FreeSlot] = {}
+        # Slots freed that the index had not seen, loaded on the next search
+        self._unseen: set[str] = set()
+        self._reconciling = False
+        self._free: dict[str, dict[str, list[tuple[datetime, str]]]] = {}
+        self._free_ids: set[str] = set()
+        self.calendar = AvailabilityCalendar()
+        # Changes applied while a reload is in flight, replayed onto the new state
+        self._journal: list[tuple[Callable, str]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._free_ids)
+
+    def now(self) -> datetime:
+        return self._clock()
+
+    def _free_slots_query(self, *criteria):
+        return select(
+            BookingSlot.datetime,
+            BookingSlot.id,
+            BookingSlot.polyclinic_id,
+            BookingSlot.vaccine_id,
+        ).where(
+            BookingSlot.datetime >= self.now(),
+            ~exists().where(VaccineRecord.booking_slot_id == BookingSlot.id),
+            *criteria,
+        )
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Reloads the index from the database.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        self._journal = []
+        try:
+            slots_result = await db.execute(self._free_slots_query())
+            slots = {row[1]: FreeSlot(*row) for row in slots_result.all()}
+
+            free = defaultdict(lambda: defaultdict(list))
+            calendar = AvailabilityCalendar()
+            for slot in slots.values():
+                free[slot.vaccine_id][slot.polyclinic_id].append(
+                    (slot.datetime, slot.id)
+                )
+                calendar.add(slot.vaccine_id, slot.polyclinic_id, slot.datetime)
+            for clinics in free.values():
+                for entries in clinics.values():
+                    entries.sort()
+
+            self._slots = slots
+            self._free = {vaccine_id: dict(c) for vaccine_id, c in free.items()}
+            self._free_ids = set(slots)
+            self._unseen = set()
+            self.calendar = calendar
+            self.mark_loaded()
+
+            # Replay the changes committed while the database was being read
+            for apply, slot_id in self._journal:
+                apply(self, slot_id)
+        finally:
+            self._journal = None
+
+    def _record(self, apply: Callable, slot_id: str) -> None:
+        if self._journal is not None:
+            self._journal.append((apply, slot_id))
+        apply(self, slot_id)
+
+    def _remove(self, slot_id: str) -> None:
+        slot = self._slots.get(slot_id)
+        if slot is None or slot_id not in self._free_ids:
+            return
+
+        entries = self._free[slot.vaccine_id][slot.polyclinic_id]
+        position = bisect_left(entries, (slot.datetime, slot.id))
+        if position < len(entries) and entries[position][1] == slot_id:
+            del entries[position]
+        self._free_ids.discard(slot_id)
+        self.calendar.remove(slot.vaccine_id, slot.polyclinic_id, slot.datetime)
+
+    def _add(self, slot_id: str) -> None:
+        slot = self._slots.get(slot_id)
+        if slot is None:
+            # Booked or created before the last reload, so load it on the next search
+            self._unseen.add(slot_id)
+            return
+        if slot_id in self._free_ids:
+            return
+
+        clinics = self._free.setdefault(slot.vaccine_id, {})
+        insort(clinics.setdefault(slot.polyclinic_id, []), (slot.datetime, slot.id))
+        self._free_ids.add(slot_id)
+        self.calendar.add(slot.vaccine_id, slot.polyclinic_id, slot.datetime)
+
+    def mark_booked(self, slot_id: str) -> None:
+        """
+        Removes a slot from the free slots, e.g. once it has been scheduled.
+
+        Args:
+            slot_id (str): The booking slot id.
+        """
+        self._record(AvailabilityIndex._remove, slot_id)
+
+    def mark_free(self, slot_id: str) -> None:
+        """
+        Returns a slot to the free slots, e.g. once its booking has been cancelled.
+
+        Args:
+            slot_id (str): The booking slot id.
+        """
+        self._record(AvailabilityIndex._add, slot_id)
+
+    async def add_slots(self, db: AsyncSession, *criteria) -> int:
+        """
+        Loads the upcoming free slots matching some criteria into the index, e.g. newly
+        generated ones, without reloading the rest.
+
+        Args:
+            db (AsyncSession): The database session.
+            *criteria: SQL criteria on `BookingSlot`.
+
+        Returns:
+            int: The number of slots loaded.
+        """
+        result = await db.execute(self._free_slots_query(*criteria))
+        slots = [FreeSlot(*row) for row in result.all()]
+        for slot in slots:
+            self._slots[slot.id] = slot
+            self._unseen.discard(slot.id)
+            self._record(AvailabilityIndex._add, slot.id)
+        return len(slots)
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """
+        Loads the index on first use, or reloads it once stale if no background
+        reconciliation is running, then loads any freed slots it had not seen.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        if self._loaded_at is None or not self._reconciling:
+            await super().ensure_fresh(db)
+        if self._unseen:
+            await self.add_slots(db, BookingSlot.id.in_(list(self._unseen)))
+
+    def is_free(self, slot_id: str) -> bool:
+        return slot_id in self._free_ids
+
+    def slot(self, slot_id: str) -> FreeSlot | None:
+        return self._slots.get(slot_id)
+
+    async def search(
+        self,
+        db: AsyncSession,
+        vaccine_ids: set[str],
+        polyclinic_ids: set[str] | None = None,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+        after: dict[str, tuple[datetime, str]] | None = None,
+        exclude: Container[str] = (),
+    ) -> list[FreeSlot]:
+        """
+        Finds the upcoming free slots for the given vaccines, optionally restricted to
+        some polyclinics and a datetime range (both ends inclusive). Passing `after`
+        seeks past a keyset position per polyclinic in the (datetime, slot id) order,
+        so paging never repeats or skips slots when bookings change in between.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            vaccine_ids (set[str]): The vaccine ids.
+            polyclinic_ids (set[str] | None): The polyclinic ids, or None for all.
+            start_datetime (datetime | None): The earliest slot datetime.
+            end_datetime (datetime | None): The latest slot datetime.
+            after (dict[str, tuple[datetime, str]] | None): Only return slots of a
+                polyclinic strictly after its (datetime, slot id), if it has one.
+            exclude (Container[str]): Slot ids to leave out, e.g. slots held by others.
+
+        Returns:
+            list[FreeSlot]: The free slots, sorted by datetime and then slot id.
+        """
+        await self.ensure_fresh(db)
+        # Slots that passed since the last reload are no longer upcoming
+        start_datetime = max(start_datetime or datetime.min, self.now())
+
+        ranges = []
+        for vaccine_id in vaccine_ids:
+            for polyclinic_id, entries in self._free.get(vaccine_id, {}).items():
+                if polyclinic_ids is not None and polyclinic_id not in polyclinic_ids:
+                    continue
+
+                low = bisect_left(entries, start_datetime, key=itemgetter(0))
+                high = (
+                    bisect_right(entries, end_datetime, key=itemgetter(0))
+                    if end_datetime
+                    else len(entries)
+                )
+                if after and polyclinic_id in after:
+                    low = max(low, bisect_right(entries, after[polyclinic_id]))
+                if low < high:
+                    ranges.append(entries[low:high])
+
+        return [
+            self._slots[slot_id]
+            for _, slot_id in heapq.merge(*ranges)
+            if slot_id not in exclude
+        ]
+
+    async def free_days(
+        self,
+        db: AsyncSession,
+        vaccine_ids: set[str],
+        polyclinic_ids: set[str] | None,
+        start_date: date,
+        end_date: date,
+    ) -> dict[str, dict[date, CalendarDay]]:
+        """
+        Summarises the free slots per polyclinic and day from the calendar bitsets,
+        without listing the slots themselves.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            vaccine_ids (set[str]): The vaccine ids.
+            polyclinic_ids (set[str] | None): The polyclinic ids, or None for all.
+            start_date (date): The first day.
+            end_date (date): The last day (inclusive).
+
+        Returns:
+            dict[str, dict[date, CalendarDay]]: The days with free slots, by
+                polyclinic id and day.
+        """
+        await self.ensure_fresh(db)
+        return self.calendar.days(vaccine_ids, polyclinic_ids, start_date, end_date)
+
+    async def find_series(
+        self,
+        db: AsyncSession,
+        vaccine_id: str,
+        doses: int,
+        min_interval: timedelta,
+        polyclinic_ids: set[str] | None = None,
+        start_datetime: datetime | None = None,
+        exclude: Container[str] = (),
+    ) -> list[FreeSlot] | None:
+        """
+        Finds free slots for a multi-dose series, each dose at least `min_interval`
+        after the previous one. A series at a single polyclinic is preferred, and among
+        those the one that completes earliest; only if no polyclinic can host every
+        dose are the doses spread across polyclinics.
+
+        Taking the earliest slot that respects the interval for each dose in turn also
+        gives the earliest possible last dose, so each candidate costs one bisect per
+        dose.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            vaccine_id (str): The vaccine id.
+            doses (int): The number of doses in the series.
+            min_interval (timedelta): The minimum time between two doses.
+            polyclinic_ids (set[str] | None): The polyclinic ids, or None for all.
+            start_datetime (datetime | None): The earliest datetime for the first dose.
+            exclude (Container[str]): Slot ids to leave out, e.g. slots held by others.
+
+        Returns:
+            list[FreeSlot] | None: The slots, one per dose in order, or None if no
+                series fits.
+        """
+        await self.ensure_fresh(db)
+        start_datetime = max(start_datetime or datetime.min, self.now())
+
+        def earliest_series(entries: list[tuple[datetime, str]]) -> list[str] | None:
+            series, not_before = [], start_datetime
+            position = bisect_left(entries, not_before, key=itemgetter(0))
+            for _ in range(doses):
+                while position < len(entries) and entries[position][1] in exclude:
+                    position += 1
+                if position >= len(entries):
+                    return None
+                slot_datetime, slot_id = entries[position]
+                series.append(slot_id)
+                not_before = slot_datetime + min_interval
+                position = bisect_left(
+                    entries, not_before, lo=position + 1, key=itemgetter(0)
+                )
+            return series
+
+        clinics = {
+            polyclinic_id: entries
+            for polyclinic_id, entries in self._free.get(vaccine_id, {}).items()
+            if polyclinic_ids is None or polyclinic_id in polyclinic_ids
+        }
+
+        candidates = [
+            series
+            for series in map(earliest_series, clinics.values())
+            if series is not None
+        ]
+        if not candidates:
+            series = earliest_series(list(heapq.merge(*clinics.values())))
+            candidates = [series] if series is not None else []
+        if not candidates:
+            return None
+
+        best = min(
+            candidates,
+            key=lambda series: (self._slots[series[-1]].datetime, series[-1]),
+        )
+        return [self._slots[slot_id] for slot_id in best]
+
+    async def reconcile_periodically(self, session_factory: Callable) -> None:
+        """
+        Reconciles the index with the database every `max_age_seconds`, until cancelled.
+
+        Args:
+            session_factory (Callable): Creates a new `AsyncSession`, e.g. `AsyncSessionLocal`.
+        """
+        self._reconciling = True
+        try:
+            while True:
+                await asyncio.sleep(self.max_age_seconds)
+                try:
+                    async with session_factory() as db:
+                        async with self._lock:
+                            await self.refresh(db)
+                except Exception as e:
+                    logger.error(
+                        f"Availability reconciliation failed: {e}", exc_info=True
+                    )
+        finally:
+            self._reconciling = False
+
+
+def get_availability_index(request: Request) -> AvailabilityIndex:
+    """
+    Gets the application's slot availability index, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        AvailabilityIndex: The availability index.
+    """
+    if getattr(request.app.state, "availability_index", None) is None:
+        request.app.state.availability_index = AvailabilityIndex()
+    return request.app.state.availability_index
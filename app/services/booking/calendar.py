@@ -0,0 +1,106 @@
+import base64
+from collections import defaultdict
+from datetime import date, datetime
+from typing import NamedTuple
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class CalendarDay(NamedTuple):
+    # The minutes of the day with a free slot of any of the vaccines asked for
+    bits: int
+    # The free slots, counted per vaccine, as two vaccines may share a minute
+    free_slots: int
+
+
+class AvailabilityCalendar:
+    """
+    Free slots summarised per (vaccine id, polyclinic id, day) as a bitset with one bit
+    per minute of the day, set when a slot starting at that minute is free. A day costs
+    one Python int of at most 180 bytes, its free-slot count is the bitset's popcount,
+    and booking or freeing a slot flips a single bit.
+
+    Slots are assumed to start on whole minutes, as generated from schedule templates.
+    """
+
+    def __init__(self):
+        self._days: dict[str, dict[str, dict[date, int]]] = defaultdict(
+            lambda: defaultdict(dict)
+        )
+
+    @staticmethod
+    def _bit(slot_datetime: datetime) -> int:
+        return 1 << (slot_datetime.hour * 60 + slot_datetime.minute)
+
+    def add(self, vaccine_id: str, polyclinic_id: str, slot_datetime: datetime) -> None:
+        days = self._days[vaccine_id][polyclinic_id]
+        day = slot_datetime.date()
+        days[day] = days.get(day, 0) | self._bit(slot_datetime)
+
+    def remove(
+        self, vaccine_id: str, polyclinic_id: str, slot_datetime: datetime
+    ) -> None:
+        days = self._days.get(vaccine_id, {}).get(polyclinic_id)
+        day = slot_datetime.date()
+        if not days or day not in days:
+            return
+
+        days[day] &= ~self._bit(slot_datetime)
+        if not days[day]:
+            del days[day]
+
+    def days(
+        self,
+        vaccine_ids: set[str],
+        polyclinic_ids: set[str] | None,
+        start_date: date,
+        end_date: date,
+    ) -> dict[str, dict[date, CalendarDay]]:
+        """
+        Gets the days with free slots in a date range, looking only at the vaccines
+        asked for.
+
+        Args:
+            vaccine_ids (set[str]): The vaccine ids.
+            polyclinic_ids (set[str] | None): The polyclinic ids, or None for all.
+            start_date (date): The first day.
+            end_date (date): The last day (inclusive).
+
+        Returns:
+            dict[str, dict[date, CalendarDay]]: The days by polyclinic id and day,
+                with their bitsets merged and their counts summed across the vaccines.
+        """
+        calendar = defaultdict(dict)
+        for vaccine_id in vaccine_ids:
+            for polyclinic_id, days in self._days.get(vaccine_id, {}).items():
+                if polyclinic_ids is not None and polyclinic_id not in polyclinic_ids:
+                    continue
+
+                clinic_days = calendar[polyclinic_id]
+                for day, bits in days.items():
+                    if not start_date <= day <= end_date:
+                        continue
+                    merged = clinic_days.get(day, CalendarDay(0, 0))
+                    clinic_days[day] = CalendarDay(
+                        merged.bits | bits, merged.free_slots + bits.bit_count()
+                    )
+
+        return {
+            polyclinic_id: dict(sorted(days.items()))
+            for polyclinic_id, days in calendar.items()
+            if days
+        }
+
+
+def encode_bitmap(bits: int) -> str:
+    """
+    Encodes a day's bitset for a response, as base64 of its 180 little-endian bytes,
+    so the slot starting at minute `m` of the day is bit `m % 8` of byte `m // 8`.
+
+    Args:
+        bits (int): The bitset.
+
+    Returns:
+        str: The base64-encoded bitmap.
+    """
+    return base64.b64encode(bits.to_bytes(MINUTES_PER_DAY // 8, "little")).decode()
@@ -0,0 +1,293 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.models.models import Address, BookingSlot, Clinic, VaccineRecord
+from app.services.booking.holds import SlotHolds
+from app.services.catalog.coordinates import ClinicCoordinates
+from app.services.etag import bump_user_versions
+
+# Free slots kept per displaced booking when assigning them, and the most
+# (booking, slot) pairs scored at once
+CANDIDATES_PER_BOOKING = 32
+COST_MATRIX_CELLS = 1_000_000
+
+
+class ClosureReport(NamedTuple):
+    # (vaccine record id, from slot id, to slot id)
+    rescheduled: list[tuple[str, str, str]]
+    cancelled: list[str]
+    # Records left in place, with no free slot to move to
+    unmatched: list[str]
+    removed_slot_ids: list[str]
+
+
+def assign_slots(
+    record_vaccine_ids: list[str],
+    record_datetimes: list[datetime],
+    slot_vaccine_ids: list[str],
+    slot_datetimes: list[datetime],
+    slot_distances_km: np.ndarray,
+    distance_weight: float = 1.0,
+    wait_weight: float = 1.0,
+) -> list[int | None]:
+    """
+    Greedily assigns free slots to displaced bookings: (booking, slot) pairs of the
+    same vaccine are scored by `distance_weight * km + wait_weight * days moved`, and
+    taken cheapest first while both are unused.
+
+    Rather than score and sort every pair, each booking keeps only its
+    `CANDIDATES_PER_BOOKING` cheapest slots, scored in vectorized chunks of at most
+    `COST_MATRIX_CELLS` pairs. Once a booking's candidates are all taken, no pair
+    costlier than its last candidate is taken in the same round, as the booking may
+    have a cheaper one among the slots it left out; the bookings left over pick new
+    candidates among the unused slots in the next round. This takes the same pairs as
+    sorting them all.
+
+    Args:
+        record_vaccine_ids (list[str]): The vaccine of each booking.
+        record_datetimes (list[datetime]): The original datetime of each booking.
+        slot_vaccine_ids (list[str]): The vaccine of each free slot.
+        slot_datetimes (list[datetime]): The datetime of each free slot.
+        slot_distances_km (np.ndarray): The distance from the closed clinic to each
+            free slot's clinic, in km.
+        distance_weight (float): The score of a kilometre of travel.
+        wait_weight (float): The score of a day moved, earlier or later.
+
+    Returns:
+        list[int | None]: The position of the slot assigned to each booking, or None.
+    """
+    assignment: list[int | None] = [None] * len(record_vaccine_ids)
+    if not record_vaccine_ids or not slot_vaccine_ids:
+        return assignment
+
+    # Vaccines as small integer codes, so matching them is an array comparison
+    codes = {id: code for code, id in enumerate(set(slot_vaccine_ids))}
+    record_codes = np.array([codes.get(id, -1) for id in record_vaccine_ids])
+    slot_codes = np.array([codes[id] for id in slot_vaccine_ids])
+    record_times = np.array(record_datetimes, dtype="datetime64[s]")
+    slot_times = np.array(slot_datetimes, dtype="datetime64[s]")
+    slot_distances_km = np.asarray(slot_distances_km, dtype=float)
+
+    used = np.zeros(len(slot_codes), dtype=bool)
+    pending = np.flatnonzero(record_codes >= 0)
+    while pending.size:
+        # Step 1: Pick each pending booking's cheapest unused slots
+        pair_costs, pair_records, pair_slots, complete = [], [], [], {}
+        for code in np.unique(record_codes[pending]):
+            records = pending[record_codes[pending] == code]
+            slots = np.flatnonzero((slot_codes == code) & ~used)
+            if not slots.size:
+                continue
+
+            k = min(CANDIDATES_PER_BOOKING, slots.size)
+            rows = max(1, COST_MATRIX_CELLS // slots.size)
+            for start in range(0, records.size, rows):
+                chunk = records[start : start + rows]
+                moved_days = np.abs(
+                    slot_times[slots][np.newaxis, :]
+                    - record_times[chunk][:, np.newaxis]
+                ) / np.timedelta64(1, "D")
+                costs = (
+                    wait_weight * moved_days
+                    + distance_weight * slot_distances_km[slots][np.newaxis, :]
+                )
+                nearest = np.argpartition(costs, k - 1, axis=1)[:, :k]
+                pair_costs.append(np.take_along_axis(costs, nearest, axis=1).ravel())
+                pair_records.append(np.repeat(chunk, k))
+                pair_slots.append(slots[nearest].ravel())
+            for record in records:
+                complete[int(record)] = k == slots.size
+
+        if not pair_costs:
+            break
+        costs = np.concatenate(pair_costs)
+        records = np.concatenate(pair_records)
+        slots = np.concatenate(pair_slots)
+
+        # Step 2: Take the pairs cheapest first, then by booking and slot
+        seen = defaultdict(int)
+        limit = np.inf
+        for pair in np.lexsort((slots, records, costs)):
+            cost, record, slot = costs[pair], int(records[pair]), int(slots[pair])
+            if cost > limit:
+                break
+            seen[record] += 1
+            if assignment[record] is not None:
+                continue
+            if not used[slot]:
+                assignment[record] = slot
+                used[slot] = True
+            elif seen[record] == CANDIDATES_PER_BOOKING and not complete[record]:
+                # Out of candidates, while a slot it left out may be cheaper than
+                # the pairs to come
+                limit = cost
+
+        pending = np.array(
+            [record for record in pending if assignment[record] is None], dtype=int
+        )
+    return assignment
+
+
+async def close_clinic(
+    db: AsyncSession,
+    polyclinic_id: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    clinic_coordinates: ClinicCoordinates,
+    holds: SlotHolds,
+    now: datetime,
+    search_days: int = 14,
+    cancel_unmatched: bool = True,
+) -> ClosureReport:
+    """
+    Closes a clinic for a time window in one transaction: every booking in the window
+    is moved to the best free slot of the same vaccine elsewhere (see `assign_slots()`),
+    within `search_days` of the window but not in the past nor held by a user, and the
+    window's remaining slots are removed.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        polyclinic_id (str): The id of the clinic closing.
+        start_datetime (datetime): The start of the closure.
+        end_datetime (datetime): The end of the closure (inclusive).
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates, for distances.
+        holds (SlotHolds): The slot holds, whose slots are not free to move to.
+        now (datetime): The current naive clinic-local time, before which no booking
+            is moved.
+        search_days (int): How many days before or after the closure to move bookings to.
+        cancel_unmatched (bool): Whether to cancel bookings no free slot was found for,
+            rather than leave them in place.
+
+    Returns:
+        ClosureReport: The bookings moved, cancelled and left, and the removed slots.
+
+    Raises:
+        IntegrityError: If a free slot was booked concurrently; the caller rolls back.
+    """
+    in_closure = (
+        (BookingSlot.polyclinic_id == polyclinic_id)
+        & (BookingSlot.datetime >= start_datetime)
+        & (BookingSlot.datetime <= end_datetime)
+    )
+
+    # Step 1: Lock the bookings in the closure window
+    records_result = await db.execute(
+        select(
+            VaccineRecord.id,
+            VaccineRecord.booking_slot_id,
+            BookingSlot.vaccine_id,
+            BookingSlot.datetime,
+            VaccineRecord.user_id,
+        )
+        .join(BookingSlot, VaccineRecord.booking_slot_id == BookingSlot.id)
+        .where(in_closure, VaccineRecord.status == "booked")
+        .order_by(BookingSlot.datetime, VaccineRecord.id)
+        .with_for_update(of=VaccineRecord)
+    )
+    records = records_result.all()
+
+    # Step 2: Pre-filter the free slots they could move to in SQL
+    booked = aliased(VaccineRecord)
+    candidates = []
+    if records:
+        candidates_result = await db.execute(
+            select(
+                BookingSlot.id,
+                BookingSlot.polyclinic_id,
+                BookingSlot.vaccine_id,
+                BookingSlot.datetime,
+            )
+            .where(
+                BookingSlot.vaccine_id.in_({record[2] for record in records}),
+                BookingSlot.datetime
+                >= max(start_datetime - timedelta(days=search_days), now),
+                BookingSlot.datetime <= end_datetime + timedelta(days=search_days),
+                ~in_closure,
+                ~exists().where(booked.booking_slot_id == BookingSlot.id),
+                ~holds.is_held(BookingSlot.id),
+            )
+            .order_by(BookingSlot.datetime, BookingSlot.id)
+        )
+        candidates = candidates_result.all()
+
+    # Step 3: Assign the slots, weighing the distance from the closed clinic
+    distances = np.zeros(len(candidates))
+    if candidates:
+        origin = (
+            await db.execute(
+                select(Address.latitude, Address.longitude)
+                .join(Clinic.address)
+                .where(Clinic.id == polyclinic_id)
+            )
+        ).first()
+        if origin is not None:
+            distances = await clinic_coordinates.distances(
+                db,
+                float(origin[0]),
+                float(origin[1]),
+                [candidate[1] for candidate in candidates],
+            )
+            # Clinics without coordinates are still better than cancelling
+            distances[~np.isfinite(distances)] = np.nanmax(
+                distances[np.isfinite(distances)], initial=0.0
+            )
+
+    assignment = assign_slots(
+        [record[2] for record in records],
+        [record[3] for record in records],
+        [candidate[2] for candidate in candidates],
+        [candidate[3] for candidate in candidates],
+        distances,
+    )
+
+    rescheduled, unmatched = [], []
+    for record, slot in zip(records, assignment):
+        if slot is None:
+            unmatched.append(record[0])
+        else:
+            rescheduled.append((record[0], record[1], candidates[slot][0]))
+
+    # Step 4: Move and cancel the bookings in bulk
+    if rescheduled:
+        await db.execute(
+            VaccineRecord.__table__.update()
+            .where(VaccineRecord.__table__.c.id == bindparam("record_id"))
+            .values(booking_slot_id=bindparam("to_slot_id")),
+            [
+                {"record_id": record_id, "to_slot_id": to_slot_id}
+                for record_id, _, to_slot_id in rescheduled
+            ],
+        )
+
+    cancelled = []
+    if cancel_unmatched and unmatched:
+        await db.execute(
+            delete(VaccineRecord)
+            .where(VaccineRecord.id.in_(unmatched))
+            .execution_options(synchronize_session=False)
+        )
+        cancelled, unmatched = unmatched, []
+
+    # The users whose bookings moved or were cancelled see their records change
+    changed = {record[0] for record in rescheduled} | set(cancelled)
+    await bump_user_versions(
+        db, [record[4] for record in records if record[0] in changed]
+    )
+
+    # Step 5: Remove the window's slots, except those still booked
+    removed_result = await db.execute(
+        delete(BookingSlot)
+        .where(in_closure, ~exists().where(booked.booking_slot_id == BookingSlot.id))
+        .returning(BookingSlot.id)
+        .execution_options(synchronize_session=False)
+    )
+    removed_slot_ids = list(removed_result.scalars().all())
+
+    return ClosureReport(rescheduled, cancelled, unmatched, removed_slot_ids)
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, NamedTuple
+
+from fastapi import Request
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+
+from app.models.database import run_after_commit
+from app.models.models import BookingSlot
+from app.services.booking.availability import (
+    AvailabilityIndex,
+    FreeSlot,
+    get_availability_index,
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+SLOT_TAKEN = "taken"
+SLOT_FREED = "freed"
+# Sent instead of the events a slow subscriber missed, telling it to search again
+SLOT_RESYNC = "resync"
+
+NOTIFY_CHANNEL = "slot_events"
+# Postgres caps NOTIFY payloads at 8000 bytes, so large batches are split
+NOTIFY_BATCH_SIZE = 100
+SUBSCRIPTION_QUEUE_SIZE = 256
+# The listening connection is checked this often, and reconnected after a drop with
+# a delay doubling from the first value up to the second
+LISTEN_CHECK_SECONDS = 30
+LISTEN_RETRY_SECONDS = (1, 60)
+
+
+class SlotEvent(NamedTuple):
+    type: str
+    booking_slot_id: str | None
+    vaccine_id: str | None
+    polyclinic_id: str | None
+    datetime: datetime | None
+
+
+class SlotEventBroker:
+    """
+    Publishes slot availability changes to subscribers of (vaccine id, polyclinic id)
+    pairs, so clients can wait for a slot to free up instead of polling
+    `/bookings/available`.
+
+    On Postgres, changes are sent with `NOTIFY` inside the booking's own transaction,
+    so they are only delivered if it commits, and every worker `LISTEN`s on the
+    channel to fan them out to its subscribers and to keep its availability index
+    current. Without a listening connection (e.g. SQLite, or while a dropped one is
+    being reconnected) changes are fanned out in-process once the transaction
+    commits, and the availability index's reconciliation picks up other workers'.
+    """
+
+    def __init__(self, availability: AvailabilityIndex):
+        self.availability = availability
+        # Identifies this worker's own notifications, already applied to its index
+        self.origin = str(uuid.uuid4())
+        self._subscribers: dict[tuple[str, str | None], set[asyncio.Queue]] = (
+            defaultdict(set)
+        )
+        self._engine: AsyncEngine | None = None
+        self._connection: AsyncConnection | None = None
+        self._connection_lost = asyncio.Event()
+        self._listen_task: asyncio.Task | None = None
+        # Background loads of slots the availability index had not seen
+        self._loads: set[asyncio.Task] = set()
+
+    @property
+    def listening(self) -> bool:
+        return self._connection is not None
+
+    async def listen(self, engine: AsyncEngine) -> None:
+        """
+        Starts listening for changes published by every worker, on Postgres only, and
+        keeps the listening connection up in the background.
+
+        Args:
+            engine (AsyncEngine): The database engine, also used to look up slots
+                the availability index had not seen.
+        """
+        self._engine = engine
+        if engine.dialect.name != "postgresql":
+            return
+
+        try:
+            await self._connect()
+        except Exception as e:
+            # Changes are fanned out in-process until the background task connects
+            logger.warning(f"Slot events connection failed: {e}")
+        self._listen_task = asyncio.create_task(self._keep_listening())
+
+    async def _connect(self) -> None:
+        connection = await self._engine.connect()
+        try:
+            raw_connection = await connection.get_raw_connection()
+            driver_connection = raw_connection.driver_connection
+            await driver_connection.add_listener(NOTIFY_CHANNEL, self._on_notification)
+            driver_connection.add_termination_listener(
+                lambda _: self._on_connection_lost(connection)
+            )
+        except Exception:
+            await connection.close()
+            raise
+        self._connection_lost.clear()
+        self._connection = connection
+
+    def _on_connection_lost(self, connection: AsyncConnection) -> None:
+        # Ignore a connection already replaced
+        if connection is self._connection:
+            self._connection_lost.set()
+
+    async def _is_alive(self) -> bool:
+        try:
+            raw_connection = await self._connection.get_raw_connection()
+            # On the driver connection, as a transaction would hold back notifications
+            await raw_connection.driver_connection.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def _keep_listening(self) -> None:
+        """
+        Reconnects the listening connection whenever it drops, found out from the
+        driver or a periodic check, retrying with exponential backoff.
+        """
+        while True:
+            if self._connection is None:
+                delay, max_delay = LISTEN_RETRY_SECONDS
+                while self._connection is None:
+                    try:
+                        await self._connect()
+                    except Exception as e:
+                        logger.warning(
+                            f"Slot events connection failed, retrying in {delay}s: {e}"
+                        )
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, max_delay)
+                logger.info("Listening for slot events.")
+                # Changes made while disconnected were missed, so subscribers search
+                # again
+                self._resync()
+
+            try:
+                await asyncio.wait_for(
+                    self._connection_lost.wait(), timeout=LISTEN_CHECK_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await self._is_alive():
+                    continue
+
+            # Fall back to in-process fan-out until listening again
+            connection, self._connection = self._connection, None
+            logger.warning("Lost the slot events connection, reconnecting.")
+            try:
+                await connection.invalidate()
+            except Exception:
+                pass
+
+    async def close(self) -> None:
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def notify(self, db: AsyncSession, type: str, slot_ids: list[str]) -> None:
+        """
+        Publishes a change to some slots once the session's transaction commits.
+
+        Args:
+            db (AsyncSession): The database session making the change.
+            type (str): `SLOT_TAKEN` or `SLOT_FREED`.
+            slot_ids (list[str]): The booking slot ids.
+        """
+        if not slot_ids:
+            return
+
+        if not self.listening:
+            run_after_commit(db, lambda: self._dispatch(type, slot_ids))
+            return
+
+        for start in range(0, len(slot_ids), NOTIFY_BATCH_SIZE):
+            payload = json.dumps(
+                {
+                    "type": type,
+                    "ids": slot_ids[start : start + NOTIFY_BATCH_SIZE],
+                    "origin": self.origin,
+                }
+            )
+            await db.execute(select(func.pg_notify(NOTIFY_CHANNEL, payload)))
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            type, slot_ids = message["type"], message["ids"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed slot event: {payload}")
+            return
+
+        # Changes from other workers also have to be applied to this worker's index
+        if message.get("origin") != self.origin:
+            apply = (
+                self.availability.mark_booked
+                if type == SLOT_TAKEN
+                else self.availability.mark_free
+            )
+            for slot_id in slot_ids:
+                apply(slot_id)
+
+        self._dispatch(type, slot_ids)
+
+    def _dispatch(self, type: str, slot_ids: list[str]) -> None:
+        unseen = []
+        for slot_id in slot_ids:
+            slot = self.availability.slot(slot_id)
+            if slot is None:
+                unseen.append(slot_id)
+            else:
+                self._publish(type, slot)
+
+        # Slots created or booked before the index last loaded are looked up instead
+        if unseen and self._engine is not None:
+            task = asyncio.create_task(self._load_and_dispatch(type, unseen))
+            self._loads.add(task)
+            task.add_done_callback(self._loads.discard)
+
+    async def _load_and_dispatch(self, type: str, slot_ids: list[str]) -> None:
+        """
+        Looks up slots the availability index had not seen and publishes their
+        change, loading freed ones into the index.
+
+        Args:
+            type (str): `SLOT_TAKEN` or `SLOT_FREED`.
+            slot_ids (list[str]): The booking slot ids.
+        """
+        try:
+            async with AsyncSession(self._engine) as db:
+                if type == SLOT_FREED:
+                    await self.availability.add_slots(db, BookingSlot.id.in_(slot_ids))
+                result = await db.execute(
+                    select(
+                        BookingSlot.datetime,
+                        BookingSlot.id,
+                        BookingSlot.polyclinic_id,
+                        BookingSlot.vaccine_id,
+                    ).where(BookingSlot.id.in_(slot_ids))
+                )
+                slots = [FreeSlot(*row) for row in result.all()]
+        except Exception as e:
+            logger.error(f"Loading slots for slot events failed: {e}", exc_info=True)
+            return
+
+        for slot in slots:
+            self._publish(type, slot)
+
+    def _publish(self, type: str, slot: FreeSlot) -> None:
+        event = SlotEvent(
+            type, slot.id, slot.vaccine_id, slot.polyclinic_id, slot.datetime
+        )
+        # A queue subscribed to both the clinic and all clinics gets it once
+        queues = self._subscribers.get(
+            (slot.vaccine_id, slot.polyclinic_id), set()
+        ) | self._subscribers.get((slot.vaccine_id, None), set())
+        for queue in queues:
+            self._put(queue, event)
+
+    def _resync(self) -> None:
+        event = SlotEvent(SLOT_RESYNC, None, None, None, None)
+        for queue in set().union(*self._subscribers.values()):
+            self._put(queue, event)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: SlotEvent) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Rather than block publishers on a slow client, replace its backlog
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(SlotEvent(SLOT_RESYNC, None, None, None, None))
+
+    @asynccontextmanager
+    async def subscribe(
+        self, pairs: set[tuple[str, str | None]]
+    ) -> AsyncIterator[asyncio.Queue]:
+        """
+        Subscribes to the changes of some (vaccine id, polyclinic id) pairs, where a
+        polyclinic id of None stands for every polyclinic.
+
+        Args:
+            pairs (set[tuple[str, str | None]]): The pairs to subscribe to.
+
+        Yields:
+            asyncio.Queue: The queue receiving `SlotEvent`s.
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        for pair in pairs:
+            self._subscribers[pair].add(queue)
+        try:
+            yield queue
+        finally:
+            for pair in pairs:
+                self._subscribers[pair].discard(queue)
+                if not self._subscribers[pair]:
+                    del self._subscribers[pair]
+
+
+def to_server_sent_event(event: SlotEvent) -> str:
+    """
+    Formats an event as a server-sent event, named after its type.
+
+    Args:
+        event (SlotEvent): The event.
+
+    Returns:
+        str: The `text/event-stream` message.
+    """
+    data = event._asdict()
+    del data["type"]
+    if event.datetime is not None:
+        data["datetime"] = event.datetime.isoformat()
+    return f"event: {event.type}\ndata: {json.dumps(data)}\n\n"
+
+
+def get_slot_events(request: Request) -> SlotEventBroker:
+    """
+    Gets the application's slot event broker, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        SlotEventBroker: The slot event broker.
+    """
+    if getattr(request.app.state, "slot_events", None) is None:
+        request.app.state.slot_events = SlotEventBroker(get_availability_index(request))
+    return request.app.state.slot_events
@@ -0,0 +1,202 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple
+
+from fastapi import Request
+from sqlalchemy import delete, exists, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.database import dialect_insert
+from app.models.models import SlotHold
+
+
+def _utcnow() -> datetime:
+    # Hold expiries are stored as naive UTC datetimes
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Hold(NamedTuple):
+    id: str
+    booking_slot_id: str
+    user_id: str
+    expires_at: datetime
+
+
+class SlotHolds:
+    """
+    Short-lived leases on booking slots, taken while a user confirms a slot they were
+    shown so that nobody else can book it in the meantime.
+
+    Holds are rows of the `slotholds` table, so every worker sees the same holds and
+    they survive restarts. A hold is void once its `expires_at` has passed, which every
+    read checks, and expired rows are deleted whenever a new hold is placed, so no
+    background task is needed. Holds are written in the caller's transaction: a hold
+    placed while freeing a slot only exists if the slot is freed.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int | None = None,
+        clock: Callable[[], datetime] = _utcnow,
+    ):
+        self.ttl_seconds = ttl_seconds or settings.slot_hold_seconds
+        self.clock = clock
+
+    @staticmethod
+    def _to_hold(row: SlotHold) -> Hold:
+        return Hold(
+            id=row.id,
+            booking_slot_id=row.booking_slot_id,
+            user_id=row.user_id,
+            expires_at=row.expires_at.replace(tzinfo=timezone.utc),
+        )
+
+    async def _find(self, db: AsyncSession, *criteria) -> Hold | None:
+        result = await db.execute(
+            select(SlotHold).where(SlotHold.expires_at > self.clock(), *criteria)
+        )
+        row = result.scalars().first()
+        return self._to_hold(row) if row else None
+
+    async def hold(self, db: AsyncSession, slot_id: str, user_id: str) -> Hold | None:
+        """
+        Holds a slot for a user for `ttl_seconds`. Holding a slot the user already
+        holds renews the lease.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            slot_id (str): The booking slot id.
+            user_id (str): The id of the user holding the slot.
+
+        Returns:
+            Hold | None: The hold, or None if another user holds the slot.
+        """
+        now = self.clock()
+        # Expired holds no longer count, so their slots can be held again
+        await db.execute(
+            delete(SlotHold)
+            .where(SlotHold.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+
+        # Insert the hold, or renew the user's own, but never take over another's
+        insert = dialect_insert(db)(SlotHold).values(
+            id=str(uuid.uuid4()),
+            booking_slot_id=slot_id,
+            user_id=user_id,
+            expires_at=now + timedelta(seconds=self.ttl_seconds),
+        )
+        await db.execute(
+            insert.on_conflict_do_update(
+                index_elements=[SlotHold.booking_slot_id],
+                set_={"expires_at": insert.excluded.expires_at},
+                where=SlotHold.user_id == user_id,
+            )
+        )
+
+        hold = await self._find(db, SlotHold.booking_slot_id == slot_id)
+        return hold if hold is not None and hold.user_id == user_id else None
+
+    async def get(self, db: AsyncSession, hold_id: str) -> Hold | None:
+        return await self._find(db, SlotHold.id == hold_id)
+
+    async def release(self, db: AsyncSession, hold_id: str) -> Hold | None:
+        """
+        Releases a hold, e.g. once the user changes their mind.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            hold_id (str): The hold id.
+
+        Returns:
+            Hold | None: The released hold, or None if it had already expired.
+        """
+        hold = await self.get(db, hold_id)
+        await db.execute(
+            delete(SlotHold)
+            .where(SlotHold.id == hold_id)
+            .execution_options(synchronize_session=False)
+        )
+        return hold
+
+    async def release_slots(self, db: AsyncSession, slot_ids: list[str]) -> None:
+        """
+        Drops the holds on some slots, e.g. in the transaction booking them.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            slot_ids (list[str]): The booking slot ids.
+        """
+        if slot_ids:
+            await db.execute(
+                delete(SlotHold)
+                .where(SlotHold.booking_slot_id.in_(slot_ids))
+                .execution_options(synchronize_session=False)
+            )
+
+    async def count_for(self, db: AsyncSession, user_id: str) -> int:
+        return await db.scalar(
+            select(func.count(SlotHold.id)).where(
+                SlotHold.user_id == user_id, SlotHold.expires_at > self.clock()
+            )
+        )
+
+    async def holder_of(self, db: AsyncSession, slot_id: str) -> str | None:
+        hold = await self._find(db, SlotHold.booking_slot_id == slot_id)
+        return hold.user_id if hold else None
+
+    async def is_held_by_other(
+        self, db: AsyncSession, slot_id: str, user_id: str
+    ) -> bool:
+        return await self.holder_of(db, slot_id) not in (None, user_id)
+
+    async def held_by_others(self, db: AsyncSession, user_id: str) -> set[str]:
+        """
+        Gets the slots held by anyone but a user, to leave out of their searches.
+
+        Args:
+            db (AsyncSession): The database session.
+            user_id (str): The id of the user searching.
+
+        Returns:
+            set[str]: The booking slot ids.
+        """
+        result = await db.execute(
+            select(SlotHold.booking_slot_id).where(
+                SlotHold.user_id != user_id, SlotHold.expires_at > self.clock()
+            )
+        )
+        return set(result.scalars().all())
+
+    def is_held(self, slot_id_column):
+        """
+        Builds a SQL criterion for slots anyone currently holds, to leave them out of
+        bulk queries.
+
+        Args:
+            slot_id_column: The booking slot id column to check, e.g. `BookingSlot.id`.
+
+        Returns:
+            The criterion.
+        """
+        return exists().where(
+            SlotHold.booking_slot_id == slot_id_column,
+            SlotHold.expires_at > self.clock(),
+        )
+
+
+def get_slot_holds(request: Request) -> SlotHolds:
+    """
+    Gets the application's slot holds, creating them on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        SlotHolds: The slot holds.
+    """
+    if getattr(request.app.state, "slot_holds", None) is None:
+        request.app.state.slot_holds = SlotHolds()
+    return request.app.state.slot_holds
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.database import dialect_insert
+from app.models.models import IdempotencyKey
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _utcnow() -> datetime:
+    # Key expiries are stored as naive UTC datetimes
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    # None while the request is still running
+    status_code: int | None
+    body: bytes | None
+    media_type: str | None
+    expires_at: datetime
+
+
+def fingerprint(*parts: str) -> str:
+    """
+    Fingerprints a request, so a key reused for a different request is caught.
+
+    Args:
+        *parts (str): What identifies the request, e.g. its path and body.
+
+    Returns:
+        str: The fingerprint.
+    """
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Remembers the responses to booking mutations sent with an `Idempotency-Key`
+    header, per (user id, key), so a retried request is answered with the original
+    response instead of being run again. Only successful responses are kept: a failed
+    request changed nothing, so running it again is harmless.
+
+    Entries are rows of the `idempotencykeys` table, whose primary key lets a single
+    request per (user id, key) claim it on any worker. The claim is written in the
+    request's own transaction, so it commits along with the booking change, and the
+    response is stored right after. Entries live for `ttl_seconds`, and expired ones
+    are deleted whenever a key is claimed.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int | None = None,
+        clock: Callable[[], datetime] = _utcnow,
+    ):
+        self.ttl_seconds = ttl_seconds or settings.idempotency_key_ttl_seconds
+        self.clock = clock
+        # Requests in flight on this worker, which retries with the same key wait for
+        self._pending: dict[tuple[str, str], asyncio.Event] = {}
+
+    async def get(
+        self, db: AsyncSession, user_id: str, key: str
+    ) -> StoredResponse | None:
+        result = await db.execute(
+            select(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at > self.clock(),
+            )
+        )
+        row = result.scalars().first()
+        if row is None:
+            return None
+        return StoredResponse(
+            row.fingerprint, row.status_code, row.body, row.media_type, row.expires_at
+        )
+
+    async def _claim(
+        self, db: AsyncSession, user_id: str, key: str, request_fingerprint: str
+    ) -> bool:
+        """
+        Claims a key for a request, unless another request holds it.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            user_id (str): The id of the user making the request.
+            key (str): The `Idempotency-Key` header.
+            request_fingerprint (str): The request's `fingerprint()`.
+
+        Returns:
+            bool: Whether the key was claimed.
+        """
+        now = self.clock()
+        # Expired keys may be reused
+        await db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+
+        # On Postgres, waits for a concurrent claim of the same key to commit first
+        result = await db.execute(
+            dialect_insert(db)(IdempotencyKey)
+            .values(
+                user_id=user_id,
+                key=key,
+                fingerprint=request_fingerprint,
+                expires_at=now + timedelta(seconds=self.ttl_seconds),
+            )
+            .on_conflict_do_nothing(
+                index_elements=[IdempotencyKey.user_id, IdempotencyKey.key]
+            )
+        )
+        return result.rowcount == 1
+
+    async def _replay(
+        self, db: AsyncSession, user_id: str, key: str, request_fingerprint: str
+    ) -> Response:
+        stored = await self.get(db, user_id, key)
+
+        if stored is not None and stored.fingerprint != request_fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request.",
+            )
+
+        if stored is None or stored.status_code is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress.",
+            )
+
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type=stored.media_type,
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    async def run(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        key: str | None,
+        request_fingerprint: str,
+        call: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """
+        Runs a request once per (user id, key), replaying the stored response for
+        retries. A retry arriving at the same worker while the original is still
+        running waits for it.
+
+        Args:
+            db (AsyncSession): The database session, which `call` commits.
+            user_id (str): The id of the user making the request.
+            key (str | None): The `Idempotency-Key` header, if any.
+            request_fingerprint (str): The request's `fingerprint()`.
+            call (Callable[[], Awaitable[Response]]): Handles the request.
+
+        Returns:
+            Response: The response, marked with an `Idempotent-Replayed` header if it
+                was replayed.
+
+        Raises:
+            HTTPException: Raise 422 if the key was used for a different request, or
+                409 if the original request is still running on another worker.
+        """
+        if key is None:
+            return await call()
+
+        entry_key = (user_id, key)
+        while (pending := self._pending.get(entry_key)) is not None:
+            await pending.wait()
+
+        self._pending[entry_key] = asyncio.Event()
+        try:
+            if not await self._claim(db, user_id, key, request_fingerprint):
+                return await self._replay(db, user_id, key, request_fingerprint)
+
+            try:
+                response = await call()
+            except Exception:
+                # Release the key along with the failed request's changes
+                await db.rollback()
+                raise
+
+            if response.status_code >= 400:
+                await db.rollback()
+                return response
+
+            await db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                .values(
+                    status_code=response.status_code,
+                    body=response.body,
+                    media_type=response.media_type,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            return response
+        finally:
+            self._pending.pop(entry_key).set()
+
+
+def get_idempotency_store(request: Request) -> IdempotencyStore:
+    """
+    Gets the application's idempotency store, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        IdempotencyStore: The idempotency store.
+    """
+    if getattr(request.app.state, "idempotency_store", None) is None:
+        request.app.state.idempotency_store = IdempotencyStore()
+    return request.app.state.idempotency_store
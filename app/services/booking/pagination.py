@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+def encode_cursor(positions: dict[str, tuple[datetime, str]]) -> str:
+    """
+    Encodes keyset positions, i.e. the (datetime, id) of the last slot returned per
+    polyclinic so far, as an opaque URL-safe cursor.
+
+    Pages pick a few slots per polyclinic, so a single position for the whole page
+    would skip the slots of one polyclinic that fall before the last slot of another.
+
+    Args:
+        positions (dict[str, tuple[datetime, str]]): The (datetime, id) of the last
+            slot returned, by polyclinic id.
+
+    Returns:
+        str: The cursor.
+    """
+    raw = json.dumps(
+        {
+            polyclinic_id: [slot_datetime.isoformat(), slot_id]
+            for polyclinic_id, (slot_datetime, slot_id) in positions.items()
+        },
+        separators=(",", ":"),
+    ).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, tuple[datetime, str]]:
+    """
+    Decodes a cursor created by `encode_cursor()`.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        dict[str, tuple[datetime, str]]: The (datetime, id) of the last slot returned,
+            by polyclinic id.
+
+    Raises:
+        ValueError: Raise ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        return {
+            polyclinic_id: (datetime.fromisoformat(slot_datetime), slot_id)
+            for polyclinic_id, (slot_datetime, slot_id) in json.loads(raw).items()
+        }
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, AttributeError):
+        raise ValueError(f"Invalid cursor {cursor}.")
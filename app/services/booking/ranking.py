@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import numpy as np
+
+from app.services.catalog.geo import smallest_k
+
+
+def rank_by_distance_and_wait(
+    distances_km: np.ndarray,
+    slot_datetimes: list[datetime],
+    distance_weight: float,
+    wait_weight: float,
+    k: int,
+) -> np.ndarray:
+    """
+    Ranks candidate (clinic, slot) pairs by `distance_weight * km + wait_weight * days`,
+    lowest first, in one vectorized pass. The wait is counted from the earliest
+    candidate slot rather than from now, which ranks the pairs the same way but keeps
+    the scores meaningful when searching from a future start date.
+
+    Args:
+        distances_km (np.ndarray): The distance to each pair's clinic, in km.
+        slot_datetimes (list[datetime]): The datetime of each pair's slot.
+        distance_weight (float): The score of a kilometre of travel.
+        wait_weight (float): The score of a day of waiting.
+        k (int): The number of pairs to return.
+
+    Returns:
+        np.ndarray: The positions of the `k` best pairs, best first.
+    """
+    datetimes = np.array(slot_datetimes, dtype="datetime64[s]")
+    if datetimes.size == 0:
+        return np.empty(0, dtype=np.intp)
+
+    wait_days = (datetimes - datetimes.min()) / np.timedelta64(1, "D")
+    scores = wait_weight * wait_days
+    # Skipped rather than multiplied, as 0 * inf (a clinic without coordinates) is nan
+    if distance_weight:
+        scores = scores + distance_weight * distances_km
+    return smallest_k(scores, k)
@@ -0,0 +1,112 @@
+import uuid
+
+from sqlalchemy import case, exists, literal, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.models.database import dialect_insert
+from app.models.models import BookingSlot, VaccineRecord
+from app.services.etag import bump_user_versions
+
+
+async def reserve_slots(
+    db: AsyncSession, user_id: str, slot_ids: list[str]
+) -> list[VaccineRecord]:
+    """
+    Books slots for a user in a single round trip, with one conditional
+    `INSERT ... SELECT ... WHERE NOT EXISTS ... ON CONFLICT DO NOTHING RETURNING`.
+
+    A slot that does not exist, is already booked, or is taken by a concurrent request
+    (caught by the unique constraint on `vaccinerecords.booking_slot_id`) is skipped
+    rather than raising, so callers compare the returned records with `slot_ids` to
+    tell the outcome.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        user_id (str): The id of the user booking the slots.
+        slot_ids (list[str]): The booking slot ids.
+
+    Returns:
+        list[VaccineRecord]: The new vaccine records, one per slot actually booked.
+    """
+    if not slot_ids:
+        return []
+
+    # Record ids are generated here, as SQLite has no UUID function
+    record_ids = {slot_id: str(uuid.uuid4()) for slot_id in slot_ids}
+    record_id = (
+        literal(record_ids[slot_ids[0]])
+        if len(record_ids) == 1
+        else case(record_ids, value=BookingSlot.id)
+    )
+    booked = aliased(VaccineRecord)
+    insert = dialect_insert(db)
+
+    stmt = (
+        insert(VaccineRecord)
+        .from_select(
+            ["id", "user_id", "booking_slot_id", "status"],
+            select(
+                record_id,
+                literal(user_id),
+                BookingSlot.id,
+                literal("booked"),
+            ).where(
+                BookingSlot.id.in_(slot_ids),
+                ~exists().where(booked.booking_slot_id == BookingSlot.id),
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=[VaccineRecord.booking_slot_id])
+        .returning(VaccineRecord)
+    )
+
+    result = await db.execute(stmt)
+    records = list(result.scalars().all())
+    if records:
+        await bump_user_versions(db, [user_id])
+    return records
+
+
+async def move_booking(
+    db: AsyncSession, record_id: str, from_slot_id: str, to_slot_id: str
+) -> VaccineRecord | None:
+    """
+    Moves a booking to another slot with one conditional
+    `UPDATE ... WHERE NOT EXISTS ... RETURNING`, which only matches while the record is
+    still on `from_slot_id` and `to_slot_id` is still free.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        record_id (str): The id of the vaccine record to move.
+        from_slot_id (str): The booking slot id the record is expected to be on.
+        to_slot_id (str): The booking slot id to move the record to.
+
+    Returns:
+        VaccineRecord | None: The updated vaccine record, or None if the record moved
+            or the new slot was booked in the meantime.
+
+    Raises:
+        IntegrityError: Raise IntegrityError if a concurrent transaction books
+            `to_slot_id` first, caught by the unique constraint on
+            `vaccinerecords.booking_slot_id`.
+    """
+    booked = aliased(VaccineRecord)
+
+    stmt = (
+        update(VaccineRecord)
+        .where(
+            VaccineRecord.id == record_id,
+            VaccineRecord.booking_slot_id == from_slot_id,
+            ~exists().where(booked.booking_slot_id == to_slot_id),
+        )
+        .values(booking_slot_id=to_slot_id)
+        .returning(VaccineRecord)
+        .execution_options(populate_existing=True)
+    )
+
+    result = await db.execute(stmt)
+    record = result.scalar_one_or_none()
+    if record:
+        await bump_user_versions(db, [record.user_id])
+    return record
@@ -0,0 +1,141 @@
+import time as timer
+import uuid
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.database import dialect_insert
+from app.models.models import BookingSlot
+from app.schemas.booking import SlotTemplate
+
+SLOT_COLUMNS = ["id", "polyclinic_id", "vaccine_id", "datetime"]
+
+
+class SlotGenerationReport(NamedTuple):
+    generated: int
+    inserted: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.generated / self.seconds if self.seconds else 0.0
+
+
+def expand_templates(
+    templates: list[SlotTemplate], start_date: date, end_date: date
+) -> Iterator[tuple[str, str, str, datetime]]:
+    """
+    Expands schedule templates into booking slot rows, lazily, so millions of rows
+    never sit in memory at once.
+
+    Args:
+        templates (list[SlotTemplate]): The schedule templates.
+        start_date (date): The first day to generate slots for.
+        end_date (date): The last day to generate slots for (inclusive).
+
+    Yields:
+        tuple[str, str, str, datetime]: The (id, polyclinic id, vaccine id, datetime)
+            of each slot.
+    """
+    # The times of day only depend on the template, so compute them once
+    times_of_day = []
+    for template in templates:
+        day_start = datetime.combine(date.min, template.start_time)
+        day_end = datetime.combine(date.min, template.end_time)
+        step = timedelta(minutes=template.interval_minutes)
+        count = -(-(day_end - day_start) // step)
+        times_of_day.append([(day_start + step * i).time() for i in range(count)])
+
+    day = start_date
+    while day <= end_date:
+        weekday = day.weekday()
+        for template, times in zip(templates, times_of_day):
+            if weekday not in template.weekdays:
+                continue
+            polyclinic_id, vaccine_id = (
+                str(template.polyclinic_id),
+                str(template.vaccine_id),
+            )
+            for time_of_day in times:
+                yield (
+                    str(uuid.uuid4()),
+                    polyclinic_id,
+                    vaccine_id,
+                    datetime.combine(day, time_of_day),
+                )
+        day += timedelta(days=1)
+
+
+async def _copy_batch(db: AsyncSession, batch: list[tuple]) -> int:
+    # COPY cannot skip duplicates, so stage the batch and insert it from there
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    await driver_connection.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS bookingslots_staging "
+        "(id text, polyclinic_id text, vaccine_id text, datetime timestamp) "
+        "ON COMMIT DELETE ROWS"
+    )
+    await driver_connection.copy_records_to_table(
+        "bookingslots_staging", records=batch, columns=SLOT_COLUMNS
+    )
+    status = await driver_connection.execute(
+        "INSERT INTO bookingslots (id, polyclinic_id, vaccine_id, datetime) "
+        "SELECT id, polyclinic_id, vaccine_id, datetime FROM bookingslots_staging "
+        "ON CONFLICT (polyclinic_id, vaccine_id, datetime) DO NOTHING"
+    )
+    # The status is "INSERT 0 <rows>"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+async def _insert_batch(db: AsyncSession, batch: list[tuple]) -> int:
+    result = await db.execute(
+        dialect_insert(db)(BookingSlot.__table__).on_conflict_do_nothing(
+            index_elements=["polyclinic_id", "vaccine_id", "datetime"]
+        ),
+        [dict(zip(SLOT_COLUMNS, row)) for row in batch],
+    )
+    return result.rowcount
+
+
+async def load_slots(
+    db: AsyncSession,
+    rows: Iterable[tuple[str, str, str, datetime]],
+    batch_size: int | None = None,
+) -> SlotGenerationReport:
+    """
+    Loads booking slot rows in batches, each committed on its own, skipping slots
+    that already exist (same polyclinic, vaccine and datetime), so an interrupted or
+    repeated run can simply be started again.
+
+    On Postgres each batch is sent with `COPY` into a staging table and inserted
+    from there; other databases fall back to `executemany`.
+
+    Args:
+        db (AsyncSession): The database session.
+        rows (Iterable[tuple[str, str, str, datetime]]): The rows, e.g. from
+            `expand_templates()`.
+        batch_size (int | None): The rows per batch, `slot_generation_batch_size` by
+            default.
+
+    Returns:
+        SlotGenerationReport: The rows generated and inserted, and the time taken.
+    """
+    batch_size = batch_size or settings.slot_generation_batch_size
+    load_batch = (
+        _copy_batch if db.get_bind().dialect.name == "postgresql" else _insert_batch
+    )
+
+    rows = iter(rows)
+    generated = inserted = 0
+    started = timer.perf_counter()
+    while batch := list(islice(rows, batch_size)):
+        inserted += await load_batch(db, batch)
+        await db.commit()
+        generated += len(batch)
+
+    return SlotGenerationReport(generated, inserted, timer.perf_counter() - started)
@@ -0,0 +1,260 @@
+import uuid
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from fastapi import Request
+from sqlalchemy import delete, exists, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.models.models import BookingSlot
+from app.models.models import WaitlistEntry as WaitlistEntryRow
+from app.models.models import WaitlistEntryClinic
+from app.services.booking.availability import AvailabilityIndex, get_availability_index
+from app.services.booking.holds import Hold, SlotHolds, get_slot_holds
+
+
+class WaitlistEntry(NamedTuple):
+    id: str
+    user_id: str
+    vaccine_id: str
+    # None stands for every polyclinic
+    polyclinic_ids: frozenset[str] | None
+    start_datetime: datetime | None
+    end_datetime: datetime | None
+    created_at: datetime
+    # The hold offered once a matching slot was freed, if any
+    offer_hold_id: str | None
+
+
+def _to_entry(row: WaitlistEntryRow) -> WaitlistEntry:
+    return WaitlistEntry(
+        id=row.id,
+        user_id=row.user_id,
+        vaccine_id=row.vaccine_id,
+        polyclinic_ids=frozenset(clinic.polyclinic_id for clinic in row.clinics)
+        or None,
+        start_datetime=row.start_datetime,
+        end_datetime=row.end_datetime,
+        created_at=row.created_at.replace(tzinfo=timezone.utc),
+        offer_hold_id=row.offer_hold_id,
+    )
+
+
+class Waitlist:
+    """
+    Users waiting for a slot of a vaccine at some polyclinics within a datetime window.
+    When a slot is freed, the earliest-registered matching entry is offered it as a
+    slot hold, which the user confirms like any other hold. Matching runs in the
+    transaction freeing the slot, so the hold is placed only if the slot is freed.
+
+    Entries are rows of the `waitlistentries` table, with the polyclinics they accept
+    in `waitlistentryclinics`, so every worker matches against the same queue. Matching
+    a freed slot walks the (vaccine id, created_at) index in queue order and stops at
+    the first entry whose polyclinics and window fit, so only candidate entries of the
+    slot's vaccine are examined. Offered entries are done with once their hold is
+    confirmed, released or expired, and are dropped lazily as the user's entries are
+    read.
+    """
+
+    def __init__(self, availability: AvailabilityIndex, holds: SlotHolds):
+        self.availability = availability
+        self.holds = holds
+
+    async def join(
+        self,
+        db: AsyncSession,
+        user_id: str,
+        vaccine_id: str,
+        polyclinic_ids: set[str] | None = None,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> WaitlistEntry:
+        """
+        Adds a user to the back of the waitlist.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            user_id (str): The id of the user waiting.
+            vaccine_id (str): The vaccine id.
+            polyclinic_ids (set[str] | None): The acceptable polyclinic ids, or None for all.
+            start_datetime (datetime | None): The earliest acceptable slot datetime.
+            end_datetime (datetime | None): The latest acceptable slot datetime.
+
+        Returns:
+            WaitlistEntry: The new entry.
+        """
+        row = WaitlistEntryRow(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            vaccine_id=vaccine_id,
+            start_datetime=start_datetime,
+            end_datetime=end_datetime,
+            created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            clinics=[
+                WaitlistEntryClinic(polyclinic_id=polyclinic_id)
+                for polyclinic_id in sorted(polyclinic_ids or ())
+            ],
+        )
+        db.add(row)
+        await db.flush()
+        return _to_entry(row)
+
+    async def leave(self, db: AsyncSession, entry_id: str) -> None:
+        await db.execute(
+            delete(WaitlistEntryClinic)
+            .where(WaitlistEntryClinic.entry_id == entry_id)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(WaitlistEntryRow)
+            .where(WaitlistEntryRow.id == entry_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _entries(self, db: AsyncSession, *criteria) -> list[WaitlistEntry]:
+        result = await db.execute(
+            select(WaitlistEntryRow)
+            .options(selectinload(WaitlistEntryRow.clinics))
+            .where(*criteria)
+            .order_by(WaitlistEntryRow.created_at, WaitlistEntryRow.id)
+        )
+        return [_to_entry(row) for row in result.scalars().all()]
+
+    async def get(self, db: AsyncSession, entry_id: str) -> WaitlistEntry | None:
+        entries = await self._entries(db, WaitlistEntryRow.id == entry_id)
+        return entries[0] if entries else None
+
+    async def offer_for(self, db: AsyncSession, entry: WaitlistEntry) -> Hold | None:
+        """
+        Gets the hold offered to an entry, while it can still be confirmed.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            entry (WaitlistEntry): The waitlist entry.
+
+        Returns:
+            Hold | None: The hold, or None if nothing was offered or it expired.
+        """
+        if entry.offer_hold_id is None:
+            return None
+
+        hold = await self.holds.get(db, entry.offer_hold_id)
+        if hold is None:
+            # Confirmed, released or expired, so the entry is done with
+            await self.leave(db, entry.id)
+        return hold
+
+    async def entries_for(
+        self, db: AsyncSession, user_id: str
+    ) -> list[tuple[WaitlistEntry, Hold | None]]:
+        """
+        Gets a user's waitlist entries with their offers, dropping the entries whose
+        offer was since confirmed or expired on the way.
+
+        Args:
+            db (AsyncSession): The database session. The caller commits.
+            user_id (str): The user id.
+
+        Returns:
+            list[tuple[WaitlistEntry, Hold | None]]: The entries and their offers, in
+                queue order.
+        """
+        entries = []
+        for entry in await self._entries(db, WaitlistEntryRow.user_id == user_id):
+            offer = await self.offer_for(db, entry)
+            if entry.offer_hold_id is None or offer is not None:
+                entries.append((entry, offer))
+        return entries
+
+    async def count_for(self, db: AsyncSession, user_id: str) -> int:
+        return len(await self.entries_for(db, user_id))
+
+    async def match(self, db: AsyncSession, slot_id: str) -> Hold | None:
+        """
+        Offers a slot being freed to the first waiting entry it suits, by holding it
+        for them in the same transaction.
+
+        Args:
+            db (AsyncSession): The database session freeing the slot. The caller
+                commits.
+            slot_id (str): The booking slot id.
+
+        Returns:
+            Hold | None: The hold placed for the matched entry's user, if any.
+        """
+        result = await db.execute(
+            select(
+                BookingSlot.vaccine_id, BookingSlot.polyclinic_id, BookingSlot.datetime
+            ).where(BookingSlot.id == slot_id)
+        )
+        slot = result.one_or_none()
+        # A slot that is gone, has passed or is already held is not on offer
+        if slot is None or slot.datetime < self.availability.now():
+            return None
+        if await self.holds.holder_of(db, slot_id) is not None:
+            return None
+
+        # The first entry not yet offered a slot whose polyclinics and window fit;
+        # on Postgres, entries being offered a slot by a concurrent match are skipped
+        clinics = select(WaitlistEntryClinic).where(
+            WaitlistEntryClinic.entry_id == WaitlistEntryRow.id
+        )
+        result = await db.execute(
+            select(WaitlistEntryRow.id, WaitlistEntryRow.user_id)
+            .where(
+                WaitlistEntryRow.vaccine_id == slot.vaccine_id,
+                WaitlistEntryRow.offer_hold_id.is_(None),
+                or_(
+                    WaitlistEntryRow.start_datetime.is_(None),
+                    WaitlistEntryRow.start_datetime <= slot.datetime,
+                ),
+                or_(
+                    WaitlistEntryRow.end_datetime.is_(None),
+                    WaitlistEntryRow.end_datetime >= slot.datetime,
+                ),
+                or_(
+                    ~exists(clinics),
+                    exists(
+                        clinics.where(
+                            WaitlistEntryClinic.polyclinic_id == slot.polyclinic_id
+                        )
+                    ),
+                ),
+            )
+            .order_by(WaitlistEntryRow.created_at, WaitlistEntryRow.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        entry = result.one_or_none()
+        if entry is None:
+            return None
+
+        hold = await self.holds.hold(db, slot_id, entry.user_id)
+        if hold is None:
+            return None
+        await db.execute(
+            update(WaitlistEntryRow)
+            .where(WaitlistEntryRow.id == entry.id)
+            .values(offer_hold_id=hold.id)
+            .execution_options(synchronize_session=False)
+        )
+        return hold
+
+
+def get_waitlist(request: Request) -> Waitlist:
+    """
+    Gets the application's waitlist, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        Waitlist: The waitlist.
+    """
+    if getattr(request.app.state, "waitlist", None) is None:
+        request.app.state.waitlist = Waitlist(
+            get_availability_index(request), get_slot_holds(request)
+        )
+    return request.app.state.waitlist
@@ -0,0 +1,131 @@
+import hashlib
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.models import Address, Clinic
+from app.services.refresh import RefreshableIndex
+
+
+class CatalogAddress(NamedTuple):
+    postal_code: str
+    address: str
+    latitude: float
+    longitude: float
+
+
+class CatalogClinic(NamedTuple):
+    id: str
+    name: str
+    type: str
+    address: CatalogAddress
+
+
+class ClinicSnapshot(NamedTuple):
+    # Digest of the clinics and addresses loaded, which changes whenever one changes
+    version: str
+    clinics: Mapping[str, CatalogClinic]
+    # The clinic ids of each type, in id order
+    by_type: Mapping[str, tuple[str, ...]]
+
+
+EMPTY_SNAPSHOT = ClinicSnapshot("", MappingProxyType({}), MappingProxyType({}))
+
+
+class ClinicCatalog(RefreshableIndex):
+    """
+    An immutable in-memory snapshot of every clinic with its address, so responses
+    listing clinics are built without joining `clinics` and `addresses`. Records are
+    named tuples, which hold their fields without a per-instance `__dict__`.
+
+    A refresh builds a whole new `ClinicSnapshot` and swaps it in with one assignment,
+    so a request reading `snapshot` once sees a single version throughout.
+    """
+
+    def __init__(self):
+        super().__init__(max_age_seconds=settings.catalog_refresh_seconds)
+        self.snapshot = EMPTY_SNAPSHOT
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Reloads the clinics and their addresses from the database.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        result = await db.execute(
+            select(
+                Clinic.id,
+                Clinic.name,
+                Clinic.type,
+                Address.postal_code,
+                Address.address,
+                Address.latitude,
+                Address.longitude,
+            )
+            .join(Clinic.address)
+            .order_by(Clinic.id)
+        )
+
+        clinics, by_type = {}, {}
+        digest = hashlib.sha256()
+        for id, name, type, postal_code, address, latitude, longitude in result.all():
+            clinics[id] = CatalogClinic(
+                id,
+                name,
+                type,
+                CatalogAddress(postal_code, address, float(latitude), float(longitude)),
+            )
+            by_type.setdefault(type, []).append(id)
+            digest.update(
+                f"{id},{name},{type},{postal_code},{address},{latitude},{longitude};".encode()
+            )
+
+        self.snapshot = ClinicSnapshot(
+            digest.hexdigest(),
+            MappingProxyType(clinics),
+            MappingProxyType({type: tuple(ids) for type, ids in by_type.items()}),
+        )
+        self.mark_loaded()
+
+    async def get_many(
+        self, db: AsyncSession, clinic_ids: list[str]
+    ) -> dict[str, CatalogClinic]:
+        """
+        Gets some clinics from the current snapshot, reloading it once if any is
+        missing, e.g. a clinic added since.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            clinic_ids (list[str]): The clinic ids.
+
+        Returns:
+            dict[str, CatalogClinic]: The clinics found, by id.
+        """
+        await self.ensure_fresh(db)
+        snapshot = self.snapshot
+        if any(id not in snapshot.clinics for id in clinic_ids):
+            self.invalidate()
+            await self.ensure_fresh(db)
+            snapshot = self.snapshot
+
+        return {id: snapshot.clinics[id] for id in clinic_ids if id in snapshot.clinics}
+
+
+def get_clinic_catalog(request: Request) -> ClinicCatalog:
+    """
+    Gets the application's clinic catalog, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        ClinicCatalog: The clinic catalog.
+    """
+    if getattr(request.app.state, "clinic_catalog", None) is None:
+        request.app.state.clinic_catalog = ClinicCatalog()
+    return request.app.state.clinic_catalog
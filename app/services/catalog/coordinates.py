@@ -0,0 +1,263 @@
+import hashlib
+
+import numpy as np
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.models import Address, Clinic
+from app.services.catalog.geo import (
+    haversine_km,
+    haversine_matrix_km,
+    smallest_k,
+    smallest_k_per_row,
+)
+from app.services.catalog.spatial import ClinicGrid
+from app.services.refresh import RefreshableIndex
+
+# Distances computed per pass of `nearest_many()`, which bounds its memory to ~32 MB
+DISTANCE_MATRIX_CELLS = 4_000_000
+
+
+class ClinicCoordinates(RefreshableIndex):
+    """
+    Clinic coordinates held as contiguous float arrays (in radians), so distances from
+    a user to every clinic are computed in one vectorized pass instead of a Python loop
+    over `Numeric` columns, plus a `ClinicGrid` per clinic type (and one over every
+    clinic) for k-nearest queries that only look at the cells around a location.
+    """
+
+    def __init__(self):
+        super().__init__(max_age_seconds=settings.catalog_refresh_seconds)
+        self.ids: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.latitudes = np.empty(0, dtype=np.float64)
+        self.longitudes = np.empty(0, dtype=np.float64)
+        self.cos_latitudes = np.empty(0, dtype=np.float64)
+        self.types = np.empty(0, dtype=object)
+        self.grids: dict[str | None, ClinicGrid] = {}
+        # Digest of the clinics loaded, which changes whenever one is added, removed,
+        # moved or retyped
+        self.version = ""
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Reloads the clinic coordinates from the database.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        result = await db.execute(
+            select(Clinic.id, Address.latitude, Address.longitude, Clinic.type)
+            .join(Clinic.address)
+            .order_by(Clinic.id)
+        )
+        rows = result.all()
+
+        ids = [row[0] for row in rows]
+        types = np.array([row[3] for row in rows], dtype=object)
+        latitudes_deg = np.array([float(row[1]) for row in rows], dtype=np.float64)
+        longitudes_deg = np.array([float(row[2]) for row in rows], dtype=np.float64)
+        latitudes = np.radians(latitudes_deg)
+        longitudes = np.radians(longitudes_deg)
+
+        grids = {None: ClinicGrid(ids, latitudes_deg, longitudes_deg)}
+        for clinic_type in set(types):
+            rows_of_type = np.flatnonzero(types == clinic_type)
+            grids[clinic_type] = ClinicGrid(
+                [ids[row] for row in rows_of_type],
+                latitudes_deg[rows_of_type],
+                longitudes_deg[rows_of_type],
+            )
+
+        digest = hashlib.sha256()
+        for id, latitude, longitude, clinic_type in rows:
+            digest.update(f"{id},{latitude},{longitude},{clinic_type};".encode())
+
+        # Assign the arrays together so readers never mix two generations
+        (
+            self.ids,
+            self.rows,
+            self.latitudes,
+            self.longitudes,
+            self.cos_latitudes,
+            self.types,
+            self.grids,
+            self.version,
+        ) = (
+            ids,
+            {id: row for row, id in enumerate(ids)},
+            latitudes,
+            longitudes,
+            np.cos(latitudes),
+            types,
+            grids,
+            digest.hexdigest(),
+        )
+        self.mark_loaded()
+
+    async def distances(
+        self, db: AsyncSession, latitude: float, longitude: float, among: list[str]
+    ) -> np.ndarray:
+        """
+        Computes the distances from a location to some clinics.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            latitude (float): The latitude of the location, in degrees.
+            longitude (float): The longitude of the location, in degrees.
+            among (list[str]): The clinic ids.
+
+        Returns:
+            np.ndarray: The distances in km, aligned with `among`, and infinite for
+                clinics without coordinates.
+        """
+        await self.ensure_fresh(db)
+
+        if any(id not in self.rows for id in among):
+            # A clinic was added since the last load
+            await self.refresh(db)
+
+        rows = np.fromiter((self.rows.get(id, -1) for id in among), dtype=np.intp)
+        known = rows >= 0
+        distances = np.full(len(among), np.inf)
+        distances[known] = haversine_km(
+            latitude,
+            longitude,
+            self.latitudes[rows[known]],
+            self.longitudes[rows[known]],
+            self.cos_latitudes[rows[known]],
+        )
+        return distances
+
+    async def nearest(
+        self,
+        db: AsyncSession,
+        latitude: float,
+        longitude: float,
+        k: int,
+        among: list[str] | None = None,
+    ) -> list[tuple[str, float]]:
+        """
+        Finds the `k` clinics nearest to a location.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            latitude (float): The latitude of the location, in degrees.
+            longitude (float): The longitude of the location, in degrees.
+            k (int): The number of clinics to return.
+            among (list[str] | None): Restricts the search to these clinic ids, if given.
+
+        Returns:
+            list[tuple[str, float]]: The (clinic id, distance in km) pairs, nearest first.
+        """
+        if among is None:
+            await self.ensure_fresh(db)
+            among = self.ids
+
+        distances = await self.distances(db, latitude, longitude, among)
+        positions = smallest_k(distances, k)
+        return [
+            (among[p], float(distances[p]))
+            for p in positions
+            if np.isfinite(distances[p])
+        ]
+
+    async def nearest_clinics(
+        self,
+        db: AsyncSession,
+        latitude: float,
+        longitude: float,
+        k: int,
+        clinic_type: str | None = None,
+    ) -> list[tuple[str, float]]:
+        """
+        Finds the `k` clinics of a type nearest to a location, through the grid index.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            latitude (float): The latitude of the location, in degrees.
+            longitude (float): The longitude of the location, in degrees.
+            k (int): The number of clinics to return.
+            clinic_type (str | None): The clinic type, or None for every type.
+
+        Returns:
+            list[tuple[str, float]]: The (clinic id, distance in km) pairs, nearest first.
+        """
+        await self.ensure_fresh(db)
+
+        grid = self.grids.get(clinic_type)
+        return grid.nearest(latitude, longitude, k) if grid else []
+
+    def nearest_many(
+        self,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        k: int,
+        clinic_type: str | None = None,
+    ) -> list[list[tuple[str, float]]]:
+        """
+        Finds the `k` clinics of a type nearest to each of many locations, computing
+        the distances from every location to every clinic as one matrix, in passes of
+        `DISTANCE_MATRIX_CELLS`. Does not reload the coordinates, so callers call
+        `ensure_fresh()` first.
+
+        Args:
+            latitudes (np.ndarray): The latitudes of the locations, in degrees.
+            longitudes (np.ndarray): The longitudes of the locations, in degrees.
+            k (int): The number of clinics to return per location.
+            clinic_type (str | None): The clinic type, or None for every type.
+
+        Returns:
+            list[list[tuple[str, float]]]: The (clinic id, distance in km) pairs of each
+                location, nearest first, aligned with the locations.
+        """
+        ids, types = self.ids, self.types
+        columns = (
+            np.arange(len(ids))
+            if clinic_type is None
+            else np.flatnonzero(types == clinic_type)
+        )
+        if not len(columns):
+            return [[] for _ in range(len(latitudes))]
+
+        clinic_latitudes = self.latitudes[columns]
+        clinic_longitudes = self.longitudes[columns]
+        clinic_cos_latitudes = self.cos_latitudes[columns]
+        rows_per_pass = max(1, DISTANCE_MATRIX_CELLS // len(columns))
+
+        nearest = []
+        for start in range(0, len(latitudes), rows_per_pass):
+            distances = haversine_matrix_km(
+                latitudes[start : start + rows_per_pass],
+                longitudes[start : start + rows_per_pass],
+                clinic_latitudes,
+                clinic_longitudes,
+                clinic_cos_latitudes,
+            )
+            positions = smallest_k_per_row(distances, k)
+            row_distances = np.take_along_axis(distances, positions, axis=1)
+            nearest.extend(
+                [
+                    (ids[columns[p]], float(distance))
+                    for p, distance in zip(row_positions, row)
+                ]
+                for row_positions, row in zip(positions, row_distances)
+            )
+        return nearest
+
+
+def get_clinic_coordinates(request: Request) -> ClinicCoordinates:
+    """
+    Gets the application's clinic coordinate arrays, creating them on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        ClinicCoordinates: The clinic coordinates.
+    """
+    if getattr(request.app.state, "clinic_coordinates", None) is None:
+        request.app.state.clinic_coordinates = ClinicCoordinates()
+    return request.app.state.clinic_coordinates
@@ -0,0 +1,278 @@
+import json
+import os
+import time as timer
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from fastapi import Request
+from sqlalchemy import func, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.models import Address, PostalCode
+from app.services.catalog.coordinates import ClinicCoordinates
+from app.services.catalog.geo import haversine_matrix_km, smallest_k
+from app.services.refresh import RefreshableIndex
+
+# The leading digits of a postal code that make up its sector
+SECTOR_DIGITS = 2
+
+
+class DistanceMatrixReport(NamedTuple):
+    sectors: int
+    clinics: int
+    seconds: float
+
+
+def postal_sector(postal_code: str | None) -> str | None:
+    """
+    Gets the sector of a postal code, e.g. "768898" -> "76".
+
+    Args:
+        postal_code (str | None): The postal code.
+
+    Returns:
+        str | None: The sector, or None if the postal code is not numeric.
+    """
+    if not postal_code or not postal_code.isdigit():
+        return None
+    return postal_code.zfill(6)[:SECTOR_DIGITS]
+
+
+async def build_distance_matrix(db: AsyncSession, path: Path) -> DistanceMatrixReport:
+    """
+    Computes the distance from the centroid of every postal code sector to every
+    clinic, and writes it as a `.npy` float32 matrix next to a JSON header naming its
+    rows, columns and the clinic coordinates version it was computed against.
+
+    The matrix is written under a new name and the header replaced last, so workers
+    reading the previous matrix keep it mapped until they reload.
+
+    Args:
+        db (AsyncSession): The database session.
+        path (Path): The JSON header, e.g. `data/distance_matrix.json`.
+
+    Returns:
+        DistanceMatrixReport: The sectors and clinics of the matrix, and the time
+            taken.
+    """
+    started = timer.perf_counter()
+
+    clinic_coordinates = ClinicCoordinates()
+    await clinic_coordinates.refresh(db)
+
+    # Sector centroids, over every postal code known to the dataset or an address
+    locations = union_all(
+        select(
+            PostalCode.postal_code.label("postal_code"),
+            PostalCode.latitude.label("latitude"),
+            PostalCode.longitude.label("longitude"),
+        ),
+        select(Address.postal_code, Address.latitude, Address.longitude),
+    ).subquery()
+    sector = func.substr(locations.c.postal_code, 1, SECTOR_DIGITS)
+    result = await db.execute(
+        select(sector, func.avg(locations.c.latitude), func.avg(locations.c.longitude))
+        .group_by(sector)
+        .order_by(sector)
+    )
+    rows = [row for row in result.all() if postal_sector(row[0])]
+
+    sectors = [row[0] for row in rows]
+    distances = haversine_matrix_km(
+        np.array([float(row[1]) for row in rows], dtype=np.float64),
+        np.array([float(row[2]) for row in rows], dtype=np.float64),
+        clinic_coordinates.latitudes,
+        clinic_coordinates.longitudes,
+        clinic_coordinates.cos_latitudes,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    matrix_path = path.with_name(f"{path.stem}-{clinic_coordinates.version[:16]}.npy")
+    matrix = np.lib.format.open_memmap(
+        matrix_path, mode="w+", dtype=np.float32, shape=distances.shape
+    )
+    matrix[:] = distances
+    matrix.flush()
+    del matrix
+
+    header_path = path.with_name(f"{path.name}.tmp")
+    header_path.write_text(
+        json.dumps(
+            {
+                "matrix": matrix_path.name,
+                "clinic_version": clinic_coordinates.version,
+                "sectors": sectors,
+                "clinic_ids": clinic_coordinates.ids,
+            }
+        )
+    )
+    os.replace(header_path, path)
+
+    return DistanceMatrixReport(
+        len(sectors), len(clinic_coordinates.ids), timer.perf_counter() - started
+    )
+
+
+class DistanceMatrix(RefreshableIndex):
+    """
+    The precomputed sector-to-clinic distances written by `build_distance_matrix()`,
+    memory-mapped read-only so every worker shares one copy through the OS page cache.
+    Ranking clinics from a user's home is then a row lookup instead of a distance
+    computation. Distances are from the centroid of the home's postal code sector.
+
+    Lookups answer None, so callers compute the distances instead, when no matrix is
+    configured, the sector is unknown, or the matrix was computed against other clinic
+    coordinates than those loaded.
+    """
+
+    def __init__(self, path: str | None = None):
+        super().__init__(max_age_seconds=settings.catalog_refresh_seconds)
+        path = path or settings.distance_matrix_path
+        self.path = Path(path) if path else None
+        self.modified_at: float | None = None
+        self.clinic_version = ""
+        self.sectors: dict[str, int] = {}
+        # One column per clinic, in the order of `ClinicCoordinates.ids` for the
+        # clinic version the matrix was computed against
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Maps the matrix again if the builder replaced it since.
+
+        Args:
+            db (AsyncSession): Unused, as the matrix is read from disk.
+        """
+        self.mark_loaded()
+        if self.path is None or not self.path.exists():
+            return
+        modified_at = self.path.stat().st_mtime
+        if modified_at == self.modified_at:
+            return
+
+        header = json.loads(self.path.read_text())
+        matrix = np.load(self.path.with_name(header["matrix"]), mmap_mode="r")
+        (
+            self.modified_at,
+            self.clinic_version,
+            self.sectors,
+            self.matrix,
+        ) = (
+            modified_at,
+            header["clinic_version"],
+            {sector: row for row, sector in enumerate(header["sectors"])},
+            matrix,
+        )
+
+    async def distances(
+        self,
+        db: AsyncSession,
+        clinic_coordinates: ClinicCoordinates,
+        postal_code: str | None,
+        among: list[str],
+    ) -> np.ndarray | None:
+        """
+        Looks the distances from a postal code's sector to some clinics up.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            clinic_coordinates (ClinicCoordinates): The clinic coordinates loaded.
+            postal_code (str | None): The postal code of the home.
+            among (list[str]): The clinic ids.
+
+        Returns:
+            np.ndarray | None: The distances in km, aligned with `among` and infinite
+                for unknown clinics, or None if the matrix cannot answer.
+        """
+        row = await self._row(db, clinic_coordinates, postal_code)
+        if row is None:
+            return None
+        return self._lookup(clinic_coordinates, row, among)
+
+    async def nearest(
+        self,
+        db: AsyncSession,
+        clinic_coordinates: ClinicCoordinates,
+        postal_code: str | None,
+        k: int,
+        clinic_type: str | None = None,
+        among: list[str] | None = None,
+    ) -> list[tuple[str, float]] | None:
+        """
+        Looks the `k` clinics nearest to a postal code's sector up.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            clinic_coordinates (ClinicCoordinates): The clinic coordinates loaded.
+            postal_code (str | None): The postal code of the home.
+            k (int): The number of clinics to return.
+            clinic_type (str | None): The clinic type, or None for every type.
+            among (list[str] | None): Restricts the search to these clinic ids, if given.
+
+        Returns:
+            list[tuple[str, float]] | None: The (clinic id, distance in km) pairs,
+                nearest first, or None if the matrix cannot answer.
+        """
+        row = await self._row(db, clinic_coordinates, postal_code)
+        if row is None:
+            return None
+
+        if among is not None:
+            distances = self._lookup(clinic_coordinates, row, among)
+            ids = among
+        elif clinic_type is None:
+            distances = np.asarray(self.matrix[row])
+            ids = clinic_coordinates.ids
+        else:
+            columns = np.flatnonzero(clinic_coordinates.types == clinic_type)
+            distances = np.asarray(self.matrix[row, columns])
+            ids = [clinic_coordinates.ids[column] for column in columns]
+
+        return [
+            (ids[p], float(distances[p]))
+            for p in smallest_k(distances, k)
+            if np.isfinite(distances[p])
+        ]
+
+    def _lookup(
+        self, clinic_coordinates: ClinicCoordinates, row: int, among: list[str]
+    ) -> np.ndarray:
+        columns = np.fromiter(
+            (clinic_coordinates.rows.get(id, -1) for id in among), dtype=np.intp
+        )
+        known = columns >= 0
+        distances = np.full(len(among), np.inf)
+        distances[known] = self.matrix[row, columns[known]]
+        return distances
+
+    async def _row(
+        self,
+        db: AsyncSession,
+        clinic_coordinates: ClinicCoordinates,
+        postal_code: str | None,
+    ) -> int | None:
+        if self.path is None:
+            return None
+        await self.ensure_fresh(db)
+        await clinic_coordinates.ensure_fresh(db)
+        if self.clinic_version != clinic_coordinates.version:
+            return None
+        return self.sectors.get(postal_sector(postal_code))
+
+
+def get_distance_matrix(request: Request) -> DistanceMatrix:
+    """
+    Gets the application's distance matrix, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        DistanceMatrix: The distance matrix.
+    """
+    if getattr(request.app.state, "distance_matrix", None) is None:
+        request.app.state.distance_matrix = DistanceMatrix()
+    return request.app.state.distance_matrix
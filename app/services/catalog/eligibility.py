@@ -0,0 +1,144 @@
+import re
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+_AGE_CRITERIA = re.compile(
+    r"^\s*(\d+)\s*(?:-\s*(\d+)|(\+))?\s*(month|months|year|years)\s*$", re.IGNORECASE
+)
+
+# The upper bound of an open-ended age range, e.g. "65+ years", in the compiled rules
+_NO_MAXIMUM = np.iinfo(np.int32).max
+
+
+class AgeRange(NamedTuple):
+    min_age_months: int
+    # Inclusive, or None for no upper bound
+    max_age_months: int | None
+
+
+def parse_age_criteria(age_criteria: str | None) -> AgeRange:
+    """
+    Parses an age criteria into the range of ages in whole months it covers, e.g.
+    "6-59 months" -> (6, 59), "18+ years" -> (216, None), "12-13 years" -> (144, 167).
+
+    Args:
+        age_criteria (str | None): The age criteria, or None for any age.
+
+    Returns:
+        AgeRange: The inclusive range of ages in months.
+
+    Raises:
+        ValueError: If the age criteria is not a number of months or years, a range of
+            them, or an open-ended "N+" range.
+    """
+    if age_criteria is None:
+        return AgeRange(0, None)
+
+    match = _AGE_CRITERIA.match(age_criteria)
+    if match is None:
+        raise ValueError(f"Unrecognized age criteria: {age_criteria!r}")
+
+    low, high, open_ended, unit = match.groups()
+    low = int(low)
+    high = int(high) if high is not None else low
+    if high < low:
+        raise ValueError(f"Empty age criteria: {age_criteria!r}")
+
+    in_years = unit.lower().startswith("year")
+    if open_ended:
+        max_age_months = None
+    elif in_years:
+        # An age in years lasts until the next birthday
+        max_age_months = (high + 1) * 12 - 1
+    else:
+        max_age_months = high
+    return AgeRange(low * 12 if in_years else low, max_age_months)
+
+
+def age_in_months(date_of_birth: date, today: date) -> int:
+    """
+    Computes an age in whole calendar months.
+
+    Args:
+        date_of_birth (date): The date of birth.
+        today (date): The date to compute the age on.
+
+    Returns:
+        int: The age in months.
+    """
+    months = (today.year - date_of_birth.year) * 12 + today.month - date_of_birth.month
+    return months - (today.day < date_of_birth.day)
+
+
+class EligibilityRule(NamedTuple):
+    id: str
+    vaccine_id: str
+    vaccine_name: str
+    min_age_months: int
+    max_age_months: int | None
+    gender_criteria: str | None
+    # The criteria as listed in responses
+    criteria: dict
+
+
+class EligibilityRules:
+    """
+    The vaccine criteria compiled into arrays of age bounds and genders, so the
+    criteria a user meets are found in one vectorized comparison, without a query.
+    """
+
+    def __init__(self, rules: list[EligibilityRule]):
+        self.rules = sorted(rules, key=lambda rule: (rule.vaccine_id, rule.id))
+        self.min_age_months = np.array(
+            [rule.min_age_months for rule in self.rules], dtype=np.int64
+        )
+        self.max_age_months = np.array(
+            [
+                _NO_MAXIMUM if rule.max_age_months is None else rule.max_age_months
+                for rule in self.rules
+            ],
+            dtype=np.int64,
+        )
+        self.genders = np.array(
+            [rule.gender_criteria for rule in self.rules], dtype=object
+        )
+        self.any_gender = np.array(
+            [rule.gender_criteria is None for rule in self.rules], dtype=bool
+        )
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def recommend(self, age_months: int, gender: str | None) -> list[dict]:
+        """
+        Finds the vaccines whose criteria a user meets.
+
+        Args:
+            age_months (int): The user's age in months.
+            gender (str | None): The user's gender.
+
+        Returns:
+            list[dict]: The vaccines, each with the criteria met, as in
+                `VaccineResponse`, in vaccine id order.
+        """
+        met = (
+            (self.min_age_months <= age_months)
+            & (self.max_age_months >= age_months)
+            & (self.any_gender | (self.genders == gender))
+        )
+
+        vaccines = {}
+        for position in np.flatnonzero(met):
+            rule = self.rules[position]
+            vaccine = vaccines.setdefault(
+                rule.vaccine_id,
+                {
+                    "id": rule.vaccine_id,
+                    "name": rule.vaccine_name,
+                    "vaccine_criterias": [],
+                },
+            )
+            vaccine["vaccine_criterias"].append(rule.criteria)
+        return list(vaccines.values())
@@ -0,0 +1,122 @@
+import numpy as np
+
+# Mean Earth radius (IUGG), in kilometres
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(
+    latitude: float,
+    longitude: float,
+    latitudes_rad: np.ndarray,
+    longitudes_rad: np.ndarray,
+    cos_latitudes: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Computes great-circle distances from one point to many points in a single
+    vectorized pass.
+
+    Args:
+        latitude (float): The latitude of the origin, in degrees.
+        longitude (float): The longitude of the origin, in degrees.
+        latitudes_rad (np.ndarray): The latitudes of the targets, in radians.
+        longitudes_rad (np.ndarray): The longitudes of the targets, in radians.
+        cos_latitudes (np.ndarray | None): The precomputed cosines of `latitudes_rad`, if available.
+
+    Returns:
+        np.ndarray: The distances in kilometres, aligned with the target arrays.
+    """
+    origin_latitude = np.radians(latitude)
+    origin_longitude = np.radians(longitude)
+    if cos_latitudes is None:
+        cos_latitudes = np.cos(latitudes_rad)
+
+    half_dlat = np.sin((latitudes_rad - origin_latitude) / 2.0)
+    half_dlon = np.sin((longitudes_rad - origin_longitude) / 2.0)
+    a = half_dlat * half_dlat + np.cos(origin_latitude) * cos_latitudes * (
+        half_dlon * half_dlon
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def smallest_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Selects the positions of the `k` smallest values, in ascending order of value.
+    Uses `argpartition` so only the selected `k` values are fully sorted.
+
+    Args:
+        values (np.ndarray): A 1-D array of values.
+        k (int): The number of positions to select.
+
+    Returns:
+        np.ndarray: The selected positions.
+    """
+    if k <= 0 or values.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < values.size:
+        candidates = np.argpartition(values, k - 1)[:k]
+    else:
+        candidates = np.arange(values.size)
+    return candidates[np.argsort(values[candidates], kind="stable")]
+
+
+def haversine_matrix_km(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    latitudes_rad: np.ndarray,
+    longitudes_rad: np.ndarray,
+    cos_latitudes: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Computes great-circle distances from many points to many points in a single
+    vectorized pass, by broadcasting the origins against the targets.
+
+    Args:
+        latitudes (np.ndarray): The latitudes of the origins, in degrees.
+        longitudes (np.ndarray): The longitudes of the origins, in degrees.
+        latitudes_rad (np.ndarray): The latitudes of the targets, in radians.
+        longitudes_rad (np.ndarray): The longitudes of the targets, in radians.
+        cos_latitudes (np.ndarray | None): The precomputed cosines of `latitudes_rad`, if available.
+
+    Returns:
+        np.ndarray: The distances in kilometres, one row per origin and one column per target.
+    """
+    origin_latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))[
+        :, np.newaxis
+    ]
+    origin_longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))[
+        :, np.newaxis
+    ]
+    if cos_latitudes is None:
+        cos_latitudes = np.cos(latitudes_rad)
+
+    half_dlat = np.sin((latitudes_rad[np.newaxis, :] - origin_latitudes) / 2.0)
+    half_dlon = np.sin((longitudes_rad[np.newaxis, :] - origin_longitudes) / 2.0)
+    a = half_dlat * half_dlat + np.cos(origin_latitudes) * cos_latitudes[
+        np.newaxis, :
+    ] * (half_dlon * half_dlon)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def smallest_k_per_row(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Selects the positions of the `k` smallest values of every row, in ascending order
+    of value, like `smallest_k()` applied to each row at once.
+
+    Args:
+        values (np.ndarray): A 2-D array of values.
+        k (int): The number of positions to select per row.
+
+    Returns:
+        np.ndarray: The selected positions, one row per row of `values`.
+    """
+    rows, columns = values.shape
+    if k <= 0 or columns == 0:
+        return np.empty((rows, 0), dtype=np.intp)
+    if k < columns:
+        candidates = np.argpartition(values, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(columns), (rows, columns))
+    order = np.argsort(
+        np.take_along_axis(values, candidates, axis=1), axis=1, kind="stable"
+    )
+    return np.take_along_axis(candidates, order, axis=1)
@@ -0,0 +1,347 @@
+import json
+import re
+import time as timer
+import uuid
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.models import Address, Clinic
+from app.schemas.clinic import ClinicType
+from app.services.catalog.postal_codes import normalize_postal_code
+
+# Characters read from the dataset at a time while parsing it
+READ_CHUNK_CHARS = 64 * 1024
+
+# The clinic type of each spelling found in institution datasets
+CLINIC_TYPES = {
+    "polyclinic": ClinicType.POLYCLINIC.value,
+    "polyclinics": ClinicType.POLYCLINIC.value,
+    "gp": ClinicType.GENERAL_PRACTIONER.value,
+    "gp clinic": ClinicType.GENERAL_PRACTIONER.value,
+    "general practitioner": ClinicType.GENERAL_PRACTIONER.value,
+    "general practice": ClinicType.GENERAL_PRACTIONER.value,
+    "chas gp": ClinicType.GENERAL_PRACTIONER.value,
+}
+
+# The keys an institution's fields may be found under, in order of preference
+FIELD_KEYS = {
+    "name": ("name", "institution_name", "clinic_name"),
+    "type": ("type", "institution_type", "clinic_type", "category"),
+    "address": ("address", "full_address", "address_line"),
+    "postal_code": ("postal_code", "postalcode", "postal"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lng", "lon"),
+}
+
+POSTAL_CODE_IN_ADDRESS = re.compile(r"\bSINGAPORE\s+(\d{6})\b")
+
+
+class Institution(NamedTuple):
+    name: str
+    type: str
+    postal_code: str
+    address: str
+    latitude: float
+    longitude: float
+
+    @property
+    def key(self) -> tuple[str, str]:
+        # Institutions carry no id of their own, so a clinic is its type and name
+        return self.type, self.name.casefold()
+
+
+class InstitutionLoadReport(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+    skipped: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        total = self.inserted + self.updated + self.unchanged + self.skipped
+        return total / self.seconds if self.seconds else 0.0
+
+
+class _JsonStream:
+    """
+    Reads the values of a JSON document one at a time, holding only the chunk being
+    parsed in memory.
+    """
+
+    def __init__(self, file: TextIO, chunk_chars: int):
+        self.file = file
+        self.chunk_chars = chunk_chars
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer):
+                if not self.buffer[self.position].isspace():
+                    return self.buffer[self.position]
+                self.position += 1
+            if not self._fill():
+                raise ValueError("Unexpected end of the institutions dataset")
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(
+                f"Expected {char!r} in the institutions dataset, "
+                f"found {self.buffer[self.position]!r}"
+            )
+        self.position += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = json.JSONDecoder().raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value goes on in the next chunk
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may go on in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.position = end
+            return value
+
+
+def _stream_objects(stream: _JsonStream) -> Iterator[dict]:
+    # Yields the objects of every array in the document, however deeply they sit in
+    # objects, e.g. `{"data": {"institutions": [...]}}`
+    char = stream.peek()
+    if char == "[":
+        stream.expect("[")
+        if stream.peek() == "]":
+            stream.expect("]")
+            return
+        while True:
+            item = stream.value()
+            if isinstance(item, dict):
+                yield item
+            if stream.peek() == "]":
+                stream.expect("]")
+                return
+            stream.expect(",")
+    elif char == "{":
+        stream.expect("{")
+        if stream.peek() == "}":
+            stream.expect("}")
+            return
+        while True:
+            stream.value()
+            stream.expect(":")
+            if stream.peek() in "[{":
+                yield from _stream_objects(stream)
+            else:
+                stream.value()
+            if stream.peek() == "}":
+                stream.expect("}")
+                return
+            stream.expect(",")
+    else:
+        stream.value()
+
+
+def _field(record: dict, name: str):
+    for key in FIELD_KEYS[name]:
+        value = record.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def normalize_institution(record: dict) -> Institution | None:
+    """
+    Normalizes an institution of the dataset into a clinic: its type mapped onto
+    `ClinicType`, its address upper-cased with whitespace collapsed, its postal code
+    zero-padded (or taken from the address), and its coordinates rounded to the 6
+    decimals stored.
+
+    Args:
+        record (dict): The institution, as found in the dataset. A nested `address`
+            object is read as part of it.
+
+    Returns:
+        Institution | None: The institution, or None if it is not a clinic or lacks a
+            name, address or valid coordinates.
+    """
+    if isinstance(record.get("address"), dict):
+        record = {**record, **record["address"]}
+        if isinstance(record.get("address"), dict):
+            del record["address"]
+
+    name = " ".join(str(_field(record, "name") or "").split())
+    clinic_type = CLINIC_TYPES.get(
+        " ".join(str(_field(record, "type") or "").casefold().split())
+    )
+    address = " ".join(str(_field(record, "address") or "").upper().split())
+    if not name or clinic_type is None or not address:
+        return None
+
+    postal_code = normalize_postal_code(str(_field(record, "postal_code") or ""))
+    if not postal_code:
+        match = POSTAL_CODE_IN_ADDRESS.search(address)
+        if match is None:
+            return None
+        postal_code = match.group(1)
+
+    try:
+        latitude = round(float(_field(record, "latitude")), 6)
+        longitude = round(float(_field(record, "longitude")), 6)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+
+    return Institution(name, clinic_type, postal_code, address, latitude, longitude)
+
+
+def read_institutions(
+    path: Path, chunk_chars: int = READ_CHUNK_CHARS
+) -> Iterator[Institution | None]:
+    """
+    Parses an institutions dataset incrementally, so its size does not bound memory.
+
+    Args:
+        path (Path): The JSON file, an array of institutions or an object holding one,
+            e.g. `data/get_instituitions_response.json`.
+        chunk_chars (int): The characters read at a time.
+
+    Yields:
+        Institution | None: Each institution normalized, or None for one skipped by
+            `normalize_institution()`.
+    """
+    with path.open(encoding="utf-8") as file:
+        for record in _stream_objects(_JsonStream(file, chunk_chars)):
+            yield normalize_institution(record)
+
+
+async def load_institutions(
+    db: AsyncSession,
+    institutions: Iterable[Institution | None],
+    batch_size: int | None = None,
+) -> InstitutionLoadReport:
+    """
+    Diff-upserts institutions into `clinics` and `addresses` in batches, each
+    committed on its own. New clinics are inserted with their address; a clinic whose
+    address or coordinates changed is pointed at a new address, as users may share
+    the old one. Loading the same dataset again changes nothing.
+
+    Args:
+        db (AsyncSession): The database session.
+        institutions (Iterable[Institution | None]): The institutions, e.g. from
+            `read_institutions()`. None stands for a skipped institution.
+        batch_size (int | None): The institutions per batch,
+            `institution_batch_size` by default.
+
+    Returns:
+        InstitutionLoadReport: The clinics inserted, updated and unchanged, the
+            institutions skipped, and the time taken.
+    """
+    batch_size = batch_size or settings.institution_batch_size
+    started = timer.perf_counter()
+
+    # The clinics already loaded, as (clinic id, address) by key
+    result = await db.execute(
+        select(
+            Clinic.id,
+            Clinic.name,
+            Clinic.type,
+            Address.postal_code,
+            Address.address,
+            Address.latitude,
+            Address.longitude,
+        ).join(Clinic.address)
+    )
+    existing = {}
+    for id, name, type, postal_code, address, latitude, longitude in result.all():
+        existing[(type, name.casefold())] = (
+            id,
+            (
+                postal_code,
+                address,
+                round(float(latitude), 6),
+                round(float(longitude), 6),
+            ),
+        )
+
+    inserted = updated = unchanged = skipped = 0
+    institutions = iter(institutions)
+    while batch := list(islice(institutions, batch_size)):
+        skipped += sum(institution is None for institution in batch)
+        # An institution listed twice within a batch is loaded once, as last listed
+        batch = {i.key: i for i in batch if i is not None}
+
+        addresses, clinics, moves = [], [], []
+        for key, institution in batch.items():
+            location = (
+                institution.postal_code,
+                institution.address,
+                institution.latitude,
+                institution.longitude,
+            )
+            clinic = existing.get(key)
+            if clinic is not None and clinic[1] == location:
+                unchanged += 1
+                continue
+
+            address_id = str(uuid.uuid4())
+            addresses.append(
+                {
+                    "id": address_id,
+                    "postal_code": institution.postal_code,
+                    "address": institution.address,
+                    "latitude": institution.latitude,
+                    "longitude": institution.longitude,
+                }
+            )
+            if clinic is None:
+                clinic_id = str(uuid.uuid4())
+                clinics.append(
+                    {
+                        "id": clinic_id,
+                        "address_id": address_id,
+                        "name": institution.name,
+                        "type": institution.type,
+                    }
+                )
+                inserted += 1
+            else:
+                clinic_id = clinic[0]
+                moves.append({"id": clinic_id, "address_id": address_id})
+                updated += 1
+            existing[key] = (clinic_id, location)
+
+        if addresses:
+            await db.execute(insert(Address), addresses)
+        if clinics:
+            await db.execute(insert(Clinic), clinics)
+        if moves:
+            await db.execute(update(Clinic), moves)
+        await db.commit()
+
+    return InstitutionLoadReport(
+        inserted, updated, unchanged, skipped, timer.perf_counter() - started
+    )
@@ -0,0 +1,284 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.models import Clinic, Vaccine, VaccineCriteria
+from app.services.catalog.eligibility import (
+    EligibilityRule,
+    EligibilityRules,
+    parse_age_criteria,
+)
+from app.services.refresh import RefreshableIndex
+
+logger = logging.getLogger("uvicorn.error")
+
+_NON_ALPHANUMERIC = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(value: str) -> str:
+    """
+    Normalizes a free-text name by folding accents and case, and collapsing punctuation
+    and whitespace into single spaces, e.g. "Influenza (INF)" -> "influenza inf".
+
+    Args:
+        value (str): The name to normalize.
+
+    Returns:
+        str: The normalized name.
+    """
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return _NON_ALPHANUMERIC.sub(" ", value.lower()).strip()
+
+
+def word_trigrams(value: str) -> set[str]:
+    """
+    Computes the trigrams of a normalized name, padding each word the same way as
+    PostgreSQL's `pg_trgm` extension (two spaces in front, one behind).
+
+    Args:
+        value (str): The normalized name.
+
+    Returns:
+        set[str]: The set of trigrams.
+    """
+    grams = set()
+    for word in value.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """
+    An immutable index over one set of catalog names (e.g. all vaccines) that resolves a
+    free-text search term to the matching ids. Matching is tried in three tiers and the
+    first tier with any match wins:
+
+      1. Substring match, i.e. the previous `LIKE '%term%'` semantics.
+      2. Token prefix match, e.g. "hpv" matches "Human papillomavirus (HPV2 or HPV4)".
+      3. Trigram similarity, for typos such as "Influensa".
+    """
+
+    def __init__(self, names: dict[str, str], similarity_threshold: float):
+        self.similarity_threshold = similarity_threshold
+        self._display_names = dict(names)
+        self._names = {id: normalize_name(name) for id, name in names.items()}
+        self._trigrams = {id: word_trigrams(name) for id, name in self._names.items()}
+
+        token_postings = defaultdict(set)
+        trigram_postings = defaultdict(set)
+        for id, name in self._names.items():
+            for token in name.split():
+                token_postings[token].add(id)
+            for gram in self._trigrams[id]:
+                trigram_postings[gram].add(id)
+
+        self._token_postings = dict(token_postings)
+        self._sorted_tokens = sorted(token_postings)
+        self._trigram_postings = dict(trigram_postings)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def name(self, id: str) -> str | None:
+        return self._display_names.get(id)
+
+    def _substring_matches(self, query: str) -> set[str]:
+        # A name containing the query must contain every trigram of the query that
+        # lies strictly inside a word, so those postings narrow down the candidates
+        inner_grams = [
+            word[i : i + 3] for word in query.split() for i in range(len(word) - 2)
+        ]
+        candidates = None
+        for gram in inner_grams:
+            postings = self._trigram_postings.get(gram, set())
+            candidates = postings if candidates is None else candidates & postings
+            if not candidates:
+                return set()
+
+        if candidates is None:  # Query too short to have trigrams
+            candidates = self._names.keys()
+
+        return {id for id in candidates if query in self._names[id]}
+
+    def _prefix_matches(self, query: str) -> set[str]:
+        matches = None
+        for token in query.split():
+            ids = set()
+            position = bisect_left(self._sorted_tokens, token)
+            while position < len(self._sorted_tokens) and self._sorted_tokens[
+                position
+            ].startswith(token):
+                ids |= self._token_postings[self._sorted_tokens[position]]
+                position += 1
+
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return set()
+
+        return matches or set()
+
+    def _similar_matches(self, query: str) -> set[str]:
+        query_grams = word_trigrams(query)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for id in self._trigram_postings.get(gram, ()):
+                shared[id] += 1
+
+        matches = set()
+        for id, count in shared.items():
+            similarity = count / (len(query_grams) + len(self._trigrams[id]) - count)
+            if similarity >= self.similarity_threshold:
+                matches.add(id)
+        return matches
+
+    def resolve(self, query: str) -> set[str]:
+        """
+        Resolves a free-text search term to the ids of the matching names.
+
+        Args:
+            query (str): The search term, e.g. "influenza" or "Yishun Polyclinic".
+
+        Returns:
+            set[str]: The matching ids, or an empty set if nothing matches.
+        """
+        normalized = normalize_name(query)
+        if not normalized:
+            return set()
+
+        return (
+            self._substring_matches(normalized)
+            or self._prefix_matches(normalized)
+            or self._similar_matches(normalized)
+        )
+
+
+def _eligibility_rule(criteria, vaccine_names: dict[str, str]) -> EligibilityRule:
+    # The age columns are matched, so flag criteria that disagree with them
+    try:
+        parsed = parse_age_criteria(criteria.age_criteria)
+    except ValueError as error:
+        parsed = None
+        logger.warning("Vaccine criteria %s: %s", criteria.id, error)
+    if parsed is not None and parsed != (
+        criteria.min_age_months,
+        criteria.max_age_months,
+    ):
+        logger.warning(
+            "Vaccine criteria %s: age months %s do not match %r",
+            criteria.id,
+            (criteria.min_age_months, criteria.max_age_months),
+            criteria.age_criteria,
+        )
+
+    return EligibilityRule(
+        id=criteria.id,
+        vaccine_id=criteria.vaccine_id,
+        vaccine_name=vaccine_names.get(criteria.vaccine_id),
+        min_age_months=criteria.min_age_months,
+        max_age_months=criteria.max_age_months,
+        gender_criteria=criteria.gender_criteria,
+        criteria={
+            "age_criteria": criteria.age_criteria,
+            "gender_criteria": criteria.gender_criteria,
+            "health_condition_criteria": criteria.health_condition_criteria,
+            "doses_required": criteria.doses_required,
+            "frequency": criteria.frequency,
+        },
+    )
+
+
+class CatalogNameIndex(RefreshableIndex):
+    """
+    In-memory name indexes for the vaccine and clinic catalogs, so that search terms
+    coming from agents are resolved to ids before querying `bookingslots`, and the
+    vaccine criteria compiled into eligibility rules for recommendations.
+    """
+
+    def __init__(self):
+        super().__init__(max_age_seconds=settings.catalog_refresh_seconds)
+        self.vaccines = NameIndex({}, settings.name_match_threshold)
+        self.clinics = NameIndex({}, settings.name_match_threshold)
+        self.eligibility = EligibilityRules([])
+        # Digest of the vaccines and their criteria loaded, for ETags of responses
+        # listing vaccines
+        self.vaccines_version = ""
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Reloads both indexes from the database.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        vaccines = (await db.execute(select(Vaccine.id, Vaccine.name))).all()
+        clinics = await db.execute(select(Clinic.id, Clinic.name))
+        criterias = await db.execute(
+            select(VaccineCriteria.__table__).order_by(VaccineCriteria.id)
+        )
+
+        vaccine_names = dict(vaccines)
+        digest = hashlib.sha256()
+        for row in sorted(vaccines):
+            digest.update(f"{row};".encode())
+        rules = []
+        for row in criterias.all():
+            digest.update(f"{tuple(row)};".encode())
+            rules.append(_eligibility_rule(row, vaccine_names))
+
+        self.vaccines = NameIndex(vaccine_names, settings.name_match_threshold)
+        self.clinics = NameIndex(dict(clinics.all()), settings.name_match_threshold)
+        self.eligibility = EligibilityRules(rules)
+        self.vaccines_version = digest.hexdigest()
+        self.mark_loaded()
+
+    async def resolve_vaccines(self, db: AsyncSession, query: str) -> set[str]:
+        """
+        Resolves a free-text vaccine name to vaccine ids.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            query (str): The vaccine name.
+
+        Returns:
+            set[str]: The matching vaccine ids.
+        """
+        await self.ensure_fresh(db)
+        return self.vaccines.resolve(query)
+
+    async def resolve_clinics(self, db: AsyncSession, query: str) -> set[str]:
+        """
+        Resolves a free-text clinic name to clinic ids.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+            query (str): The clinic name.
+
+        Returns:
+            set[str]: The matching clinic ids.
+        """
+        await self.ensure_fresh(db)
+        return self.clinics.resolve(query)
+
+
+def get_catalog_name_index(request: Request) -> CatalogNameIndex:
+    """
+    Gets the application's catalog name index, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        CatalogNameIndex: The catalog name index.
+    """
+    if getattr(request.app.state, "catalog_name_index", None) is None:
+        request.app.state.catalog_name_index = CatalogNameIndex()
+    return request.app.state.catalog_name_index
@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import math
+from heapq import merge
+from typing import NamedTuple
+
+from sqlalchemy import and_, delete, exists, func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.database import dialect_insert
+from app.models.models import Address, AddressNearestClinics, User
+from app.services.catalog.coordinates import ClinicCoordinates
+
+logger = logging.getLogger("uvicorn.error")
+
+# Addresses refreshed per transaction by the background refresh
+REFRESH_BATCH_SIZE = 1_000
+# Postgres advisory lock held by the one worker running the background refresh
+REFRESH_LOCK_KEY = 0x4E454152
+
+
+class HomeClinics(NamedTuple):
+    address_id: str
+    latitude: float
+    longitude: float
+    # The precomputed (clinic id, distance in km) pairs per clinic type, nearest first,
+    # with whether each list is complete; None if they are missing or out of date
+    by_type: dict[str, tuple[list[tuple[str, float]], bool]] | None
+    postal_code: str | None = None
+
+    def nearest(
+        self, k: int, clinic_type: str | None = None, among: set[str] | None = None
+    ) -> list[tuple[str, float]] | None:
+        """
+        Finds the `k` clinics nearest to the home from the precomputed lists.
+
+        Lists of different types are merged by distance. A clinic left out of a
+        truncated list is farther than that list's last clinic, so the merge is only
+        exact up to the smallest such distance.
+
+        Args:
+            k (int): The number of clinics to return.
+            clinic_type (str | None): The clinic type, or None for every type.
+            among (set[str] | None): Restricts the search to these clinic ids, if given.
+
+        Returns:
+            list[tuple[str, float]] | None: The (clinic id, distance in km) pairs,
+                nearest first, or None if the lists cannot answer for sure.
+        """
+        if self.by_type is None:
+            return None
+        if clinic_type is None:
+            lists = list(self.by_type.values())
+        elif clinic_type in self.by_type:
+            lists = [self.by_type[clinic_type]]
+        else:
+            return []
+
+        exact_km = min(
+            (clinics[-1][1] for clinics, complete in lists if clinics and not complete),
+            default=math.inf,
+        )
+        nearest = []
+        for id, distance in merge(
+            *(clinics for clinics, _ in lists), key=lambda clinic: clinic[1]
+        ):
+            if len(nearest) == k or distance > exact_km:
+                break
+            if among is None or id in among:
+                nearest.append((id, distance))
+
+        # Fewer than `k` found, while more may lie past the exact distance
+        found_all = among is not None and len(nearest) == len(among)
+        if len(nearest) < k and math.isfinite(exact_km) and not found_all:
+            return None
+        return nearest
+
+
+def _encode(clinics: list[tuple[str, float]]) -> tuple[str, str]:
+    return (
+        ",".join(id for id, _ in clinics),
+        ",".join(f"{distance:.3f}" for _, distance in clinics),
+    )
+
+
+def _decode(clinic_ids: str, distances_km: str) -> list[tuple[str, float]]:
+    if not clinic_ids:
+        return []
+    return list(
+        zip(clinic_ids.split(","), (float(km) for km in distances_km.split(",")))
+    )
+
+
+def _is_current(clinic_coordinates: ClinicCoordinates):
+    # Lists computed against the loaded clinics, since the address last changed
+    return and_(
+        AddressNearestClinics.address_id == Address.id,
+        AddressNearestClinics.clinics_version == clinic_coordinates.version,
+        AddressNearestClinics.updated_at >= Address.updated_at,
+    )
+
+
+async def load_home_clinics(
+    db: AsyncSession, clinic_coordinates: ClinicCoordinates, user_id: str
+) -> HomeClinics | None:
+    """
+    Loads a user's home coordinates and its precomputed nearest clinics in one query.
+
+    Args:
+        db (AsyncSession): The database session.
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates, whose version
+            the lists must have been computed against.
+        user_id (str): The user id.
+
+    Returns:
+        HomeClinics | None: The home and its nearest clinics, or None if the user has
+            no address.
+    """
+    await clinic_coordinates.ensure_fresh(db)
+
+    result = await db.execute(
+        select(
+            Address.id,
+            Address.latitude,
+            Address.longitude,
+            Address.postal_code,
+            AddressNearestClinics.clinic_type,
+            AddressNearestClinics.clinic_ids,
+            AddressNearestClinics.distances_km,
+            AddressNearestClinics.complete,
+        )
+        .select_from(User)
+        .join(User.address)
+        .outerjoin(AddressNearestClinics, _is_current(clinic_coordinates))
+        .where(User.id == user_id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+
+    by_type = {
+        row[4]: (_decode(row[5], row[6]), row[7]) for row in rows if row[4] is not None
+    }
+    # Every clinic type must be listed, or a type added since was missed
+    clinic_types = {
+        clinic_type for clinic_type in clinic_coordinates.grids if clinic_type
+    }
+    return HomeClinics(
+        address_id=rows[0][0],
+        latitude=float(rows[0][1]),
+        longitude=float(rows[0][2]),
+        by_type=by_type if set(by_type) == clinic_types else None,
+        postal_code=rows[0][3],
+    )
+
+
+def _stale(clinic_coordinates: ClinicCoordinates):
+    # Addresses missing a current list of some clinic type
+    return or_(
+        *(
+            ~exists().where(
+                _is_current(clinic_coordinates),
+                AddressNearestClinics.clinic_type == clinic_type,
+            )
+            for clinic_type in clinic_coordinates.grids
+            if clinic_type
+        )
+    )
+
+
+async def refresh_nearest_clinics(
+    db: AsyncSession,
+    clinic_coordinates: ClinicCoordinates,
+    address_ids: list[str] | None = None,
+) -> int:
+    """
+    Recomputes the nearest clinics of each type for addresses whose lists are missing
+    or out of date, because the address or the clinics changed since.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates.
+        address_ids (list[str] | None): Only refreshes these addresses, if given.
+
+    Returns:
+        int: The number of addresses refreshed.
+    """
+    await clinic_coordinates.ensure_fresh(db)
+    if len(clinic_coordinates.grids) <= 1:
+        # No clinics, so nothing to list
+        return 0
+
+    query = select(Address.id, Address.latitude, Address.longitude).where(
+        _stale(clinic_coordinates)
+    )
+    if address_ids is not None:
+        query = query.where(Address.id.in_(address_ids))
+    addresses = (await db.execute(query)).all()
+    if not addresses:
+        return 0
+
+    per_type = settings.nearest_clinics_per_address
+    rows = []
+    for address_id, latitude, longitude in addresses:
+        for clinic_type, grid in clinic_coordinates.grids.items():
+            if clinic_type is None:
+                continue
+            nearest = grid.nearest(float(latitude), float(longitude), per_type)
+            clinic_ids, distances_km = _encode(nearest)
+            rows.append(
+                {
+                    "address_id": address_id,
+                    "clinic_type": clinic_type,
+                    "clinics_version": clinic_coordinates.version,
+                    "clinic_ids": clinic_ids,
+                    "distances_km": distances_km,
+                    "complete": len(nearest) == len(grid),
+                }
+            )
+
+    # Upsert the lists, so concurrent refreshes of an address both succeed
+    insert = dialect_insert(db)(AddressNearestClinics.__table__)
+    await db.execute(
+        insert.on_conflict_do_update(
+            index_elements=["address_id", "clinic_type"],
+            set_={
+                "clinics_version": insert.excluded.clinics_version,
+                "clinic_ids": insert.excluded.clinic_ids,
+                "distances_km": insert.excluded.distances_km,
+                "complete": insert.excluded.complete,
+                "updated_at": func.now(),
+            },
+        ),
+        rows,
+    )
+
+    # Drop the lists of clinic types since removed
+    await db.execute(
+        delete(AddressNearestClinics)
+        .where(
+            AddressNearestClinics.address_id.in_([row[0] for row in addresses]),
+            AddressNearestClinics.clinic_type.not_in(
+                [clinic_type for clinic_type in clinic_coordinates.grids if clinic_type]
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return len(addresses)
+
+
+async def refresh_home_clinics(
+    db: AsyncSession, clinic_coordinates: ClinicCoordinates, address_id: str
+) -> None:
+    """
+    Refreshes the nearest clinics of a user's new home on a best-effort basis, in a
+    savepoint so that a failure leaves the caller's transaction usable. Lists left out
+    of date are picked up by the background refresh, and searches fall back to the
+    clinic grids meanwhile.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates.
+        address_id (str): The address id.
+    """
+    try:
+        async with db.begin_nested():
+            await refresh_nearest_clinics(db, clinic_coordinates, [address_id])
+    except SQLAlchemyError as e:
+        logger.warning(f"Nearest clinics refresh of address {address_id} failed: {e}")
+
+
+async def refresh_all_nearest_clinics(
+    db: AsyncSession, clinic_coordinates: ClinicCoordinates
+) -> int:
+    """
+    Refreshes every out-of-date address some user lives at, committing after each
+    batch of `REFRESH_BATCH_SIZE`. Addresses nobody lives at are refreshed when a user
+    moves in.
+
+    Args:
+        db (AsyncSession): The database session, outside a transaction.
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates.
+
+    Returns:
+        int: The number of addresses refreshed.
+    """
+    await clinic_coordinates.ensure_fresh(db)
+    if len(clinic_coordinates.grids) <= 1:
+        return 0
+
+    result = await db.execute(
+        select(Address.id)
+        .where(
+            exists().where(User.address_id == Address.id), _stale(clinic_coordinates)
+        )
+        .order_by(Address.id)
+    )
+    address_ids = list(result.scalars().all())
+    await db.commit()
+
+    refreshed = 0
+    for start in range(0, len(address_ids), REFRESH_BATCH_SIZE):
+        refreshed += await refresh_nearest_clinics(
+            db, clinic_coordinates, address_ids[start : start + REFRESH_BATCH_SIZE]
+        )
+        await db.commit()
+    return refreshed
+
+
+async def _refresh_as_leader(
+    engine: AsyncEngine, clinic_coordinates: ClinicCoordinates
+) -> int | None:
+    async with engine.connect() as connection:
+        # On Postgres, only the worker holding the advisory lock refreshes
+        leader = connection.dialect.name != "postgresql" or await connection.scalar(
+            select(func.pg_try_advisory_lock(REFRESH_LOCK_KEY))
+        )
+        await connection.commit()
+        if not leader:
+            return None
+
+        try:
+            async with AsyncSession(connection, expire_on_commit=False) as db:
+                return await refresh_all_nearest_clinics(db, clinic_coordinates)
+        finally:
+            if connection.dialect.name == "postgresql":
+                await connection.execute(
+                    select(func.pg_advisory_unlock(REFRESH_LOCK_KEY))
+                )
+                await connection.commit()
+
+
+async def refresh_nearest_clinics_periodically(
+    engine: AsyncEngine, clinic_coordinates: ClinicCoordinates
+) -> None:
+    """
+    Refreshes out-of-date addresses right away, then every `catalog_refresh_seconds`,
+    until cancelled, so lists follow addresses loaded and clinics changed elsewhere.
+    Workers take turns through a Postgres advisory lock, so each round runs once across
+    all of them.
+
+    Args:
+        engine (AsyncEngine): The database engine, to hold the lock on one connection
+            for the whole round.
+        clinic_coordinates (ClinicCoordinates): The clinic coordinates.
+    """
+    while True:
+        try:
+            refreshed = await _refresh_as_leader(engine, clinic_coordinates)
+            if refreshed:
+                logger.info(f"Refreshed the nearest clinics of {refreshed} addresses.")
+        except Exception as e:
+            logger.error(f"Nearest clinics refresh failed: {e}", exc_info=True)
+        await asyncio.sleep(settings.catalog_refresh_seconds)
@@ -0,0 +1,232 @@
+import csv
+import time as timer
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from fastapi import Request
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.database import dialect_insert
+from app.models.models import Address, PostalCode
+from app.services.refresh import RefreshableIndex
+
+
+class PostalCodeEntry(NamedTuple):
+    postal_code: str
+    address: str
+    latitude: float
+    longitude: float
+
+
+class PostalCodeLoadReport(NamedTuple):
+    loaded: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.loaded / self.seconds if self.seconds else 0.0
+
+
+def normalize_postal_code(value: str) -> str:
+    """
+    Normalizes a postal code as stored, e.g. " 54078" -> "054078".
+
+    Args:
+        value (str): The postal code.
+
+    Returns:
+        str: The postal code without whitespace, zero-padded to 6 digits if numeric.
+    """
+    value = value.strip()
+    return value.zfill(6) if value.isdigit() else value
+
+
+def read_postal_codes(path: Path) -> Iterator[PostalCodeEntry]:
+    """
+    Reads a postal code dataset lazily, from a CSV file with a header row and the
+    columns `postal_code`, `address`, `latitude` and `longitude`. Rows missing a
+    postal code or coordinates are skipped.
+
+    Args:
+        path (Path): The CSV file.
+
+    Yields:
+        PostalCodeEntry: The entry of each postal code.
+    """
+    with path.open(newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            postal_code = normalize_postal_code(row.get("postal_code") or "")
+            try:
+                latitude, longitude = float(row["latitude"]), float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if postal_code:
+                yield PostalCodeEntry(
+                    postal_code, (row.get("address") or "").strip(), latitude, longitude
+                )
+
+
+async def load_postal_codes(
+    db: AsyncSession,
+    entries: Iterable[PostalCodeEntry],
+    batch_size: int | None = None,
+) -> PostalCodeLoadReport:
+    """
+    Upserts postal code entries in batches, each committed on its own, so the
+    dataset can be loaded again whenever a new edition comes out.
+
+    Args:
+        db (AsyncSession): The database session.
+        entries (Iterable[PostalCodeEntry]): The entries, e.g. from
+            `read_postal_codes()`.
+        batch_size (int | None): The entries per batch, `postal_code_batch_size` by
+            default.
+
+    Returns:
+        PostalCodeLoadReport: The entries loaded and the time taken.
+    """
+    batch_size = batch_size or settings.postal_code_batch_size
+    insert = dialect_insert(db)(PostalCode.__table__)
+    upsert = insert.on_conflict_do_update(
+        index_elements=["postal_code"],
+        set_={
+            "address": insert.excluded.address,
+            "latitude": insert.excluded.latitude,
+            "longitude": insert.excluded.longitude,
+            "updated_at": func.now(),
+        },
+    )
+
+    entries = iter(entries)
+    loaded = 0
+    started = timer.perf_counter()
+    while batch := list(islice(entries, batch_size)):
+        # A postal code repeated within a batch would hit the same row twice
+        rows = {entry.postal_code: entry._asdict() for entry in batch}
+        await db.execute(upsert, list(rows.values()))
+        await db.commit()
+        loaded += len(rows)
+
+    return PostalCodeLoadReport(loaded, timer.perf_counter() - started)
+
+
+class PostalCodeIndex(RefreshableIndex):
+    """
+    Every postal code held in a dict, so resolving a user's postal code to an address
+    and coordinates is a hash lookup. Postal codes loaded since the last refresh are
+    read by primary key on a miss, and kept.
+    """
+
+    def __init__(self):
+        super().__init__(max_age_seconds=settings.catalog_refresh_seconds)
+        self.entries: dict[str, PostalCodeEntry] = {}
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """
+        Reloads the postal codes from the database.
+
+        Args:
+            db (AsyncSession): The database session.
+        """
+        result = await db.execute(
+            select(
+                PostalCode.postal_code,
+                PostalCode.address,
+                PostalCode.latitude,
+                PostalCode.longitude,
+            )
+        )
+        self.entries = {
+            row[0]: PostalCodeEntry(row[0], row[1], float(row[2]), float(row[3]))
+            for row in result.all()
+        }
+        self.mark_loaded()
+
+    async def lookup(
+        self, db: AsyncSession, postal_code: str
+    ) -> PostalCodeEntry | None:
+        """
+        Looks a postal code up.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due
+                or on a miss.
+            postal_code (str): The postal code.
+
+        Returns:
+            PostalCodeEntry | None: The entry, or None if the postal code is unknown.
+        """
+        await self.ensure_fresh(db)
+        postal_code = normalize_postal_code(postal_code)
+        entry = self.entries.get(postal_code)
+        if entry is not None:
+            return entry
+
+        row = await db.get(PostalCode, postal_code)
+        if row is None:
+            return None
+        entry = PostalCodeEntry(
+            row.postal_code, row.address, float(row.latitude), float(row.longitude)
+        )
+        self.entries[postal_code] = entry
+        return entry
+
+
+async def resolve_address(
+    db: AsyncSession, postal_codes: PostalCodeIndex, postal_code: str
+) -> Address | None:
+    """
+    Gets the address of a postal code, creating it from the postal code dataset if no
+    user or clinic lives there yet.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        postal_codes (PostalCodeIndex): The postal code index.
+        postal_code (str): The postal code.
+
+    Returns:
+        Address | None: The address, or None if the postal code is unknown.
+    """
+    # The oldest address of the postal code, should it have several
+    result = await db.execute(
+        select(Address)
+        .where(Address.postal_code == normalize_postal_code(postal_code))
+        .order_by(Address.created_at, Address.id)
+        .limit(1)
+    )
+    address = result.scalars().first()
+    if address is not None:
+        return address
+
+    entry = await postal_codes.lookup(db, postal_code)
+    if entry is None:
+        return None
+
+    address = Address(
+        postal_code=entry.postal_code,
+        address=entry.address,
+        latitude=entry.latitude,
+        longitude=entry.longitude,
+    )
+    db.add(address)
+    await db.flush()
+    return address
+
+
+def get_postal_code_index(request: Request) -> PostalCodeIndex:
+    """
+    Gets the application's postal code index, creating it on first use.
+
+    Args:
+        request (Request): The FastAPI request.
+
+    Returns:
+        PostalCodeIndex: The postal code index.
+    """
+    if getattr(request.app.state, "postal_code_index", None) is None:
+        request.app.state.postal_code_index = PostalCodeIndex()
+    return request.app.state.postal_code_index
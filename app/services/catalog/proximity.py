@@ -0,0 +1,90 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.catalog.coordinates import ClinicCoordinates
+
+POSTGIS = "postgis"
+
+# KNN ordering on the GiST index of `addresses.location` (see data/migrations/002), so
+# Postgres walks the index nearest first and stops after LIMIT rows
+KNN_QUERY = """
+SELECT clinics.id, ST_Distance(addresses.location, origin.point) / 1000.0 AS km
+FROM clinics
+JOIN addresses ON addresses.id = clinics.address_id
+CROSS JOIN (
+    SELECT ST_SetSRID(ST_MakePoint(:longitude, :latitude), 4326)::geography AS point
+) AS origin
+WHERE addresses.location IS NOT NULL {type_filter}
+ORDER BY addresses.location <-> origin.point
+LIMIT :k
+"""
+
+
+def uses_postgis(db: AsyncSession) -> bool:
+    return (
+        settings.clinic_proximity_backend == POSTGIS
+        and db.get_bind().dialect.name == "postgresql"
+    )
+
+
+async def nearest_clinics_postgis(
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    k: int,
+    clinic_type: str | None = None,
+) -> list[tuple[str, float]]:
+    """
+    Finds the `k` clinics nearest to a location with a PostGIS KNN query.
+
+    Args:
+        db (AsyncSession): The database session, on Postgres with PostGIS.
+        latitude (float): The latitude of the location, in degrees.
+        longitude (float): The longitude of the location, in degrees.
+        k (int): The number of clinics to return.
+        clinic_type (str | None): The clinic type, or None for every type.
+
+    Returns:
+        list[tuple[str, float]]: The (clinic id, distance in km) pairs, nearest first.
+    """
+    query = KNN_QUERY.format(
+        type_filter="AND clinics.type = :clinic_type" if clinic_type else ""
+    )
+    params = {"latitude": latitude, "longitude": longitude, "k": k}
+    if clinic_type:
+        params["clinic_type"] = clinic_type
+
+    result = await db.execute(text(query), params)
+    return [(id, float(km)) for id, km in result.all()]
+
+
+async def nearest_clinics(
+    db: AsyncSession,
+    clinic_coordinates: ClinicCoordinates,
+    latitude: float,
+    longitude: float,
+    k: int,
+    clinic_type: str | None = None,
+) -> list[tuple[str, float]]:
+    """
+    Finds the `k` clinics nearest to a location with the configured
+    `clinic_proximity_backend`, falling back to the in-memory grid index on databases
+    other than Postgres.
+
+    Args:
+        db (AsyncSession): The database session.
+        clinic_coordinates (ClinicCoordinates): The in-memory clinic coordinates.
+        latitude (float): The latitude of the location, in degrees.
+        longitude (float): The longitude of the location, in degrees.
+        k (int): The number of clinics to return.
+        clinic_type (str | None): The clinic type, or None for every type.
+
+    Returns:
+        list[tuple[str, float]]: The (clinic id, distance in km) pairs, nearest first.
+    """
+    if uses_postgis(db):
+        return await nearest_clinics_postgis(db, latitude, longitude, k, clinic_type)
+    return await clinic_coordinates.nearest_clinics(
+        db, latitude, longitude, k, clinic_type
+    )
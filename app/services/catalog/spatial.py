@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+
+from app.services.catalog.geo import EARTH_RADIUS_KM, haversine_km, smallest_k
+
+# Grid cells span this many degrees each way, about 5.5 km of latitude
+CELL_DEGREES = 0.05
+
+
+class ClinicGrid:
+    """
+    Immutable grid index over clinic coordinates: clinics are bucketed into cells of
+    `cell_degrees` and stored contiguously per cell, so a k-nearest query only computes
+    distances for the rings of cells around the query point until the k-th nearest
+    clinic is provably closer than any unvisited cell.
+
+    Longitudes are not wrapped around the antimeridian, which is fine for clinics in a
+    single country.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        cell_degrees: float = CELL_DEGREES,
+    ):
+        self.cell_degrees = cell_degrees
+
+        rows = np.floor(latitudes / cell_degrees).astype(np.int64)
+        columns = np.floor(longitudes / cell_degrees).astype(np.int64)
+        order = np.lexsort((columns, rows))
+
+        self.ids = [ids[i] for i in order]
+        self.latitudes = np.radians(latitudes[order])
+        self.longitudes = np.radians(longitudes[order])
+        self.cos_latitudes = np.cos(self.latitudes)
+
+        # Each cell's clinics are one slice of the sorted arrays
+        self._cells: dict[tuple[int, int], tuple[int, int]] = {}
+        rows, columns = rows[order], columns[order]
+        start = 0
+        for end in range(1, len(order) + 1):
+            if end == len(order) or (rows[end], columns[end]) != (
+                rows[start],
+                columns[start],
+            ):
+                self._cells[(int(rows[start]), int(columns[start]))] = (start, end)
+                start = end
+
+        self._bounds = (
+            (int(rows.min()), int(rows.max()), int(columns.min()), int(columns.max()))
+            if len(order)
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _ring(self, row: int, column: int, ring: int) -> list[tuple[int, int]]:
+        if ring == 0:
+            return [(row, column)]
+        top, bottom = row - ring, row + ring
+        left, right = column - ring, column + ring
+        cells = [(top, c) for c in range(left, right + 1)]
+        cells += [(bottom, c) for c in range(left, right + 1)]
+        cells += [(r, left) for r in range(top + 1, bottom)]
+        cells += [(r, right) for r in range(top + 1, bottom)]
+        return cells
+
+    def _covered_km(self, latitude: float, ring: int) -> float:
+        # Any clinic outside the rings visited so far is at least `ring` cells away
+        # along the narrower side of a cell, which is its width at the highest latitude
+        highest = min(90.0, abs(latitude) + (ring + 1) * self.cell_degrees)
+        cell_km = math.radians(self.cell_degrees) * EARTH_RADIUS_KM
+        return ring * cell_km * math.cos(math.radians(highest))
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int
+    ) -> list[tuple[str, float]]:
+        """
+        Finds the `k` clinics nearest to a location by great-circle distance.
+
+        Args:
+            latitude (float): The latitude of the location, in degrees.
+            longitude (float): The longitude of the location, in degrees.
+            k (int): The number of clinics to return.
+
+        Returns:
+            list[tuple[str, float]]: The (clinic id, distance in km) pairs, nearest first.
+        """
+        if k <= 0 or self._bounds is None:
+            return []
+
+        row = math.floor(latitude / self.cell_degrees)
+        column = math.floor(longitude / self.cell_degrees)
+        min_row, max_row, min_column, max_column = self._bounds
+        last_ring = max(
+            abs(row - min_row),
+            abs(row - max_row),
+            abs(column - min_column),
+            abs(column - max_column),
+        )
+
+        slices, count = [], 0
+        positions = distances = None
+        for ring in range(last_ring + 1):
+            for cell in self._ring(row, column, ring):
+                if cell in self._cells:
+                    start, end = self._cells[cell]
+                    slices.append(np.arange(start, end))
+                    count += end - start
+
+            if count < min(k, len(self.ids)):
+                continue
+
+            positions = np.concatenate(slices)
+            distances = haversine_km(
+                latitude,
+                longitude,
+                self.latitudes[positions],
+                self.longitudes[positions],
+                self.cos_latitudes[positions],
+            )
+            kth = np.partition(distances, min(k, count) - 1)[min(k, count) - 1]
+            if kth <= self._covered_km(latitude, ring) or count == len(self.ids):
+                break
+
+        best = smallest_k(distances, k)
+        return [(self.ids[positions[p]], float(distances[p])) for p in best]
@@ -0,0 +1,72 @@
+import hashlib
+from typing import Iterable
+
+from fastapi import Request, Response, status
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import User
+
+
+async def bump_user_versions(db: AsyncSession, user_ids: Iterable[str]) -> None:
+    """
+    Bumps the version of users whose profile or vaccine records changed, so that
+    their cached responses no longer match.
+
+    Args:
+        db (AsyncSession): The database session. The caller commits.
+        user_ids (Iterable[str]): The user ids.
+    """
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        await db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            # Leaves updated_at alone, as it tracks profile changes only
+            .values(version=User.version + 1, updated_at=User.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def make_etag(request: Request, *parts) -> str:
+    """
+    Builds a weak ETag from the request's path and query and the versions its
+    response depends on.
+
+    Args:
+        request (Request): The FastAPI request.
+        *parts: The versions, e.g. a user version and a catalog version.
+
+    Returns:
+        str: The ETag, e.g. `W/"3f2a..."`.
+    """
+    parts = (request.url.path, request.url.query, *parts)
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode())
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Sets the ETag of a response, and answers 304 if the client already holds it,
+    comparing tags weakly as `If-None-Match` requires.
+
+    Args:
+        request (Request): The FastAPI request.
+        response (Response): The response whose headers to set.
+        etag (str): The ETag of the current representation.
+
+    Returns:
+        Response | None: A 304 response to return right away, or None to carry on.
+    """
+    response.headers["ETag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return None
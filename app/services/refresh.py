@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class RefreshableIndex:
+    """
+    Base class for in-memory indexes that are loaded from the database lazily and
+    reloaded once they are older than `max_age_seconds`, or right away after
+    `invalidate()` is called by code that changes the underlying rows.
+
+    Subclasses implement `refresh()`, which must build the new state completely
+    before swapping it in, so concurrent readers never observe a partial index.
+    """
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Forces a reload on the next lookup."""
+        self._loaded_at = None
+
+    def is_stale(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self.max_age_seconds
+        )
+
+    def mark_loaded(self) -> None:
+        self._loaded_at = time.monotonic()
+
+    async def refresh(self, db: AsyncSession) -> None:
+        raise NotImplementedError
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """
+        Reloads the index if it is stale. Concurrent callers wait for a single reload.
+
+        Args:
+            db (AsyncSession): The database session, used only when a reload is due.
+        """
+        if not self.is_stale():
+            return
+
+        async with self._lock:
+            if self.is_stale():
+                await self.refresh(db)
@@ -34,19 +34,19 @@ VALUES
 ('a67ed08a-95f0-47d4-a97b-8153f1d7874a', 'Human papillomavirus (HPV2 or HPV4)'),
 ('599b1189-0687-4a38-8de5-95850cfa9ee7', 'Pneumococcal Conjugate (PCV13)');
 
-INSERT INTO VaccineCriteria (id, vaccine_id, age_criteria, gender_criteria, health_condition_criteria, doses_required, frequency)
+INSERT INTO VaccineCriteria (id, vaccine_id, age_criteria, min_age_months, max_age_months, gender_criteria, health_condition_criteria, doses_required, frequency)
 VALUES
 -- Influenza (INF)
-('d0dde26e-89bd-4366-878b-5e57117bab0e', '9004aab3-8993-4d37-81c3-78844191e5ec', '18-64 years', 'None', 'Specific medical conditions or indications', 1, 'Annually or per season'),
-('617c7996-546a-4b6c-b5bb-3e2cdd3bf0a1', 'b79e4769-a79f-4142-96fc-da07d538cf9e', '65+ years', 'None', 'None', 1, 'Annually or per season'),
+('d0dde26e-89bd-4366-878b-5e57117bab0e', '9004aab3-8993-4d37-81c3-78844191e5ec', '18-64 years', 216, 779, 'None', 'Specific medical conditions or indications', 1, 'Annually or per season'),
+('617c7996-546a-4b6c-b5bb-3e2cdd3bf0a1', 'b79e4769-a79f-4142-96fc-da07d538cf9e', '65+ years', 780, NULL, 'None', 'None', 1, 'Annually or per season'),
 -- Human papillomavirus (HPV2 or HPV4)
-('5696ee5b-761e-45bb-9df8-7bc440bf261e', 'a67ed08a-95f0-47d4-a97b-8153f1d7874a', '12-13 years', 'F', 'None', 1, 'Once'),
-('bdbe6d75-5e9e-4dab-ac57-296d9a57613a', 'a67ed08a-95f0-47d4-a97b-8153f1d7874a', '13-14 years', 'F', 'None', 1, 'Once'),
-('0e759716-b221-4ebd-abe2-4e4e7bd665c7', 'a67ed08a-95f0-47d4-a97b-8153f1d7874a', '18-26 years', 'F', 'Unvaccinated adults or uncertain history', 3, 'Once'),
+('5696ee5b-761e-45bb-9df8-7bc440bf261e', 'a67ed08a-95f0-47d4-a97b-8153f1d7874a', '12-13 years', 144, 167, 'F', 'None', 1, 'Once'),
+('bdbe6d75-5e9e-4dab-ac57-296d9a57613a', 'a67ed08a-95f0-47d4-a97b-8153f1d7874a', '13-14 years', 156, 179, 'F', 'None', 1, 'Once'),
+('0e759716-b221-4ebd-abe2-4e4e7bd665c7', 'a67ed08a-95f0-47d4-a97b-8153f1d7874a', '18-26 years', 216, 323, 'F', 'Unvaccinated adults or uncertain history', 3, 'Once'),
 -- Pneumococcal Conjugate (PCV13)
-('255b7260-c7da-4f15-b772-64ec13dcf6a9', '599b1189-0687-4a38-8de5-95850cfa9ee7', '4 months', 'None', 'None', 1, 'Once'),
-('cda2e4b1-27ae-4bb2-9ee1-da75cd4683d4', '599b1189-0687-4a38-8de5-95850cfa9ee7', '6 months', 'None', 'None', 1, 'Once'),
-('d448048c-1d0e-4d3f-abd4-95919562d8bb', '599b1189-0687-4a38-8de5-95850cfa9ee7', '12 months', 'None', 'None', 1, 'Once');
+('255b7260-c7da-4f15-b772-64ec13dcf6a9', '599b1189-0687-4a38-8de5-95850cfa9ee7', '4 months', 4, 4, 'None', 'None', 1, 'Once'),
+('cda2e4b1-27ae-4bb2-9ee1-da75cd4683d4', '599b1189-0687-4a38-8de5-95850cfa9ee7', '6 months', 6, 6, 'None', 'None', 1, 'Once'),
+('d448048c-1d0e-4d3f-abd4-95919562d8bb', '599b1189-0687-4a38-8de5-95850cfa9ee7', '12 months', 12, 12, 'None', 'None', 1, 'Once');
 
 -- Insert sample data into BookingSlots
 INSERT INTO BookingSlots (id, polyclinic_id, vaccine_id, datetime)
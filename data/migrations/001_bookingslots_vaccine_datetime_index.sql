@@ -0,0 +1,2 @@
+-- Slot searches filter on vaccine ids resolved in memory, then order by datetime
+CREATE INDEX IF NOT EXISTS ix_bookingslots_vaccine_id_datetime ON BookingSlots (vaccine_id, datetime);
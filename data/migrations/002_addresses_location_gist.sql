@@ -0,0 +1,11 @@
+-- Postgres with PostGIS only, for CLINIC_PROXIMITY_BACKEND=postgis: a geography point
+-- per address, kept in step with latitude/longitude, and a GiST index so nearest-clinic
+-- queries order by `location <-> point` and stop after LIMIT rows
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+ALTER TABLE Addresses ADD COLUMN IF NOT EXISTS location geography(Point, 4326)
+    GENERATED ALWAYS AS (
+        ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326)::geography
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_addresses_location ON Addresses USING GIST (location);
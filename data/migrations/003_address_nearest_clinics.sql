@@ -0,0 +1,13 @@
+-- The nearest clinics of each type to an address, precomputed so nearest-clinic
+-- lookups for a user's home are a primary key read (see
+-- app/services/catalog/nearest_clinics.py); rows are filled in by the app
+CREATE TABLE IF NOT EXISTS AddressNearestClinics (
+    address_id TEXT NOT NULL REFERENCES Addresses(id) ON DELETE CASCADE,
+    clinic_type VARCHAR(50) NOT NULL,
+    clinics_version VARCHAR(64) NOT NULL,
+    clinic_ids TEXT NOT NULL,
+    distances_km TEXT NOT NULL,
+    complete BOOLEAN NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (address_id, clinic_type)
+);
@@ -0,0 +1,12 @@
+-- Slot holds, kept in the database so every worker sees the same holds and they
+-- survive restarts (see app/services/booking/holds.py); a hold is void once
+-- expires_at (UTC) has passed, and expired rows are deleted by the app
+CREATE TABLE IF NOT EXISTS SlotHolds (
+    id TEXT PRIMARY KEY,
+    booking_slot_id TEXT UNIQUE NOT NULL REFERENCES BookingSlots(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES Users(id) ON DELETE CASCADE,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_slotholds_user_id ON SlotHolds (user_id);
+CREATE INDEX IF NOT EXISTS ix_slotholds_expires_at ON SlotHolds (expires_at);
@@ -0,0 +1,16 @@
+-- Responses to booking mutations sent with an Idempotency-Key header, kept in the
+-- database so a retry reaching any worker is replayed (see
+-- app/services/booking/idempotency.py); the primary key makes each (user, key) run
+-- once, and rows past expires_at (UTC) are deleted by the app
+CREATE TABLE IF NOT EXISTS IdempotencyKeys (
+    user_id TEXT NOT NULL REFERENCES Users(id) ON DELETE CASCADE,
+    key VARCHAR(255) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    body BYTEA,
+    media_type VARCHAR(255),
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_idempotencykeys_expires_at ON IdempotencyKeys (expires_at);
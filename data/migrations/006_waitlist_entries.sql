@@ -0,0 +1,22 @@
+-- Waitlist entries, kept in the database so every worker matches freed slots against
+-- the same queue and entries survive restarts (see app/services/booking/waitlist.py);
+-- matching walks the (vaccine_id, created_at) index in queue order
+CREATE TABLE IF NOT EXISTS WaitlistEntries (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES Users(id) ON DELETE CASCADE,
+    vaccine_id TEXT NOT NULL REFERENCES Vaccines(id) ON DELETE CASCADE,
+    start_datetime TIMESTAMP,
+    end_datetime TIMESTAMP,
+    offer_hold_id TEXT,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_waitlistentries_vaccine_id_created_at
+    ON WaitlistEntries (vaccine_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_waitlistentries_user_id ON WaitlistEntries (user_id);
+
+CREATE TABLE IF NOT EXISTS WaitlistEntryClinics (
+    entry_id TEXT NOT NULL REFERENCES WaitlistEntries(id) ON DELETE CASCADE,
+    polyclinic_id TEXT NOT NULL REFERENCES Clinics(id) ON DELETE CASCADE,
+    PRIMARY KEY (entry_id, polyclinic_id)
+);
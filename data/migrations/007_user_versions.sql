@@ -0,0 +1,3 @@
+-- Version of each user's profile and vaccine records, bumped on every change so
+-- conditional GETs can answer 304 before querying (see app/services/etag.py)
+ALTER TABLE Users ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,13 @@
+-- Addresses are looked up by postal code on signup and profile updates
+CREATE INDEX IF NOT EXISTS ix_addresses_postal_code ON Addresses (postal_code);
+
+-- Every postal code with its address and coordinates, bulk-loaded from an offline
+-- dataset (see scripts/load_postal_codes.py), so signups get coordinates for any home
+-- (see app/services/catalog/postal_codes.py)
+CREATE TABLE IF NOT EXISTS PostalCodes (
+    postal_code VARCHAR(6) PRIMARY KEY,
+    address VARCHAR(100) NOT NULL,
+    latitude DECIMAL(9,6) NOT NULL,
+    longitude DECIMAL(9,6) NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,39 @@
+-- The inclusive range of ages in months each age criteria covers, so recommendations
+-- select criteria with one indexed range predicate instead of comparing strings (see
+-- app/services/catalog/eligibility.py for the parser the app uses)
+ALTER TABLE VaccineCriteria ADD COLUMN IF NOT EXISTS min_age_months INTEGER;
+ALTER TABLE VaccineCriteria ADD COLUMN IF NOT EXISTS max_age_months INTEGER;
+
+-- "6-59 months" -> 6..59, "12-13 years" -> 144..167, "18+ years" -> 216.., none -> 0..
+UPDATE VaccineCriteria
+SET
+    min_age_months = CASE
+        WHEN age_criteria IS NULL THEN 0
+        WHEN age_criteria ~* 'years?\s*$'
+            THEN substring(age_criteria FROM '^\s*(\d+)')::INTEGER * 12
+        ELSE substring(age_criteria FROM '^\s*(\d+)')::INTEGER
+    END,
+    max_age_months = CASE
+        WHEN age_criteria IS NULL OR age_criteria LIKE '%+%' THEN NULL
+        WHEN age_criteria ~* 'years?\s*$'
+            THEN (coalesce(
+                substring(age_criteria FROM '-\s*(\d+)'),
+                substring(age_criteria FROM '^\s*(\d+)')
+            )::INTEGER + 1) * 12 - 1
+        ELSE coalesce(
+            substring(age_criteria FROM '-\s*(\d+)'),
+            substring(age_criteria FROM '^\s*(\d+)')
+        )::INTEGER
+    END
+WHERE min_age_months IS NULL
+    AND (
+        age_criteria IS NULL
+        OR age_criteria ~* '^\s*\d+\s*(-\s*\d+|\+)?\s*(months?|years?)\s*$'
+    );
+
+-- Fails on any criteria left unparsed, rather than letting it never match
+ALTER TABLE VaccineCriteria ALTER COLUMN min_age_months SET DEFAULT 0;
+ALTER TABLE VaccineCriteria ALTER COLUMN min_age_months SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_vaccinecriteria_age_months
+    ON VaccineCriteria (min_age_months, max_age_months);
@@ -10,6 +10,7 @@ CREATE TABLE Users (
     date_of_birth DATE,
     gender VARCHAR(10),
     password VARCHAR(255) NOT NULL, -- hashed password
+    version INTEGER NOT NULL DEFAULT 0, -- bumped when the profile or records change
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (address_id) REFERENCES Addresses(id) ON DELETE CASCADE,
@@ -38,6 +39,18 @@ CREATE TABLE Addresses (
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX ix_addresses_postal_code ON Addresses (postal_code);
+
+-- Every postal code with its address and coordinates, bulk-loaded from an offline
+-- dataset (see scripts/load_postal_codes.py), so signups get coordinates for any home
+CREATE TABLE PostalCodes (
+    postal_code VARCHAR(6) PRIMARY KEY,
+    address VARCHAR(100) NOT NULL,
+    latitude DECIMAL(9,6) NOT NULL,
+    longitude DECIMAL(9,6) NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Vaccines table including vaccine name and audit timestamps
 CREATE TABLE Vaccines (
     id TEXT PRIMARY KEY,
@@ -51,6 +64,9 @@ CREATE TABLE VaccineCriteria (
     id TEXT PRIMARY KEY,
     vaccine_id TEXT NOT NULL,
     age_criteria VARCHAR(50),
+    -- The inclusive range of ages in months that age_criteria covers, NULL for no maximum
+    min_age_months INTEGER NOT NULL DEFAULT 0,
+    max_age_months INTEGER,
     gender_criteria VARCHAR(50),
     health_condition_criteria VARCHAR(50),
     doses_required INTEGER NOT NULL,
@@ -61,6 +77,9 @@ CREATE TABLE VaccineCriteria (
     UNIQUE (vaccine_id, age_criteria)
 );
 
+-- Recommendations select the criteria whose age range holds the user's age
+CREATE INDEX ix_vaccinecriteria_age_months ON VaccineCriteria (min_age_months, max_age_months);
+
 -- BookingSlots table representing available slots for appointments and audit timestamps
 CREATE TABLE BookingSlots (
     id TEXT PRIMARY KEY,
@@ -74,6 +93,9 @@ CREATE TABLE BookingSlots (
     UNIQUE (polyclinic_id, vaccine_id, datetime)
 );
 
+-- Slot searches filter on vaccine ids resolved in memory, then order by datetime
+CREATE INDEX ix_bookingslots_vaccine_id_datetime ON BookingSlots (vaccine_id, datetime);
+
 -- VaccineRecords table representing booked or completed appointments (or vaccinations) and audit timestamps
 CREATE TABLE VaccineRecords (
     id TEXT PRIMARY KEY,
@@ -85,3 +107,74 @@ CREATE TABLE VaccineRecords (
     FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE,
     FOREIGN KEY (booking_slot_id) REFERENCES BookingSlots(id) ON DELETE CASCADE
 );
+
+-- AddressNearestClinics table holding the nearest clinics of each type to an address,
+-- precomputed so nearest-clinic lookups for a user's home are a primary key read
+CREATE TABLE AddressNearestClinics (
+    address_id TEXT NOT NULL,
+    clinic_type VARCHAR(50) NOT NULL,
+    clinics_version VARCHAR(64) NOT NULL,
+    clinic_ids TEXT NOT NULL, -- comma-separated, nearest first
+    distances_km TEXT NOT NULL, -- comma-separated, aligned with clinic_ids
+    complete BOOLEAN NOT NULL, -- whether every clinic of the type is listed
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (address_id, clinic_type),
+    FOREIGN KEY (address_id) REFERENCES Addresses(id) ON DELETE CASCADE
+);
+
+-- SlotHolds table holding short-lived leases on booking slots, taken while a user
+-- confirms a slot; a hold is void once expires_at (UTC) has passed
+CREATE TABLE SlotHolds (
+    id TEXT PRIMARY KEY,
+    booking_slot_id TEXT UNIQUE NOT NULL,
+    user_id TEXT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    FOREIGN KEY (booking_slot_id) REFERENCES BookingSlots(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX ix_slotholds_user_id ON SlotHolds (user_id);
+CREATE INDEX ix_slotholds_expires_at ON SlotHolds (expires_at);
+
+-- IdempotencyKeys table holding the responses to booking mutations sent with an
+-- Idempotency-Key header, per user and key, so retries are replayed
+CREATE TABLE IdempotencyKeys (
+    user_id TEXT NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL, -- sha256 of the request
+    status_code INTEGER, -- unset while the request is still running
+    body BLOB,
+    media_type VARCHAR(255),
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, key),
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX ix_idempotencykeys_expires_at ON IdempotencyKeys (expires_at);
+
+-- WaitlistEntries table holding users waiting for a freed slot of a vaccine within a
+-- datetime window, queued by created_at
+CREATE TABLE WaitlistEntries (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    vaccine_id TEXT NOT NULL,
+    start_datetime DATETIME, -- unbounded if NULL
+    end_datetime DATETIME, -- unbounded if NULL
+    offer_hold_id TEXT, -- the SlotHolds id offered once a matching slot was freed
+    created_at DATETIME NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE,
+    FOREIGN KEY (vaccine_id) REFERENCES Vaccines(id) ON DELETE CASCADE
+);
+
+CREATE INDEX ix_waitlistentries_vaccine_id_created_at ON WaitlistEntries (vaccine_id, created_at);
+CREATE INDEX ix_waitlistentries_user_id ON WaitlistEntries (user_id);
+
+-- WaitlistEntryClinics table holding the polyclinics a waitlist entry accepts; an
+-- entry without any accepts every polyclinic
+CREATE TABLE WaitlistEntryClinics (
+    entry_id TEXT NOT NULL,
+    polyclinic_id TEXT NOT NULL,
+    PRIMARY KEY (entry_id, polyclinic_id),
+    FOREIGN KEY (entry_id) REFERENCES WaitlistEntries(id) ON DELETE CASCADE,
+    FOREIGN KEY (polyclinic_id) REFERENCES Clinics(id) ON DELETE CASCADE
+);
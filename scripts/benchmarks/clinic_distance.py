@@ -0,0 +1,121 @@
+"""
+Benchmarks ranking clinics by distance from a user, as done by `/bookings/available`:
+the previous per-clinic `geopy.distance.geodesic` loop over `Numeric` (Decimal)
+coordinates against the vectorized haversine pass with `argpartition` top-k selection.
+
+Usage:
+    python scripts/benchmarks/clinic_distance.py [--clinics 1000 10000] [--k 3]
+"""
+
+import argparse
+import random
+import timeit
+from decimal import Decimal
+
+import numpy as np
+from geopy.distance import geodesic
+
+from app.services.catalog.geo import haversine_km, smallest_k
+
+# Bounding box around Singapore
+LATITUDE_RANGE = (1.22, 1.47)
+LONGITUDE_RANGE = (103.6, 104.05)
+
+
+def make_clinics(count: int, seed: int = 42) -> list[tuple[str, Decimal, Decimal]]:
+    rng = random.Random(seed)
+    return [
+        (
+            f"clinic-{i}",
+            Decimal(f"{rng.uniform(*LATITUDE_RANGE):.6f}"),
+            Decimal(f"{rng.uniform(*LONGITUDE_RANGE):.6f}"),
+        )
+        for i in range(count)
+    ]
+
+
+def rank_with_geodesic(clinics, user_latitude, user_longitude, k):
+    distances = {
+        id: geodesic((user_latitude, user_longitude), (latitude, longitude)).km
+        for id, latitude, longitude in clinics
+    }
+    return sorted(distances, key=distances.get)[:k]
+
+
+def rank_with_numpy(
+    ids, latitudes, longitudes, cos_latitudes, user_latitude, user_longitude, k
+):
+    distances = haversine_km(
+        user_latitude, user_longitude, latitudes, longitudes, cos_latitudes
+    )
+    return [ids[p] for p in smallest_k(distances, k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clinics", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    user_latitude, user_longitude = 1.339401, 103.718451
+
+    print(
+        f"{'clinics':>8} {'geodesic (ms)':>14} {'numpy (ms)':>11} {'speed-up':>9} {'same top-k':>11}"
+    )
+    for count in args.clinics:
+        clinics = make_clinics(count)
+
+        # Arrays are built once when the catalog is (re)loaded, not per request
+        ids = [id for id, _, _ in clinics]
+        latitudes = np.radians(np.array([float(c[1]) for c in clinics]))
+        longitudes = np.radians(np.array([float(c[2]) for c in clinics]))
+        cos_latitudes = np.cos(latitudes)
+
+        geodesic_s = min(
+            timeit.repeat(
+                lambda: rank_with_geodesic(
+                    clinics, user_latitude, user_longitude, args.k
+                ),
+                number=1,
+                repeat=args.repeat,
+            )
+        )
+        numpy_s = (
+            min(
+                timeit.repeat(
+                    lambda: rank_with_numpy(
+                        ids,
+                        latitudes,
+                        longitudes,
+                        cos_latitudes,
+                        user_latitude,
+                        user_longitude,
+                        args.k,
+                    ),
+                    number=10,
+                    repeat=args.repeat,
+                )
+            )
+            / 10
+        )
+
+        same = rank_with_geodesic(
+            clinics, user_latitude, user_longitude, args.k
+        ) == rank_with_numpy(
+            ids,
+            latitudes,
+            longitudes,
+            cos_latitudes,
+            user_latitude,
+            user_longitude,
+            args.k,
+        )
+        print(
+            f"{count:>8} {geodesic_s * 1e3:>14.2f} {numpy_s * 1e3:>11.3f} "
+            f"{geodesic_s / numpy_s:>8.0f}x {str(same):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
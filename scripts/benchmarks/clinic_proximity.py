@@ -0,0 +1,190 @@
+"""
+Benchmarks nearest-clinic queries, as done by `/clinics/nearest-by-location`: the
+previous `ORDER BY pow(radians(dlat), 2) + pow(radians(dlon), 2)` expression, which
+sorts every clinic (and has no cos(latitude) term), against the in-memory grid index
+and, on Postgres with PostGIS, the KNN `<->` query on a GiST index.
+
+Each flow answers the same random locations; "exact" is the share of answers whose
+top k matches the true great-circle top k. `--database-url` should point at an empty
+scratch database, as the clinics are added to it.
+
+Usage:
+    python scripts/benchmarks/clinic_proximity.py [--database-url URL]
+        [--addresses 100000] [--queries 200] [--k 3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Importing the app models builds the (unused) production engine from these
+for name in ("PG_USER", "PG_PASSWORD", "PG_HOST", "PG_DATABASE"):
+    os.environ.setdefault(name, "benchmark")
+os.environ.setdefault("PG_PORT", "5432")
+
+import numpy as np
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.models.database import Base
+from app.models.models import Address, Clinic
+from app.services.catalog.coordinates import ClinicCoordinates
+from app.services.catalog.geo import haversine_km
+from app.services.catalog.proximity import nearest_clinics_postgis
+
+# Bounding box around Singapore
+LATITUDE_RANGE = (1.22, 1.47)
+LONGITUDE_RANGE = (103.6, 104.05)
+MIGRATION = (
+    Path(__file__).parents[2] / "data/migrations/002_addresses_location_gist.sql"
+)
+
+
+async def seed(session_factory, count: int, rng: random.Random):
+    addresses, clinics = [], []
+    for i in range(count):
+        address_id = str(uuid.uuid4())
+        addresses.append(
+            {
+                "id": address_id,
+                "postal_code": f"{i:06d}",
+                "address": f"Benchmark {i}",
+                "latitude": round(rng.uniform(*LATITUDE_RANGE), 6),
+                "longitude": round(rng.uniform(*LONGITUDE_RANGE), 6),
+            }
+        )
+        clinics.append(
+            {
+                "id": str(uuid.uuid4()),
+                "address_id": address_id,
+                "name": f"Clinic {i}",
+                "type": rng.choice(["polyclinic", "gp"]),
+            }
+        )
+
+    async with session_factory() as db:
+        for start in range(0, count, 10_000):
+            await db.execute(
+                Address.__table__.insert(), addresses[start : start + 10_000]
+            )
+            await db.execute(Clinic.__table__.insert(), clinics[start : start + 10_000])
+        await db.commit()
+
+    ids = [clinic["id"] for clinic in clinics]
+    latitudes = np.radians([address["latitude"] for address in addresses])
+    longitudes = np.radians([address["longitude"] for address in addresses])
+    return ids, latitudes, longitudes
+
+
+async def nearest_with_expression(db: AsyncSession, latitude, longitude, k):
+    distance = func.pow(func.radians(Address.latitude - latitude), 2) + func.pow(
+        func.radians(Address.longitude - longitude), 2
+    )
+    result = await db.execute(
+        select(Clinic)
+        .join(Clinic.address)
+        .options(selectinload(Clinic.address))
+        .add_columns(distance.label("distance"))
+        .order_by("distance")
+        .limit(k)
+    )
+    return [clinic.id for clinic in result.scalars().all()]
+
+
+async def time_flow(session_factory, nearest, locations, k, exact):
+    matches = 0
+    async with session_factory() as db:
+        started = time.perf_counter()
+        answers = [await nearest(db, lat, lon, k) for lat, lon in locations]
+        elapsed = time.perf_counter() - started
+    for answer, expected in zip(answers, exact):
+        matches += answer == expected
+    return elapsed / len(locations) * 1e3, matches / len(locations)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--addresses", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = (
+            args.database_url
+            or f"sqlite+aiosqlite:///{directory}/clinic_proximity.sqlite"
+        )
+        engine = create_async_engine(database_url)
+        session_factory = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        started = time.perf_counter()
+        ids, latitudes, longitudes = await seed(session_factory, args.addresses, rng)
+        print(
+            f"Seeded {args.addresses} clinics in {time.perf_counter() - started:.1f}s"
+        )
+
+        locations = [
+            (rng.uniform(*LATITUDE_RANGE), rng.uniform(*LONGITUDE_RANGE))
+            for _ in range(args.queries)
+        ]
+        exact = [
+            [
+                ids[p]
+                for p in np.argsort(haversine_km(lat, lon, latitudes, longitudes))[
+                    : args.k
+                ]
+            ]
+            for lat, lon in locations
+        ]
+
+        coordinates = ClinicCoordinates()
+        async with session_factory() as db:
+            started = time.perf_counter()
+            await coordinates.refresh(db)
+            print(f"Built the grid index in {time.perf_counter() - started:.2f}s")
+
+        async def nearest_with_grid(db, latitude, longitude, k):
+            nearest = await coordinates.nearest_clinics(db, latitude, longitude, k)
+            return [id for id, _ in nearest]
+
+        async def nearest_with_knn(db, latitude, longitude, k):
+            nearest = await nearest_clinics_postgis(db, latitude, longitude, k)
+            return [id for id, _ in nearest]
+
+        flows = [
+            ("expression", nearest_with_expression),
+            ("grid index", nearest_with_grid),
+        ]
+        if engine.dialect.name == "postgresql":
+            async with engine.begin() as conn:
+                for statement in MIGRATION.read_text().split(";"):
+                    if statement.strip():
+                        await conn.execute(text(statement))
+                await conn.execute(text("ANALYZE addresses"))
+            flows.append(("postgis knn", nearest_with_knn))
+
+        print(f"{'flow':>12} {'ms/query':>9} {'exact':>6}")
+        for name, nearest in flows:
+            ms, exact_share = await time_flow(
+                session_factory, nearest, locations, args.k, exact
+            )
+            print(f"{name:>12} {ms:>9.3f} {exact_share:>6.0%}")
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
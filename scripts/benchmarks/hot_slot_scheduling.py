@@ -0,0 +1,197 @@
+"""
+Benchmarks many users racing to schedule the same few slots, as done by
+`/bookings/schedule`: the previous check-then-insert flow (select the slot, select its
+record, insert, flush, refresh: five round trips with a race window between the check
+and the insert) against `reserve_slots()`, a single conditional insert.
+
+Each attempt runs in its own session, as concurrent requests would. An attempt ends as
+booked, as a clean conflict (the slot was taken), or as an error, i.e. a unique
+constraint violation that the route would have surfaced as a 500.
+
+Usage:
+    python scripts/benchmarks/hot_slot_scheduling.py [--database-url URL]
+        [--slots 50] [--contenders 20] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Importing the app models builds the (unused) production engine from these
+for name in ("PG_USER", "PG_PASSWORD", "PG_HOST", "PG_DATABASE"):
+    os.environ.setdefault(name, "benchmark")
+os.environ.setdefault("PG_PORT", "5432")
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.future import select
+
+from app.models.database import Base
+from app.models.models import Address, BookingSlot, Clinic, User, Vaccine, VaccineRecord
+from app.services.booking.scheduling import reserve_slots
+
+BOOKED, CONFLICT, ERROR = "booked", "conflict", "error"
+
+
+async def schedule_check_then_insert(db: AsyncSession, user_id: str, slot_id: str):
+    booking_slot = (
+        await db.execute(select(BookingSlot).where(BookingSlot.id == slot_id))
+    ).scalar_one_or_none()
+    if not booking_slot:
+        return CONFLICT
+
+    existing_record = (
+        await db.execute(
+            select(VaccineRecord).where(VaccineRecord.booking_slot_id == slot_id)
+        )
+    ).scalar_one_or_none()
+    if existing_record:
+        return CONFLICT
+
+    new_vaccine_record = VaccineRecord(
+        user_id=user_id, booking_slot_id=slot_id, status="booked"
+    )
+    db.add(new_vaccine_record)
+    await db.flush()
+    await db.refresh(new_vaccine_record)
+    await db.commit()
+    return BOOKED
+
+
+async def schedule_single_statement(db: AsyncSession, user_id: str, slot_id: str):
+    records = await reserve_slots(db, user_id, [slot_id])
+    if not records:
+        return CONFLICT
+    await db.commit()
+    return BOOKED
+
+
+async def seed(session_factory, slot_count: int, user_count: int):
+    async with session_factory() as db:
+        address = Address(
+            postal_code="000000", address="Benchmark", latitude=1.3, longitude=103.8
+        )
+        db.add(address)
+        await db.flush()
+        clinic = Clinic(address_id=address.id, name="Benchmark", type="polyclinic")
+        vaccine = Vaccine(name=f"Benchmark {uuid.uuid4()}")
+        users = [
+            User(
+                nric=f"B{uuid.uuid4()}",
+                first_name="bench",
+                last_name="mark",
+                email=f"{uuid.uuid4()}@example.com",
+                date_of_birth=datetime(1990, 1, 1).date(),
+                gender="M",
+                password="x",
+            )
+            for _ in range(user_count)
+        ]
+        db.add_all([clinic, vaccine, *users])
+        await db.flush()
+
+        start = datetime(2030, 1, 1, 8)
+        slots = [
+            BookingSlot(
+                polyclinic_id=clinic.id,
+                vaccine_id=vaccine.id,
+                datetime=start + timedelta(minutes=15 * i),
+            )
+            for i in range(slot_count)
+        ]
+        db.add_all(slots)
+        await db.commit()
+        return [slot.id for slot in slots], [user.id for user in users]
+
+
+async def run(session_factory, schedule, slot_ids, user_ids, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def attempt(user_id, slot_id):
+        async with semaphore:
+            async with session_factory() as db:
+                try:
+                    return await schedule(db, user_id, slot_id)
+                except (IntegrityError, OperationalError):
+                    await db.rollback()
+                    return ERROR
+
+    # Every user tries every slot, interleaved so the contenders for a slot overlap
+    attempts = [
+        attempt(user_id, slot_id) for slot_id in slot_ids for user_id in user_ids
+    ]
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*attempts)
+    elapsed = time.perf_counter() - started
+
+    async with session_factory() as db:
+        records = (
+            await db.execute(
+                select(VaccineRecord.booking_slot_id).where(
+                    VaccineRecord.booking_slot_id.in_(slot_ids)
+                )
+            )
+        ).scalars()
+        booked_slots = len(set(records))
+        await db.execute(
+            delete(VaccineRecord).where(VaccineRecord.booking_slot_id.in_(slot_ids))
+        )
+        await db.commit()
+
+    return {
+        "attempts/s": len(outcomes) / elapsed,
+        BOOKED: outcomes.count(BOOKED),
+        CONFLICT: outcomes.count(CONFLICT),
+        ERROR: outcomes.count(ERROR),
+        "slots booked": booked_slots,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--slots", type=int, default=50)
+    parser.add_argument("--contenders", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = (
+            args.database_url
+            or f"sqlite+aiosqlite:///{directory}/hot_slot_scheduling.sqlite"
+        )
+        engine = create_async_engine(database_url)
+        session_factory = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        slot_ids, user_ids = await seed(session_factory, args.slots, args.contenders)
+
+        print(
+            f"{'flow':>22} {'attempts/s':>11} {'booked':>7} {'conflict':>9} "
+            f"{'error':>6} {'slots booked':>13}"
+        )
+        for name, schedule in (
+            ("check-then-insert", schedule_check_then_insert),
+            ("single statement", schedule_single_statement),
+        ):
+            result = await run(
+                session_factory, schedule, slot_ids, user_ids, args.concurrency
+            )
+            print(
+                f"{name:>22} {result['attempts/s']:>11.0f} {result[BOOKED]:>7} "
+                f"{result[CONFLICT]:>9} {result[ERROR]:>6} {result['slots booked']:>13}"
+            )
+
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
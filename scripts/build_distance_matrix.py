@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""
+`build_distance_matrix.py`
+
+Builds the matrix of distances from every postal code sector to every clinic, which
+the API memory-maps to rank clinics from a user's home by lookup.
+
+Usage:
+    `python scripts/build_distance_matrix.py [data/distance_matrix.json] [--database-url URL]`
+
+Writes a JSON header to the given path and the `.npy` matrix next to it. Point
+`DISTANCE_MATRIX_PATH` at the header. Run it again after loading clinics or postal
+codes; until then, the API computes distances itself, as the matrix no longer matches
+the clinics loaded.
+
+The database is the one the API uses, configured by the `PG_*` variables in `.env`,
+unless `--database-url` is given.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+load_dotenv()
+
+from app.models.database import AsyncSessionLocal
+from app.services.catalog.distance_matrix import build_distance_matrix
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument(
+        "path", type=Path, nargs="?", default=Path("data/distance_matrix.json")
+    )
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        session_factory = async_sessionmaker(
+            create_async_engine(args.database_url),
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+    else:
+        session_factory = AsyncSessionLocal
+
+    async with session_factory() as db:
+        report = await build_distance_matrix(db, args.path)
+
+    print(
+        f"Built the distances from {report.sectors} sectors to {report.clinics} "
+        f"clinics in {report.seconds:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
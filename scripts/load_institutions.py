@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+`load_institutions.py`
+
+Loads the institutions dataset into the `clinics` and `addresses` tables in batches,
+inserting new clinics and moving clinics whose address changed, so it is safe to run
+again with a new edition of the dataset.
+
+Usage:
+    `python scripts/load_institutions.py [data/get_instituitions_response.json] [--database-url URL] [--batch-size N]`
+
+The dataset is pulled with `scripts/get_data.sh`. It is a JSON array of institutions,
+or an object holding one, each with a `name`, a `type` (e.g. `polyclinic` or `gp`), an
+`address`, a `postal_code`, a `latitude` and a `longitude`. Institutions of other
+types, or missing any of these, are skipped.
+
+The database is the one the API uses, configured by the `PG_*` variables in `.env`,
+unless `--database-url` is given.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+load_dotenv()
+
+from app.models.database import AsyncSessionLocal
+from app.services.catalog.institutions import load_institutions, read_institutions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument(
+        "dataset",
+        type=Path,
+        nargs="?",
+        default=Path("data/get_instituitions_response.json"),
+    )
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        session_factory = async_sessionmaker(
+            create_async_engine(args.database_url),
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+    else:
+        session_factory = AsyncSessionLocal
+
+    async with session_factory() as db:
+        report = await load_institutions(
+            db, read_institutions(args.dataset), batch_size=args.batch_size
+        )
+
+    print(
+        f"Loaded institutions in {report.seconds:.2f}s: {report.inserted} inserted, "
+        f"{report.updated} updated, {report.unchanged} unchanged, "
+        f"{report.skipped} skipped ({report.rows_per_second:,.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
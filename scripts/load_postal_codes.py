@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""
+`load_postal_codes.py`
+
+Loads a postal code dataset into the `postalcodes` table in batches, updating postal
+codes already loaded, so it is safe to run again with a new edition of the dataset.
+
+Usage:
+    `python scripts/load_postal_codes.py postal_codes.csv [--database-url URL] [--batch-size N]`
+
+`postal_codes.csv` has a header row and the columns `postal_code`, `address`,
+`latitude` and `longitude`, e.g.:
+    postal_code,address,latitude,longitude
+    768898,2 Yishun Avenue 9,1.430359,103.839191
+
+The database is the one the API uses, configured by the `PG_*` variables in `.env`,
+unless `--database-url` is given.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+load_dotenv()
+
+from app.models.database import AsyncSessionLocal
+from app.services.catalog.postal_codes import load_postal_codes, read_postal_codes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("dataset", type=Path)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        session_factory = async_sessionmaker(
+            create_async_engine(args.database_url),
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+    else:
+        session_factory = AsyncSessionLocal
+
+    async with session_factory() as db:
+        report = await load_postal_codes(
+            db, read_postal_codes(args.dataset), batch_size=args.batch_size
+        )
+
+    print(
+        f"Loaded {report.loaded} postal codes in {report.seconds:.2f}s: "
+        f"{report.rows_per_second:,.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
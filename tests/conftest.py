@@ -1,3 +1,4 @@
+from datetime import datetime
 from pathlib import Path
 
 import jwt
@@ -9,8 +10,10 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.auth.oauth2 import create_access_token
+from app.core.config import settings
 from app.main import create_app
 from app.models.database import Base, get_db
+from app.services.booking.availability import AvailabilityIndex
 
 # Database connection (existing SQLite file)
 DATABASE_URL = "sqlite+aiosqlite:///data/test_vaccination_db.sqlite"
@@ -29,6 +32,8 @@ TestingAsyncSessionLocal = async_sessionmaker(
 # Testing secret
 SECRET_KEY = "760e1f0c95052fe205f6189f6ad153ca3758b17bb8d9e0d4f78602894e448517"
 ALGORITHM = "HS256"
+ADMIN_API_KEY = "test-admin-key"
+NOW = datetime(2025, 3, 31, 8, 0)
 
 
 @pytest_asyncio.fixture(scope="function", autouse=True)
@@ -84,6 +89,8 @@ async def test_app(session: AsyncSession) -> FastAPI:  # type: ignore
     _app = create_app(test=True)
 
     _app.state.secret_key = SECRET_KEY
+    # The seeded slots are in April 2025, so search as of just before them
+    _app.state.availability_index = AvailabilityIndex(clock=lambda: NOW)
 
     async def _override_get_db():
         yield session
@@ -96,6 +103,22 @@ async def test_app(session: AsyncSession) -> FastAPI:  # type: ignore
     _app.dependency_overrides.clear()
 
 
+@pytest_asyncio.fixture
+async def session_per_request(test_app: FastAPI) -> FastAPI:
+    """
+    Override FastAPI's get_db so that every request gets its own session, as in
+    production, for tests that send concurrent requests.
+    """
+
+    async def _override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    test_app.dependency_overrides[get_db] = _override_get_db
+
+    return test_app
+
+
 # I have investigated and it seems the test data is persisted into my dev database tables instead of my test database. Therefore, it seems the `override_get_db_fixture` did not override the dependencies on the global app from `main.py`. I have narrowed down the issue so how can I fix this?
 
 
@@ -214,3 +237,12 @@ async def authorized_client_for_scheduling(async_client: AsyncClient):
     }
 
     return async_client
+
+
+@pytest_asyncio.fixture
+async def admin_client(async_client: AsyncClient, monkeypatch) -> AsyncClient:
+    monkeypatch.setattr(settings, "admin_api_key", ADMIN_API_KEY)
+
+    async_client.headers = {**async_client.headers, "X-Admin-Key": ADMIN_API_KEY}
+
+    return async_client
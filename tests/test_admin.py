@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from requests import Response
+
+from app.schemas.booking import ClinicClosureResponse, SlotGenerationResponse
+from app.services.booking import closures
+
+# Weekday mornings at Yishun Polyclinic (see data.sql) for Influenza
+GENERATE_SLOTS_BODY = {
+    "start_date": "2025-06-02",  # Monday
+    "end_date": "2025-06-08",  # Sunday
+    "templates": [
+        {
+            "polyclinic_id": "bd760847-db7e-439f-add8-3610167478ca",
+            "vaccine_id": "9004aab3-8993-4d37-81c3-78844191e5ec",
+            "weekdays": [0, 1, 2, 3, 4],
+            "start_time": "09:00",
+            "end_time": "10:00",
+            "interval_minutes": 15,
+        }
+    ],
+}
+
+
+@pytest.mark.asyncio
+async def test_admin_generate_booking_slots(
+    admin_client: AsyncClient, authorized_client_for_scheduling: AsyncClient
+):
+    res: Response = await admin_client.post(
+        "/admin/slots/generate", json=GENERATE_SLOTS_BODY
+    )
+
+    assert res.status_code == 200
+    report = SlotGenerationResponse(**res.json())
+    # 5 weekdays, 4 slots each
+    assert report.generated == 20
+    assert report.inserted == 20
+
+    # Running it again skips the existing slots
+    res = await admin_client.post("/admin/slots/generate", json=GENERATE_SLOTS_BODY)
+
+    assert res.status_code == 200
+    assert res.json()["generated"] == 20
+    assert res.json()["inserted"] == 0
+
+    # The new slots are available
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/available",
+        params={
+            "vaccine_name": "Influenza (INF)",
+            "polyclinic_name": "Yishun",
+            "start_datetime": "2025-06-02",
+            "timeslot_limit": 4,
+        },
+    )
+    assert res.status_code == 200
+    assert [slot["datetime"] for slot in res.json()] == [
+        "2025-06-02T09:00:00",
+        "2025-06-02T09:15:00",
+        "2025-06-02T09:30:00",
+        "2025-06-02T09:45:00",
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "template, expected_status",
+    [
+        # Unknown clinic
+        ({"polyclinic_id": "00000000-0000-0000-0000-000000000000"}, 404),
+        # Ends before it starts
+        ({"start_time": "10:00", "end_time": "09:00"}, 422),
+        ({"weekdays": [7]}, 422),
+    ],
+)
+async def test_admin_generate_invalid_booking_slots(
+    admin_client: AsyncClient, template: dict, expected_status: int
+):
+    body = {
+        **GENERATE_SLOTS_BODY,
+        "templates": [{**GENERATE_SLOTS_BODY["templates"][0], **template}],
+    }
+    res: Response = await admin_client.post("/admin/slots/generate", json=body)
+
+    assert res.status_code == expected_status
+
+
+@pytest.mark.asyncio
+async def test_non_admin_generate_booking_slots(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    res: Response = await authorized_client_for_scheduling.post(
+        "/admin/slots/generate", json=GENERATE_SLOTS_BODY
+    )
+
+    assert res.status_code == 403
+    assert res.json().get("detail") == "Admin access required."
+
+
+@pytest.mark.asyncio
+async def test_admin_close_clinic_moves_bookings(
+    admin_client: AsyncClient, authorized_client_for_scheduling: AsyncClient
+):
+    # See data.sql for the free Influenza slots at Yishun Polyclinic (11:00) and
+    # Bartley Clinic (10:00) on 2025-04-03
+    yishun_slot_id = "e7bbc307-ae75-4854-bd91-d6851ae085fd"
+    bartley_slot_id = "5379aea8-3acd-4274-9cbc-acb3c4973b6c"
+
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/schedule", json={"booking_slot_id": yishun_slot_id}
+    )
+    assert res.status_code == 201
+    record_id = res.json()["id"]
+
+    res = await admin_client.post(
+        "/admin/closures",
+        json={
+            "polyclinic_id": "bd760847-db7e-439f-add8-3610167478ca",
+            "start_datetime": "2025-04-03T00:00:00",
+            "end_datetime": "2025-04-03T23:59:59",
+        },
+    )
+    assert res.status_code == 200
+    report = ClinicClosureResponse(**res.json())
+    assert [
+        (str(moved.vaccine_record_id), str(moved.to_slot_id))
+        for moved in report.rescheduled
+    ] == [(record_id, bartley_slot_id)]
+    assert report.cancelled == report.unmatched == []
+    assert report.removed_slots == 1
+
+    # The closed clinic's slots are gone, and the booking moved
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/available",
+        params={"vaccine_name": "Influenza (INF)", "polyclinic_name": "Yishun"},
+    )
+    assert res.status_code == 404
+
+    res = await authorized_client_for_scheduling.get(f"/records/{record_id}")
+    assert res.status_code == 200
+    assert res.json()["booking_slot_id"] == bartley_slot_id
+
+    res = await admin_client.post(
+        "/admin/closures",
+        json={
+            "polyclinic_id": "00000000-0000-0000-0000-000000000000",
+            "start_datetime": "2025-04-03T00:00:00",
+            "end_datetime": "2025-04-03T23:59:59",
+        },
+    )
+    assert res.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_admin_close_clinic_skips_held_slots(
+    admin_client: AsyncClient, authorized_client_for_scheduling: AsyncClient
+):
+    # The only other free Influenza slot, at Bartley Clinic, is on hold
+    yishun_slot_id = "e7bbc307-ae75-4854-bd91-d6851ae085fd"
+    bartley_slot_id = "5379aea8-3acd-4274-9cbc-acb3c4973b6c"
+
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/schedule", json={"booking_slot_id": yishun_slot_id}
+    )
+    assert res.status_code == 201
+    record_id = res.json()["id"]
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/holds", json={"booking_slot_id": bartley_slot_id}
+    )
+    assert res.status_code == 201
+
+    res = await admin_client.post(
+        "/admin/closures",
+        json={
+            "polyclinic_id": "bd760847-db7e-439f-add8-3610167478ca",
+            "start_datetime": "2025-04-03T00:00:00",
+            "end_datetime": "2025-04-03T23:59:59",
+        },
+    )
+    assert res.status_code == 200
+    report = ClinicClosureResponse(**res.json())
+    assert report.rescheduled == []
+    assert [str(id) for id in report.cancelled] == [record_id]
+
+
+def test_assign_slots_matches_sorting_every_pair(monkeypatch):
+    monkeypatch.setattr(closures, "CANDIDATES_PER_BOOKING", 3)
+    monkeypatch.setattr(closures, "COST_MATRIX_CELLS", 50)
+
+    rng = np.random.default_rng(7)
+    start = datetime(2025, 4, 1)
+    record_vaccine_ids = [str(id) for id in rng.integers(0, 2, 40)]
+    record_datetimes = [
+        start + timedelta(hours=int(h)) for h in rng.integers(0, 96, 40)
+    ]
+    slot_vaccine_ids = [str(id) for id in rng.integers(0, 2, 30)]
+    slot_datetimes = [start + timedelta(hours=int(h)) for h in rng.integers(0, 96, 30)]
+    distances = rng.uniform(0, 20, 30)
+
+    # Every pair, cheapest first
+    pairs = sorted(
+        (
+            abs((slot_datetimes[s] - record_datetimes[r]).total_seconds()) / 86400
+            + distances[s],
+            r,
+            s,
+        )
+        for r in range(40)
+        for s in range(30)
+        if record_vaccine_ids[r] == slot_vaccine_ids[s]
+    )
+    expected, used = [None] * 40, set()
+    for _, r, s in pairs:
+        if expected[r] is None and s not in used:
+            expected[r] = s
+            used.add(s)
+
+    assert (
+        closures.assign_slots(
+            record_vaccine_ids,
+            record_datetimes,
+            slot_vaccine_ids,
+            slot_datetimes,
+            distances,
+        )
+        == expected
+    )
@@ -1,11 +1,32 @@
+import asyncio
+import base64
+from datetime import date, datetime, timedelta
+
 import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from httpx import AsyncClient
 from pydantic import TypeAdapter
 from requests import Response
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.schemas.booking import AvailableSlotResponse, BookingSlotResponse
+from app.models.models import BookingSlot, VaccineRecord
+from app.schemas.booking import (
+    AvailableSlotResponse,
+    BookingSlotResponse,
+    ClinicCalendarResponse,
+    SlotHoldResponse,
+    WaitlistEntryResponse,
+)
 from app.schemas.record import VaccineRecordResponse
 from app.schemas.vaccine import VaccineCriteriaResponse
+from app.services.booking.availability import AvailabilityIndex
+from app.services.booking.calendar import AvailabilityCalendar, CalendarDay
+from app.services.booking.events import SlotEventBroker
+from app.services.booking.holds import SlotHolds
+from app.services.booking.idempotency import IdempotencyStore
+from app.services.booking.waitlist import Waitlist
 
 
 # ============================================================================
@@ -72,6 +93,395 @@ async def test_authorized_user_invalid_get_all_available_booking_slots(
     )
 
 
+# ============================================================================
+# Authorized user gets available slots within a date range
+# ============================================================================
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params, expected_status, expected_datetimes",
+    [
+        # Dates as query strings, the end date inclusive
+        (
+            {"start_datetime": "2025-04-02", "end_datetime": "2025-04-03"},
+            200,
+            {"2025-04-03T10:00:00", "2025-04-03T11:00:00"},
+        ),
+        # A datetime start, within the same day
+        (
+            {"start_datetime": "2025-04-03T10:30:00", "end_datetime": "2025-04-03"},
+            200,
+            {"2025-04-03T11:00:00"},
+        ),
+        # The only slot before 2025-04-03 is booked
+        ({"end_datetime": "2025-04-02"}, 404, None),
+        ({"start_datetime": "soon"}, 400, None),
+    ],
+)
+async def test_authorized_user_get_available_booking_slots_by_date(
+    authorized_client_for_scheduling: AsyncClient,
+    params: dict,
+    expected_status: int,
+    expected_datetimes: set[str] | None,
+):
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available",
+        params={
+            "vaccine_name": "Influenza (INF)",
+            "polyclinic_limit": 5,
+            "timeslot_limit": 5,
+            **params,
+        },
+    )
+    assert res.status_code == expected_status
+
+    if expected_datetimes is not None:
+        slots = [AvailableSlotResponse(**slot) for slot in res.json()]
+        assert {slot.datetime.isoformat() for slot in slots} == expected_datetimes
+
+
+# ============================================================================
+# Authorized user gets available slots with loosely written names
+# ============================================================================
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params, expected_polyclinics",
+    [
+        # Partial, lowercase name
+        ({"vaccine_name": "influenza"}, None),
+        # Misspelt name
+        ({"vaccine_name": "Influensa"}, None),
+        # Abbreviation and partial polyclinic name
+        (
+            {"vaccine_name": "INF", "polyclinic_name": "yishun"},
+            {"Yishun Polyclinic"},
+        ),
+    ],
+)
+async def test_authorized_user_get_available_booking_slots_fuzzy_names(
+    authorized_client_for_scheduling: AsyncClient,
+    params: dict,
+    expected_polyclinics: set[str] | None,
+):
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 200
+
+    slots = [AvailableSlotResponse(**slot) for slot in res.json()]
+    assert slots
+    for slot in slots:
+        # See data.sql for the Influenza (INF) vaccine id
+        assert str(slot.vaccine_id) == "9004aab3-8993-4d37-81c3-78844191e5ec"
+        if expected_polyclinics:
+            assert slot.polyclinic.name in expected_polyclinics
+
+
+# ============================================================================
+# Authorized user with a home address gets slots at the nearest polyclinic first
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_get_available_booking_slots_nearest_first(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    # The scheduling user lives at 618490 (see data.sql), ~16.8 km from Yishun
+    # Polyclinic and ~18.5 km from Bartley Clinic, which both have Influenza slots
+    params = {"vaccine_name": "Influenza (INF)", "polyclinic_limit": 2}
+
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 200
+
+    slots = [AvailableSlotResponse(**slot) for slot in res.json()]
+    assert [slot.polyclinic.name for slot in slots] == [
+        "Yishun Polyclinic",
+        "Bartley Clinic",
+    ]
+
+
+# ============================================================================
+# Authorized user trades distance against an earlier slot with weighted ranking
+# ============================================================================
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "weights, expected_polyclinic",
+    [
+        # Yishun Polyclinic is ~1.7 km nearer, but its slot is an hour later
+        ({"distance_weight": 1, "wait_weight": 0}, "Yishun Polyclinic"),
+        ({"distance_weight": 1, "wait_weight": 100}, "Bartley Clinic"),
+    ],
+)
+async def test_authorized_user_get_available_booking_slots_weighted_ranking(
+    authorized_client_for_scheduling: AsyncClient,
+    weights: dict,
+    expected_polyclinic: str,
+):
+    params = {
+        "vaccine_name": "Influenza (INF)",
+        "start_datetime": "2025-04-03",
+        "polyclinic_limit": 1,
+        "rank_by": "score",
+        **weights,
+    }
+
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 200
+
+    slots = [AvailableSlotResponse(**slot) for slot in res.json()]
+    assert [slot.polyclinic.name for slot in slots] == [expected_polyclinic]
+
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/available", params={**params, "wait_weight": -1}
+    )
+    assert res.status_code == 422
+
+
+# ============================================================================
+# Scheduling and cancelling a slot is reflected in later availability searches
+# ============================================================================
+@pytest.mark.asyncio
+async def test_available_booking_slots_follow_schedule_and_cancel(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    params = {"vaccine_name": "Influenza (INF)", "polyclinic_name": "Yishun Polyclinic"}
+    # See data.sql for the only free Influenza slot at Yishun Polyclinic
+    slot_id = "e7bbc307-ae75-4854-bd91-d6851ae085fd"
+
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 200
+    assert [slot["id"] for slot in res.json()] == [slot_id]
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/schedule", json={"booking_slot_id": slot_id}
+    )
+    assert res.status_code == 201
+    record_id = res.json()["id"]
+
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 404
+
+    res = await authorized_client_for_scheduling.delete(f"/bookings/cancel/{record_id}")
+    assert res.status_code == 200
+
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 200
+    assert [slot["id"] for slot in res.json()] == [slot_id]
+
+
+# ============================================================================
+# The availability index holds only upcoming free slots, and loads freed ones
+# ============================================================================
+@pytest.mark.asyncio
+async def test_availability_index_loads_upcoming_free_slots(session: AsyncSession):
+    # See data.sql for the Influenza slots; the one at Ang Mo Kio is booked
+    vaccine_ids = {"9004aab3-8993-4d37-81c3-78844191e5ec"}
+    booked_slot_id = "97ba51db-48d8-4873-b1ee-57a9b7f766f0"
+
+    index = AvailabilityIndex(clock=lambda: datetime(2025, 4, 3, 10, 30))
+    await index.refresh(session)
+    slots = await index.search(session, vaccine_ids)
+    assert [slot.id for slot in slots] == ["e7bbc307-ae75-4854-bd91-d6851ae085fd"]
+    assert not index.is_free(booked_slot_id)
+
+    # A booking cancelled since the load frees a slot the index never saw, which the
+    # next search loads on its own
+    index = AvailabilityIndex(clock=lambda: datetime(2025, 3, 31, 8))
+    await index.refresh(session)
+    loaded_at = index._loaded_at
+    await session.execute(
+        delete(VaccineRecord).where(VaccineRecord.booking_slot_id == booked_slot_id)
+    )
+    await session.commit()
+    index.mark_free(booked_slot_id)
+
+    slots = await index.search(session, vaccine_ids)
+    assert slots[0].id == booked_slot_id
+    assert index._loaded_at == loaded_at
+
+
+# ============================================================================
+# Authorized user gets the availability calendar, kept current by bookings
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_get_availability_calendar(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    params = {
+        "vaccine_name": "Influenza (INF)",
+        "polyclinic_name": "Yishun Polyclinic",
+        "start_date": "2025-04-01",
+        "end_date": "2025-04-30",
+    }
+    # See data.sql for the only free Influenza slot at Yishun Polyclinic, at 11:00
+    slot_id = "e7bbc307-ae75-4854-bd91-d6851ae085fd"
+
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/calendar", params=params
+    )
+    assert res.status_code == 200
+    calendar = TypeAdapter(list[ClinicCalendarResponse]).validate_python(res.json())
+    assert [clinic.polyclinic_name for clinic in calendar] == ["Yishun Polyclinic"]
+    [day] = calendar[0].days
+    assert (day.date.isoformat(), day.free_slots) == ("2025-04-03", 1)
+    bits = int.from_bytes(base64.b64decode(day.bitmap), "little")
+    assert bits == 1 << (11 * 60)
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/schedule", json={"booking_slot_id": slot_id}
+    )
+    assert res.status_code == 201
+
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/calendar", params=params
+    )
+    assert res.status_code == 200
+    assert res.json() == []
+
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/calendar",
+        params={**params, "start_date": "2025-04-30", "end_date": "2025-04-01"},
+    )
+    assert res.status_code == 400
+
+
+def test_availability_calendar_counts_slots_per_vaccine():
+    calendar = AvailabilityCalendar()
+    nine, ten = datetime(2025, 4, 3, 9), datetime(2025, 4, 3, 10)
+    calendar.add("vaccine-1", "clinic-1", nine)
+    calendar.add("vaccine-2", "clinic-1", nine)
+    calendar.add("vaccine-2", "clinic-1", ten)
+    calendar.add("vaccine-3", "clinic-1", ten)
+
+    # Both vaccines have a slot at 09:00, which is one minute but two free slots
+    days = calendar.days(
+        {"vaccine-1", "vaccine-2"}, None, date(2025, 4, 1), date(2025, 4, 30)
+    )
+    assert days == {
+        "clinic-1": {
+            date(2025, 4, 3): CalendarDay(
+                bits=(1 << 9 * 60) | (1 << 10 * 60), free_slots=3
+            )
+        }
+    }
+
+    calendar.remove("vaccine-2", "clinic-1", nine)
+    days = calendar.days(
+        {"vaccine-1"}, {"clinic-1"}, date(2025, 4, 3), date(2025, 4, 3)
+    )
+    assert days == {"clinic-1": {date(2025, 4, 3): CalendarDay(1 << 9 * 60, 1)}}
+
+
+# ============================================================================
+# Authorized user pages through available slots with a cursor
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_page_available_booking_slots(
+    authorized_client_for_scheduling: AsyncClient, session: AsyncSession
+):
+    # Two more Influenza slots at Yishun Polyclinic (see data.sql for the ids)
+    session.add_all(
+        [
+            BookingSlot(
+                id=slot_id,
+                polyclinic_id="bd760847-db7e-439f-add8-3610167478ca",
+                vaccine_id="9004aab3-8993-4d37-81c3-78844191e5ec",
+                datetime=slot_datetime,
+            )
+            for slot_id, slot_datetime in [
+                ("0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e01", datetime(2025, 4, 4, 9)),
+                ("0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e02", datetime(2025, 4, 5, 9)),
+            ]
+        ]
+    )
+    await session.commit()
+
+    params = {"vaccine_name": "Influenza (INF)", "polyclinic_name": "Yishun"}
+    pages = []
+    while True:
+        res: Response = await authorized_client_for_scheduling.get(
+            "/bookings/available", params=params
+        )
+        assert res.status_code == 200
+        pages.append([slot["id"] for slot in res.json()])
+
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+
+    assert pages == [
+        ["e7bbc307-ae75-4854-bd91-d6851ae085fd"],
+        ["0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e01"],
+        ["0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e02"],
+    ]
+
+    params["cursor"] = "not-a-cursor"
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/available", params=params
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_authorized_user_page_available_booking_slots_across_polyclinics(
+    authorized_client_for_scheduling: AsyncClient, session: AsyncSession
+):
+    # Two more Influenza slots at Yishun Polyclinic, before the one at Bartley Clinic,
+    # so the first page shows one Yishun slot and the Bartley one
+    session.add_all(
+        [
+            BookingSlot(
+                id=slot_id,
+                polyclinic_id="bd760847-db7e-439f-add8-3610167478ca",
+                vaccine_id="9004aab3-8993-4d37-81c3-78844191e5ec",
+                datetime=slot_datetime,
+            )
+            for slot_id, slot_datetime in [
+                ("0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e03", datetime(2025, 4, 3, 9)),
+                ("0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e04", datetime(2025, 4, 3, 9, 30)),
+            ]
+        ]
+    )
+    await session.commit()
+
+    params = {
+        "vaccine_name": "Influenza (INF)",
+        "polyclinic_limit": 2,
+        "timeslot_limit": 1,
+    }
+    pages = []
+    while True:
+        res: Response = await authorized_client_for_scheduling.get(
+            "/bookings/available", params=params
+        )
+        assert res.status_code == 200
+        pages.append({slot["id"] for slot in res.json()})
+
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+
+    # The 09:30 Yishun slot falls before the Bartley slot of the first page, but
+    # is still shown on a later one
+    assert pages == [
+        {
+            "0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e03",
+            "5379aea8-3acd-4274-9cbc-acb3c4973b6c",
+        },
+        {"0d6b1c2e-3f7a-4f59-9d0a-6a4f4c1b2e04"},
+        {"e7bbc307-ae75-4854-bd91-d6851ae085fd"},
+    ]
+
+
 # ============================================================================
 # Unauthorized user gets all slots
 # ============================================================================
@@ -207,7 +617,7 @@ async def test_authorized_user_valid_schedule(
             "Booking slot with slot id 97ba51db-48d8-4873-b1ee-57a9b7f766fa not found.",
         ),
         # Valid ID, booked by other user:
-        ("97ba51db-48d8-4873-b1ee-57a9b7f766f0", 400, "Slot already booked."),
+        ("97ba51db-48d8-4873-b1ee-57a9b7f766f0", 409, "Slot already booked."),
         # Invalid ID: 422 Unprocessible Entity
         (
             "invalid-id-3",
@@ -237,11 +647,421 @@ async def test_authorized_user_invalid_schedule(
         error_messages = [error.get("msg") for error in error_response["detail"]]
         assert error_messages[0] == expected_error_message
 
-    # 400 or 404 status codes
+    # 404 or 409 status codes
     else:
         assert error_response.get("detail") == expected_error_message
 
 
+# ============================================================================
+# Concurrent requests race for the same slot: exactly one wins
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_users_race_to_schedule_same_slot(
+    session_per_request: FastAPI, authorized_client_for_scheduling: AsyncClient
+):
+    json_body = {"booking_slot_id": "213fa5e7-abbb-4e55-bccc-318db42ace81"}
+    responses = await asyncio.gather(
+        *(
+            authorized_client_for_scheduling.post("/bookings/schedule", json=json_body)
+            for _ in range(20)
+        )
+    )
+
+    status_codes = sorted(res.status_code for res in responses)
+    assert status_codes == [201] + [409] * 19
+    assert all(
+        res.json().get("detail") == "Slot already booked."
+        for res in responses
+        if res.status_code == 409
+    )
+
+
+# ============================================================================
+# Retried schedule and cancel requests with an Idempotency-Key are replayed
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_retries_with_idempotency_key(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    json_body = {"booking_slot_id": "213fa5e7-abbb-4e55-bccc-318db42ace81"}
+    headers = {"Idempotency-Key": "schedule-1"}
+
+    responses = [
+        await authorized_client_for_scheduling.post(
+            "/bookings/schedule", json=json_body, headers=headers
+        )
+        for _ in range(2)
+    ]
+    assert [res.status_code for res in responses] == [201, 201]
+    assert responses[0].json() == responses[1].json()
+    assert "Idempotent-Replayed" not in responses[0].headers
+    assert responses[1].headers["Idempotent-Replayed"] == "true"
+
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/schedule",
+        json={"booking_slot_id": "e7bbc307-ae75-4854-bd91-d6851ae085fd"},
+        headers=headers,
+    )
+    assert res.status_code == 422
+
+    record_id = responses[0].json()["id"]
+    responses = [
+        await authorized_client_for_scheduling.delete(
+            f"/bookings/cancel/{record_id}", headers={"Idempotency-Key": "cancel-1"}
+        )
+        for _ in range(2)
+    ]
+    assert [res.status_code for res in responses] == [200, 200]
+
+    # Without a key, a repeated cancel runs again and fails
+    res = await authorized_client_for_scheduling.delete(f"/bookings/cancel/{record_id}")
+    assert res.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_idempotency_keys_expire(session: AsyncSession):
+    # See data.sql for the user
+    user_id = "8045a3aa-e221-4d9c-89c5-822ab96d4885"
+    now = [datetime(2025, 3, 31, 8)]
+    store = IdempotencyStore(ttl_seconds=60, clock=lambda: now[0])
+    calls = []
+
+    async def call():
+        calls.append(now[0])
+        return JSONResponse(content={}, status_code=201)
+
+    await store.run(session, user_id, "a", "fingerprint", call)
+    res = await store.run(session, user_id, "a", "fingerprint", call)
+    assert res.headers["Idempotent-Replayed"] == "true"
+    assert (await store.get(session, user_id, "a")).status_code == 201
+
+    now[0] += timedelta(seconds=61)
+    assert await store.get(session, user_id, "a") is None
+
+    # The expired key is claimed again, by any request
+    await store.run(session, user_id, "a", "other fingerprint", call)
+    assert len(calls) == 2
+
+
+# ============================================================================
+# Authorized user holds a slot, then confirms the hold
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_hold_and_confirm_slot(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    # See data.sql for the available slots
+    json_body = {"booking_slot_id": "213fa5e7-abbb-4e55-bccc-318db42ace81"}
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/holds", json=json_body
+    )
+    assert res.status_code == 201
+    hold = SlotHoldResponse(**res.json())
+    assert str(hold.booking_slot_id) == json_body["booking_slot_id"]
+
+    # Holding it again renews the same hold
+    res = await authorized_client_for_scheduling.post("/bookings/holds", json=json_body)
+    assert res.status_code == 201
+    assert res.json()["id"] == str(hold.id)
+
+    res = await authorized_client_for_scheduling.post(
+        f"/bookings/holds/{hold.id}/confirm"
+    )
+    assert res.status_code == 201
+    assert res.json()["booking_slot_id"] == json_body["booking_slot_id"]
+
+    # The hold is used up
+    res = await authorized_client_for_scheduling.post(
+        f"/bookings/holds/{hold.id}/confirm"
+    )
+    assert res.status_code == 404
+
+
+# ============================================================================
+# A slot held by another user is hidden and cannot be booked or held
+# ============================================================================
+@pytest.mark.asyncio
+async def test_slot_held_by_other_user(
+    authorized_client_for_scheduling: AsyncClient, session: AsyncSession
+):
+    # See data.sql for the only available Pneumococcal slot
+    slot_id = "213fa5e7-abbb-4e55-bccc-318db42ace81"
+    await SlotHolds().hold(session, slot_id, "8045a3aa-e221-4d9c-89c5-822ab96d4885")
+    await session.commit()
+
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available", params={"vaccine_name": "Pneumococcal"}
+    )
+    assert res.status_code == 404
+
+    for path in ("/bookings/schedule", "/bookings/holds"):
+        res = await authorized_client_for_scheduling.post(
+            path, json={"booking_slot_id": slot_id}
+        )
+        assert res.status_code == 409
+        assert res.json().get("detail") == "Slot is on hold for another user."
+
+
+@pytest.mark.asyncio
+async def test_slot_holds_expire(session: AsyncSession):
+    # See data.sql for the users and the available Pneumococcal slot
+    slot_id = "213fa5e7-abbb-4e55-bccc-318db42ace81"
+    user_id = "8045a3aa-e221-4d9c-89c5-822ab96d4885"
+    other_user_id = "d2e8d855-1c1a-4fe6-a8b8-ac823250a414"
+    now = [datetime(2025, 3, 31, 8)]
+    holds = SlotHolds(ttl_seconds=60, clock=lambda: now[0])
+
+    hold = await holds.hold(session, slot_id, user_id)
+    assert await holds.hold(session, slot_id, other_user_id) is None
+    assert await holds.held_by_others(session, other_user_id) == {slot_id}
+    assert await holds.count_for(session, user_id) == 1
+
+    now[0] += timedelta(seconds=59)
+    assert await holds.get(session, hold.id) == hold
+
+    now[0] += timedelta(seconds=2)
+    assert await holds.get(session, hold.id) is None
+    assert await holds.count_for(session, user_id) == 0
+
+    # The expired hold is replaced by the other user's
+    other_hold = await holds.hold(session, slot_id, other_user_id)
+    assert other_hold is not None and other_hold.id != hold.id
+    assert await holds.holder_of(session, slot_id) == other_user_id
+
+
+# ============================================================================
+# Authorized user schedules a multi-dose series
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_schedule_series(
+    authorized_client_for_scheduling: AsyncClient, session: AsyncSession
+):
+    # HPV slots at Yishun (bd76...) and Bartley (492f...) Polyclinics (see data.sql)
+    hpv_vaccine_id = "a67ed08a-95f0-47d4-a97b-8153f1d7874a"
+    slots = [
+        ("bd760847-db7e-439f-add8-3610167478ca", 0),
+        ("bd760847-db7e-439f-add8-3610167478ca", 10),
+        ("bd760847-db7e-439f-add8-3610167478ca", 30),
+        ("bd760847-db7e-439f-add8-3610167478ca", 60),
+        ("492f66d8-fd4b-4d61-a343-1c85898337f1", 0),
+        ("492f66d8-fd4b-4d61-a343-1c85898337f1", 28),
+        ("492f66d8-fd4b-4d61-a343-1c85898337f1", 56),
+    ]
+    session.add_all(
+        [
+            BookingSlot(
+                id=f"5e71e5a0-0000-4000-8000-00000000000{i}",
+                polyclinic_id=polyclinic_id,
+                vaccine_id=hpv_vaccine_id,
+                datetime=datetime(2025, 5, 1, 9) + timedelta(days=days),
+            )
+            for i, (polyclinic_id, days) in enumerate(slots)
+        ]
+    )
+    await session.commit()
+
+    # 3 doses by default for HPV (see data.sql): both clinics fit, Bartley finishes first
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/schedule/series",
+        json={"vaccine_id": hpv_vaccine_id, "min_interval_days": 28},
+    )
+    assert res.status_code == 201
+    assert [record["booking_slot_id"] for record in res.json()] == [
+        "5e71e5a0-0000-4000-8000-000000000004",
+        "5e71e5a0-0000-4000-8000-000000000005",
+        "5e71e5a0-0000-4000-8000-000000000006",
+    ]
+
+    # Only Yishun's slots are left, and they cannot fit a longer series
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/schedule/series",
+        json={"vaccine_id": hpv_vaccine_id, "doses": 3, "min_interval_days": 31},
+    )
+    assert res.status_code == 404
+    assert res.json().get("detail") == "No available slots for a 3-dose series."
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/schedule/series",
+        json={"vaccine_id": "00000000-0000-0000-0000-000000000000", "doses": 2},
+    )
+    assert res.status_code == 404
+
+
+# ============================================================================
+# Scheduling and cancelling publish slot events to subscribers
+# ============================================================================
+@pytest.mark.asyncio
+async def test_schedule_and_cancel_publish_slot_events(
+    test_app: FastAPI,
+    authorized_client_for_scheduling: AsyncClient,
+    session: AsyncSession,
+):
+    # See data.sql for the available Pneumococcal slot at Yishun Polyclinic
+    vaccine_id = "599b1189-0687-4a38-8de5-95850cfa9ee7"
+    polyclinic_id = "bd760847-db7e-439f-add8-3610167478ca"
+    slot_id = "213fa5e7-abbb-4e55-bccc-318db42ace81"
+
+    # Events describe slots from the availability index, warmed at startup
+    await test_app.state.availability_index.refresh(session)
+    test_app.state.slot_events = SlotEventBroker(test_app.state.availability_index)
+
+    async with test_app.state.slot_events.subscribe(
+        {(vaccine_id, polyclinic_id), (vaccine_id, None)}
+    ) as queue:
+        res: Response = await authorized_client_for_scheduling.post(
+            "/bookings/schedule", json={"booking_slot_id": slot_id}
+        )
+        assert res.status_code == 201
+
+        res = await authorized_client_for_scheduling.delete(
+            f"/bookings/cancel/{res.json()['id']}"
+        )
+        assert res.status_code == 200
+
+        events = [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert [(event.type, event.booking_slot_id) for event in events] == [
+        ("taken", slot_id),
+        ("freed", slot_id),
+    ]
+    assert events[0].polyclinic_id == polyclinic_id
+
+    res = await authorized_client_for_scheduling.get(
+        "/bookings/events", params={"subscribe": ":"}
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_slot_events_load_slots_the_index_has_not_seen(session: AsyncSession):
+    # See data.sql for the booked Influenza slot at Ang Mo Kio Polyclinic
+    vaccine_id = "9004aab3-8993-4d37-81c3-78844191e5ec"
+    slot_id = "97ba51db-48d8-4873-b1ee-57a9b7f766f0"
+
+    availability = AvailabilityIndex(clock=lambda: datetime(2025, 3, 31, 8))
+    await availability.refresh(session)
+    assert availability.slot(slot_id) is None
+
+    events = SlotEventBroker(availability)
+    # Without Postgres, only remembers the engine to look slots up with
+    await events.listen(session.bind)
+
+    async with events.subscribe({(vaccine_id, None)}) as queue:
+        await session.execute(
+            delete(VaccineRecord).where(VaccineRecord.booking_slot_id == slot_id)
+        )
+        await events.notify(session, "freed", [slot_id])
+        await session.commit()
+
+        event = await asyncio.wait_for(queue.get(), timeout=5)
+
+    assert (event.type, event.booking_slot_id) == ("freed", slot_id)
+    assert availability.is_free(slot_id)
+
+
+# ============================================================================
+# A slot freed by a cancellation is offered to the waitlist as a hold
+# ============================================================================
+@pytest.mark.asyncio
+async def test_cancelled_slot_is_offered_to_waitlist(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    # See data.sql for the available Pneumococcal slot at Yishun Polyclinic
+    vaccine_id = "599b1189-0687-4a38-8de5-95850cfa9ee7"
+    polyclinic_id = "bd760847-db7e-439f-add8-3610167478ca"
+    slot_id = "213fa5e7-abbb-4e55-bccc-318db42ace81"
+
+    res: Response = await authorized_client_for_scheduling.get(
+        "/bookings/available", params={"vaccine_name": "Pneumococcal"}
+    )
+    assert res.status_code == 200
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/schedule", json={"booking_slot_id": slot_id}
+    )
+    assert res.status_code == 201
+    record_id = res.json()["id"]
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/waitlist",
+        json={
+            "vaccine_id": vaccine_id,
+            "polyclinic_ids": [polyclinic_id],
+            "start_datetime": "2025-04-01T00:00:00",
+            "end_datetime": "2025-04-30T00:00:00",
+        },
+    )
+    assert res.status_code == 201
+    entry = WaitlistEntryResponse(**res.json())
+    assert entry.offer is None
+
+    res = await authorized_client_for_scheduling.delete(f"/bookings/cancel/{record_id}")
+    assert res.status_code == 200
+
+    res = await authorized_client_for_scheduling.get("/bookings/waitlist")
+    assert res.status_code == 200
+    [entry] = [WaitlistEntryResponse(**entry) for entry in res.json()]
+    assert str(entry.offer.booking_slot_id) == slot_id
+
+    res = await authorized_client_for_scheduling.post(
+        f"/bookings/holds/{entry.offer.id}/confirm"
+    )
+    assert res.status_code == 201
+
+    # Confirming the offer completes the waitlist entry
+    res = await authorized_client_for_scheduling.get("/bookings/waitlist")
+    assert res.json() == []
+
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/waitlist",
+        json={"vaccine_id": "25db80a6-68ab-43c2-8dc2-6bee617b7827"},
+    )
+    assert res.status_code == 404
+
+    res = await authorized_client_for_scheduling.delete(
+        f"/bookings/waitlist/{entry.id}"
+    )
+    assert res.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_waitlist_offers_slot_to_first_fitting_entry(session: AsyncSession):
+    # See data.sql for the users and the Pneumococcal slot at Yishun Polyclinic, on
+    # 2025-04-02 at 14:00
+    vaccine_id = "599b1189-0687-4a38-8de5-95850cfa9ee7"
+    slot_id = "213fa5e7-abbb-4e55-bccc-318db42ace81"
+    user_id = "8045a3aa-e221-4d9c-89c5-822ab96d4885"
+    other_user_id = "d2e8d855-1c1a-4fe6-a8b8-ac823250a414"
+    availability = AvailabilityIndex(clock=lambda: datetime(2025, 3, 31, 8))
+    waitlist = Waitlist(availability, SlotHolds())
+
+    # Only Bartley Clinic, then a window ending too early, then any slot
+    await waitlist.join(
+        session, user_id, vaccine_id, {"492f66d8-fd4b-4d61-a343-1c85898337f1"}
+    )
+    await waitlist.join(
+        session, user_id, vaccine_id, end_datetime=datetime(2025, 4, 1, 23, 59)
+    )
+    entry = await waitlist.join(session, other_user_id, vaccine_id)
+    await session.commit()
+
+    hold = await waitlist.match(session, slot_id)
+    await session.commit()
+    assert (hold.booking_slot_id, hold.user_id) == (slot_id, other_user_id)
+
+    # Entries and offers are kept in the database, not in the waitlist
+    waitlist = Waitlist(availability, SlotHolds())
+    assert await waitlist.entries_for(session, other_user_id) == [
+        (entry._replace(offer_hold_id=hold.id), hold)
+    ]
+    assert await waitlist.match(session, slot_id) is None
+
+    # Once the hold is gone, the entry is done with
+    await SlotHolds().release(session, hold.id)
+    assert await waitlist.entries_for(session, other_user_id) == []
+    assert await waitlist.count_for(session, user_id) == 2
+
+
 # ============================================================================
 # Unauthorized user schedules a valid/invalid slot
 # ============================================================================
@@ -392,7 +1212,7 @@ async def test_authorized_user_valid_reschedule(
         (
             "a6578d08-4e81-40ca-bc30-c9f2d01024aa",  # valid slot as it belongs to user
             "97ba51db-48d8-4873-b1ee-57a9b7f766f0",  # invalid slot as it belongs to another user
-            400,
+            409,
             "Slot already booked",
         ),
         (
@@ -432,6 +1252,38 @@ async def test_authorized_user_invalid_reschedule(
     assert expected_error_message in response_data["detail"]
 
 
+# ============================================================================
+# Concurrent reschedules into the same slot: exactly one wins
+# ============================================================================
+@pytest.mark.asyncio
+async def test_authorized_user_race_to_reschedule_into_same_slot(
+    session_per_request: FastAPI, authorized_client_for_scheduling: AsyncClient
+):
+    # See data.sql for the available records and slots
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/schedule",
+        json={"booking_slot_id": "e7bbc307-ae75-4854-bd91-d6851ae085fd"},
+    )
+    assert res.status_code == 201
+
+    record_ids = ["a6578d08-4e81-40ca-bc30-c9f2d01024aa", res.json()["id"]]
+    new_slot_id = "213fa5e7-abbb-4e55-bccc-318db42ace81"
+
+    responses = await asyncio.gather(
+        *(
+            authorized_client_for_scheduling.post(
+                "/bookings/reschedule",
+                json={"vaccine_record_id": record_id, "new_slot_id": new_slot_id},
+            )
+            for record_id in record_ids
+        )
+    )
+
+    assert sorted(res.status_code for res in responses) == [200, 409]
+    winner = next(res for res in responses if res.status_code == 200)
+    assert winner.json()["booking_slot_id"] == new_slot_id
+
+
 # ============================================================================
 # Unauthorized user reschedules
 # ============================================================================
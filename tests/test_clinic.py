@@ -1,8 +1,22 @@
+import json
+
+import numpy as np
 import pytest
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from requests import Response
 
+from app.core.config import settings
+from app.models.models import Clinic
 from app.schemas.clinic import ClinicResponse, ClinicType
+from app.services.catalog.clinic_catalog import ClinicCatalog
+from app.services.catalog.coordinates import ClinicCoordinates
+from app.services.catalog.distance_matrix import DistanceMatrix, build_distance_matrix
+from app.services.catalog.geo import haversine_km
+from app.services.catalog.institutions import load_institutions, read_institutions
+from app.services.catalog.nearest_clinics import HomeClinics
+from app.services.catalog.spatial import ClinicGrid
 
 
 @pytest.mark.asyncio
@@ -42,3 +56,357 @@ async def test_unauthorized_user_get_nearest_clinic(async_client: AsyncClient):
     res: Response = await async_client.get("/clinics/nearest")
     assert res.status_code == 401
     assert res.json().get("detail") == "Not authenticated"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "clinic_type, expected_names",
+    [
+        ("polyclinic", ["Yishun Polyclinic", "Ang Mo Kio Polyclinic"]),
+        ("gp", ["Raffles Medical (Compass One)", "Bartley Clinic"]),
+        (
+            None,
+            [
+                "Yishun Polyclinic",
+                "Ang Mo Kio Polyclinic",
+                "Raffles Medical (Compass One)",
+            ],
+        ),
+    ],
+)
+async def test_get_nearest_clinic_by_location(
+    async_client: AsyncClient, clinic_type: str, expected_names: list[str]
+):
+    # At Yishun Polyclinic (see data.sql)
+    params = {"latitude": 1.43035851992416, "longitude": 103.839190698939}
+    if clinic_type:
+        params["clinic_type"] = clinic_type
+
+    res: Response = await async_client.get(
+        "/clinics/nearest-by-location", params=params
+    )
+
+    assert res.status_code == 200
+    clinics = [ClinicResponse(**record) for record in res.json()]
+    assert [clinic.name for clinic in clinics] == expected_names
+    assert [clinic.distance_km for clinic in clinics] == sorted(
+        clinic.distance_km for clinic in clinics
+    )
+    if clinic_type != "gp":
+        assert clinics[0].distance_km == pytest.approx(0, abs=1e-3)
+
+
+def test_clinic_grid_matches_brute_force():
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(1.2, 1.5, 500)
+    longitudes = rng.uniform(103.6, 104.0, 500)
+    ids = [str(i) for i in range(500)]
+    grid = ClinicGrid(ids, latitudes, longitudes)
+
+    for latitude, longitude in rng.uniform((1.1, 103.5), (1.6, 104.1), (20, 2)):
+        distances = haversine_km(
+            latitude, longitude, np.radians(latitudes), np.radians(longitudes)
+        )
+        expected = [ids[i] for i in np.argsort(distances)[:5]]
+        assert [id for id, _ in grid.nearest(latitude, longitude, 5)] == expected
+
+
+@pytest.mark.asyncio
+async def test_get_nearest_clinic_by_location_postgis_falls_back_on_sqlite(
+    async_client: AsyncClient, monkeypatch
+):
+    monkeypatch.setattr(settings, "clinic_proximity_backend", "postgis")
+    params = {"latitude": 1.43035851992416, "longitude": 103.839190698939}
+
+    res: Response = await async_client.get(
+        "/clinics/nearest-by-location", params=params
+    )
+
+    assert res.status_code == 200
+    assert res.json()[0]["name"] == "Yishun Polyclinic"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("clinic_type", ["polyclinic", "gp", None])
+async def test_nearest_by_home_reads_precomputed_clinics(
+    admin_client: AsyncClient,
+    authorized_client_for_scheduling: AsyncClient,
+    clinic_type: str,
+):
+    params = {"clinic_limit": 2}
+    if clinic_type:
+        params["clinic_type"] = clinic_type
+
+    # Searched afresh before the lists are precomputed
+    res: Response = await authorized_client_for_scheduling.get(
+        "/clinics/nearest-by-home", params=params
+    )
+    assert res.status_code == 200
+    searched = res.json()
+
+    res = await admin_client.post("/admin/nearest-clinics/refresh")
+    assert res.status_code == 200
+    assert res.json()["refreshed_addresses"] > 0
+
+    # Already current, so a second refresh has nothing to do
+    res = await admin_client.post("/admin/nearest-clinics/refresh")
+    assert res.json()["refreshed_addresses"] == 0
+
+    res = await authorized_client_for_scheduling.get(
+        "/clinics/nearest-by-home", params=params
+    )
+    assert res.status_code == 200
+    assert [clinic["name"] for clinic in res.json()] == [
+        clinic["name"] for clinic in searched
+    ]
+    assert [clinic["distance_km"] for clinic in res.json()] == pytest.approx(
+        [clinic["distance_km"] for clinic in searched], abs=1e-3
+    )
+
+
+@pytest.mark.parametrize(
+    "k, among, expected",
+    [
+        # Exact up to the last polyclinic listed, 2.0 km away
+        (2, None, [("p1", 0.5), ("g1", 1.0)]),
+        (3, None, [("p1", 0.5), ("g1", 1.0), ("p2", 2.0)]),
+        # A polyclinic left out of the list may be nearer than g2
+        (4, None, None),
+        (1, {"g2"}, None),
+        (2, {"p2", "g1"}, [("g1", 1.0), ("p2", 2.0)]),
+    ],
+)
+def test_home_clinics_merge_is_exact_up_to_truncated_lists(k, among, expected):
+    home = HomeClinics(
+        address_id="a",
+        latitude=1.3,
+        longitude=103.8,
+        by_type={
+            "polyclinic": ([("p1", 0.5), ("p2", 2.0)], False),
+            "gp": ([("g1", 1.0), ("g2", 3.0)], True),
+        },
+    )
+
+    assert home.nearest(k, among=among) == expected
+    assert home.nearest(4, clinic_type="gp") == [("g1", 1.0), ("g2", 3.0)]
+
+
+@pytest.mark.asyncio
+async def test_get_nearest_clinics_by_locations(async_client: AsyncClient):
+    # At Yishun Polyclinic, as an object and as a [latitude, longitude] pair
+    body = [
+        {"latitude": 1.43035851992416, "longitude": 103.839190698939},
+        [1.43035851992416, 103.839190698939],
+    ]
+
+    res: Response = await async_client.post(
+        "/clinics/nearest-by-location/batch",
+        params={"clinic_limit": 2, "clinic_type": "polyclinic"},
+        json=body,
+    )
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in res.text.splitlines()]
+    assert [result["index"] for result in results] == [0, 1]
+    for result in results:
+        assert [clinic["name"] for clinic in result["clinics"]] == [
+            "Yishun Polyclinic",
+            "Ang Mo Kio Polyclinic",
+        ]
+        assert result["clinics"][0]["distance_km"] == pytest.approx(0, abs=1e-3)
+
+
+@pytest.mark.asyncio
+async def test_get_nearest_clinics_by_locations_streams_ndjson(
+    async_client: AsyncClient,
+):
+    lines = [
+        '{"latitude": 1.43035851992416, "longitude": 103.839190698939}',
+        "",
+        "[1.43035851992416, 103.839190698939]",
+    ]
+
+    res: Response = await async_client.post(
+        "/clinics/nearest-by-location/batch",
+        params={"clinic_limit": 1},
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert res.status_code == 200
+    results = [json.loads(line) for line in res.text.splitlines()]
+    assert [result["index"] for result in results] == [0, 1]
+    assert results[0]["clinics"][0]["name"] == "Yishun Polyclinic"
+    assert results[1]["clinics"] == results[0]["clinics"]
+
+    # An invalid line rejects the whole request, before anything is streamed
+    res = await async_client.post(
+        "/clinics/nearest-by-location/batch",
+        content="\n".join([lines[0], '{"latitude": 91, "longitude": 103.8}']),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert res.status_code == 422
+    assert res.json()["detail"][0]["loc"][:2] == ["body", 1]
+
+
+@pytest.mark.asyncio
+async def test_get_nearest_clinics_by_locations_rejects_invalid_array(
+    async_client: AsyncClient,
+):
+    res: Response = await async_client.post(
+        "/clinics/nearest-by-location/batch", json=[{"latitude": 1.3}]
+    )
+
+    assert res.status_code == 422
+
+
+def test_nearest_many_matches_grid():
+    rng = np.random.default_rng(1)
+    count = 300
+    coordinates = ClinicCoordinates()
+    coordinates.ids = [str(i) for i in range(count)]
+    latitudes = rng.uniform(1.2, 1.5, count)
+    longitudes = rng.uniform(103.6, 104.0, count)
+    coordinates.latitudes = np.radians(latitudes)
+    coordinates.longitudes = np.radians(longitudes)
+    coordinates.cos_latitudes = np.cos(coordinates.latitudes)
+    coordinates.types = np.array(["polyclinic", "gp"] * (count // 2), dtype=object)
+    grid = ClinicGrid(coordinates.ids[::2], latitudes[::2], longitudes[::2])
+
+    locations = rng.uniform((1.2, 103.6), (1.5, 104.0), (50, 2))
+    nearest = coordinates.nearest_many(
+        locations[:, 0], locations[:, 1], 4, "polyclinic"
+    )
+
+    for (latitude, longitude), clinics in zip(locations, nearest):
+        expected = grid.nearest(latitude, longitude, 4)
+        assert [id for id, _ in clinics] == [id for id, _ in expected]
+        assert [km for _, km in clinics] == pytest.approx([km for _, km in expected])
+
+
+@pytest.mark.asyncio
+async def test_clinic_catalog_reloads_for_unknown_clinic(session: AsyncSession):
+    yishun_id = "bd760847-db7e-439f-add8-3610167478ca"
+    catalog = ClinicCatalog()
+
+    clinics = await catalog.get_many(session, [yishun_id])
+    assert clinics[yishun_id].name == "Yishun Polyclinic"
+    assert clinics[yishun_id].address.latitude == pytest.approx(1.430359, abs=1e-6)
+    snapshot = catalog.snapshot
+    assert yishun_id in snapshot.by_type["polyclinic"]
+
+    # A clinic added since is loaded into a new snapshot, leaving the old one as is
+    session.add(
+        Clinic(
+            id="00000000-0000-0000-0000-000000000001",
+            address_id="7cb8712c-7824-49ef-88ce-b418a71e78f9",
+            name="Yishun Annex",
+            type="gp",
+        )
+    )
+    await session.commit()
+
+    clinics = await catalog.get_many(session, ["00000000-0000-0000-0000-000000000001"])
+    assert clinics["00000000-0000-0000-0000-000000000001"].name == "Yishun Annex"
+    assert catalog.snapshot.version != snapshot.version
+    assert "00000000-0000-0000-0000-000000000001" not in snapshot.clinics
+
+
+@pytest.mark.asyncio
+async def test_load_institutions_diff_upserts_clinics(session: AsyncSession, tmp_path):
+    dataset = tmp_path / "institutions.json"
+    institutions = [
+        # As loaded already, spelled differently
+        {
+            "name": "ANG MO KIO POLYCLINIC",
+            "type": "Polyclinic",
+            "address": "21 Ang Mo Kio Central 2  Ang Mo Kio Polyclinic Singapore 569666",
+            "latitude": "1.3743245905856",
+            "longitude": 103.845677779279,
+        },
+        # Moved
+        {
+            "name": "Yishun Polyclinic",
+            "type": "polyclinic",
+            "address": "30A YISHUN CENTRAL 1 SINGAPORE 768796",
+            "postal_code": 768796,
+            "latitude": 1.428,
+            "longitude": 103.836,
+        },
+        # New, with a nested address
+        {
+            "name": "Khatib Family Clinic",
+            "institution_type": "GP Clinic",
+            "address": {
+                "address": "845 YISHUN STREET 81 SINGAPORE 760845",
+                "lat": 1.4152,
+                "lng": 103.8365,
+            },
+        },
+        # Not a clinic
+        {"name": "Khoo Teck Puat Hospital", "type": "hospital", "address": "X"},
+    ]
+    dataset.write_text(json.dumps({"status": "ok", "data": {"results": institutions}}))
+
+    report = await load_institutions(session, read_institutions(dataset, chunk_chars=7))
+    assert report[:4] == (1, 1, 1, 1)
+
+    result = await session.execute(
+        select(Clinic).where(Clinic.name == "Khatib Family Clinic")
+    )
+    clinic = result.scalars().one()
+    assert clinic.type == "gp"
+    address = await clinic.awaitable_attrs.address
+    assert address.postal_code == "760845"
+    assert float(address.latitude) == pytest.approx(1.4152)
+
+    result = await session.execute(
+        select(Clinic).where(Clinic.id == "bd760847-db7e-439f-add8-3610167478ca")
+    )
+    clinic = result.scalars().one()
+    await session.refresh(clinic)
+    assert (await clinic.awaitable_attrs.address).postal_code == "768796"
+
+    # Loading the same dataset again changes nothing
+    report = await load_institutions(session, read_institutions(dataset))
+    assert report[:4] == (0, 0, 3, 1)
+
+
+@pytest.mark.asyncio
+async def test_distance_matrix_ranks_clinics_by_lookup(session: AsyncSession, tmp_path):
+    path = tmp_path / "distance_matrix.json"
+    report = await build_distance_matrix(session, path)
+    assert report.sectors > 0 and report.clinics > 0
+
+    clinic_coordinates = ClinicCoordinates()
+    distance_matrix = DistanceMatrix(str(path))
+    nearest = await distance_matrix.nearest(
+        session, clinic_coordinates, "768898", 2, "polyclinic"
+    )
+    assert len(nearest) == 2
+    assert [km for _, km in nearest] == sorted(km for _, km in nearest)
+    ids = [id for id, _ in nearest]
+    distances = await distance_matrix.distances(
+        session, clinic_coordinates, "768898", ids + ["unknown"]
+    )
+    assert distances[:2] == pytest.approx([km for _, km in nearest])
+    assert np.isinf(distances[2])
+
+    # An unknown sector, or clinics changed since the build, fall back to computing
+    assert (
+        await distance_matrix.nearest(session, clinic_coordinates, "990000", 2) is None
+    )
+    session.add(
+        Clinic(
+            address_id="7cb8712c-7824-49ef-88ce-b418a71e78f9",
+            name="Yishun Annex",
+            type="gp",
+        )
+    )
+    await session.commit()
+    await clinic_coordinates.refresh(session)
+    assert (
+        await distance_matrix.nearest(session, clinic_coordinates, "768898", 2) is None
+    )
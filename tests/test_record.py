@@ -90,3 +90,38 @@ async def test_unauthorized_user_get_vaccination_record(async_client: AsyncClien
     res: Response = await async_client.get("/records/some-id")
     assert res.status_code == 401
     assert res.json().get("detail") == "Not authenticated"
+
+
+@pytest.mark.asyncio
+async def test_authorized_user_get_vaccination_records_not_modified(
+    authorized_client_for_scheduling: AsyncClient,
+):
+    # See data.sql for the free Influenza slots at Yishun Polyclinic and Bartley Clinic
+    res: Response = await authorized_client_for_scheduling.post(
+        "/bookings/schedule",
+        json={"booking_slot_id": "e7bbc307-ae75-4854-bd91-d6851ae085fd"},
+    )
+    assert res.status_code == 201
+
+    res = await authorized_client_for_scheduling.get("/records")
+    assert res.status_code == 200
+    etag = res.headers["ETag"]
+
+    res = await authorized_client_for_scheduling.get(
+        "/records", headers={"If-None-Match": etag}
+    )
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+
+    # A new booking changes the user's records
+    res = await authorized_client_for_scheduling.post(
+        "/bookings/schedule",
+        json={"booking_slot_id": "5379aea8-3acd-4274-9cbc-acb3c4973b6c"},
+    )
+    assert res.status_code == 201
+
+    res = await authorized_client_for_scheduling.get(
+        "/records", headers={"If-None-Match": etag}
+    )
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
@@ -3,8 +3,15 @@ from datetime import datetime
 import pytest
 from httpx import AsyncClient
 from requests import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.user import UserResponse, UserUpdateResponse
+from app.services.catalog.postal_codes import (
+    PostalCodeIndex,
+    load_postal_codes,
+    read_postal_codes,
+    resolve_address,
+)
 
 
 @pytest.mark.asyncio
@@ -97,3 +104,29 @@ async def test_unauthorized_user_get_user(async_client: AsyncClient):
 async def test_unauthorized_user_update_user(async_client: AsyncClient):
     res: Response = await async_client.put("/users")
     assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_resolve_address_from_postal_code_dataset(
+    session: AsyncSession, tmp_path
+):
+    # A postal code nobody lives at yet, loaded from the offline dataset
+    dataset = tmp_path / "postal_codes.csv"
+    dataset.write_text(
+        "postal_code,address,latitude,longitude\n"
+        "760001,1 Yishun Street 11,1.433100,103.835500\n"
+        "760002,,,\n"
+    )
+    report = await load_postal_codes(session, read_postal_codes(dataset))
+    assert report.loaded == 1
+
+    postal_codes = PostalCodeIndex()
+    address = await resolve_address(session, postal_codes, "760001")
+    assert address.address == "1 Yishun Street 11"
+    assert float(address.latitude) == pytest.approx(1.4331)
+    assert float(address.longitude) == pytest.approx(103.8355)
+    await session.commit()
+
+    # The address is created once, then shared
+    assert (await resolve_address(session, postal_codes, "760001")).id == address.id
+    assert await resolve_address(session, postal_codes, "760002") is None
@@ -1,8 +1,20 @@
+from datetime import date
+
 import pytest
 from httpx import AsyncClient
 from requests import Response
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 
+from app.models.models import VaccineCriteria
 from app.schemas.vaccine import VaccineCriteriaResponse, VaccineResponse
+from app.services.catalog.eligibility import (
+    AgeRange,
+    age_in_months,
+    parse_age_criteria,
+)
+from app.services.catalog.name_index import CatalogNameIndex
 
 
 @pytest.mark.asyncio
@@ -52,3 +64,64 @@ async def test_unauthorized_user_get_vaccine_recommendations(async_client: Async
 
     assert res.status_code == 401
     assert res.json().get("detail") == "Not authenticated"
+
+
+@pytest.mark.parametrize(
+    "age_criteria, expected",
+    [
+        (None, AgeRange(0, None)),
+        ("0 months", AgeRange(0, 0)),
+        ("6-59 months", AgeRange(6, 59)),
+        ("10-11 years", AgeRange(120, 143)),
+        ("18+ years", AgeRange(216, None)),
+        (" 65 +  Years ", AgeRange(780, None)),
+    ],
+)
+def test_parse_age_criteria(age_criteria, expected):
+    assert parse_age_criteria(age_criteria) == expected
+
+
+@pytest.mark.parametrize("age_criteria", ["adults", "6-59", "59-6 months", "6 weeks"])
+def test_parse_age_criteria_rejects_unknown_criteria(age_criteria):
+    with pytest.raises(ValueError):
+        parse_age_criteria(age_criteria)
+
+
+def test_age_in_months_counts_whole_calendar_months():
+    assert age_in_months(date(2024, 1, 31), date(2024, 2, 29)) == 0
+    assert age_in_months(date(2024, 1, 31), date(2024, 3, 31)) == 2
+    assert age_in_months(date(2006, 5, 1), date(2024, 4, 30)) == 215
+    assert age_in_months(date(2006, 5, 1), date(2024, 5, 1)) == 216
+
+
+@pytest.mark.asyncio
+async def test_compiled_eligibility_rules_match_age_range_query(session: AsyncSession):
+    name_index = CatalogNameIndex()
+    await name_index.refresh(session)
+    assert len(name_index.eligibility) == 8
+
+    for age_months in [0, 4, 6, 12, 143, 144, 167, 168, 215, 216, 779, 780, 1200]:
+        for gender in ["M", "F", "None"]:
+            result = await session.execute(
+                select(VaccineCriteria.vaccine_id, VaccineCriteria.age_criteria)
+                .where(
+                    VaccineCriteria.min_age_months <= age_months,
+                    or_(
+                        VaccineCriteria.max_age_months.is_(None),
+                        VaccineCriteria.max_age_months >= age_months,
+                    ),
+                    or_(
+                        VaccineCriteria.gender_criteria.is_(None),
+                        VaccineCriteria.gender_criteria == gender,
+                    ),
+                )
+                .order_by(VaccineCriteria.vaccine_id, VaccineCriteria.id)
+            )
+            expected = [tuple(row) for row in result.all()]
+
+            vaccines = name_index.eligibility.recommend(age_months, gender)
+            assert [
+                (vaccine["id"], criteria["age_criteria"])
+                for vaccine in vaccines
+                for criteria in vaccine["vaccine_criterias"]
+            ] == expected